@@ -2,8 +2,7 @@ from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import os
 
-def reverse_bits(byte):
-    return int('{:08b}'.format(byte)[::-1], 2)
+from bitpack import pack_glyphs, LSB_FIRST
 
 def strikeout_data(data, width):
     """ Adds a strikeout line across the 7th and 8th row of character data. """
@@ -62,13 +61,7 @@ def generate_xbm_data(ttf_path, char_list, forced_height_1, forced_height_2, max
             if variant_label == "strikeout":
                 padded_array = strikeout_data(padded_array.copy(), new_width)
 
-            xbm_data = []
-            for row in padded_array:
-                byte_value = 0
-                for col in range(8):
-                    if row[col] > 0:
-                        byte_value |= (1 << (7 - col))
-                xbm_data.append(reverse_bits(byte_value))
+            xbm_data = pack_glyphs(padded_array, bit_order=LSB_FIRST)[0, :, 0].tolist()
 
             if char not in all_xbm_data:
                 all_xbm_data[char] = {}
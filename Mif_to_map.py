@@ -1,70 +1,59 @@
-def print_character_from_mif(mif_file, char_width=16, char_height=32, start_address=None):
+import numpy as np
+
+from mif_image import MifImage
+from mif_index import load_glyph_index
+
+
+def print_character_from_mif(mif_file, char_width=16, char_height=32, start_address=None,
+                             character=None, strikeout=False):
     """
     Parse a MIF file and print a specific 16x32 character as a bitmap to the terminal.
 
+    The MIF is parsed once and cached in a '<mif>.glyphidx.npz' sidecar (see mif_index),
+    so looking up characters one after another does not re-read the file.
+
     Args:
         mif_file (str): Path to the MIF file.
         char_width (int): Width of the character in bits (16 for 16x32 resolution).
         char_height (int): Height of the character in rows (32 for 16x32 resolution).
         start_address (str): Hex address (e.g., '0000') of the character to display.
+        character (str or int): Character or code point to display instead of a raw address,
+                                found through the "-- Character: 'X'" comments.
+        strikeout (bool): With `character`, show the strikeout variant.
     """
-    def hex_to_binary(hex_value, width=8):
-        """Convert a hex string to a binary string with fixed width."""
-        return bin(int(hex_value, 16))[2:].zfill(width)
-
     try:
-        with open(mif_file, "r") as f:
-            lines = f.readlines()
+        index = load_glyph_index(mif_file)
     except FileNotFoundError:
         print(f"Error: File '{mif_file}' not found!")
         return
 
-    # Filter lines to ignore comments and empty lines
-    content_lines = [
-        line.strip()
-        for line in lines
-        if ":" in line and not line.strip().startswith("--")
-    ]
-
-    if not content_lines:
+    if not index.written.any():
         print("No valid content lines found in the file.")
         return
 
-    # Parse the MIF content into a dictionary of address -> data
-    memory_map = {}
-    for line in content_lines:
-        try:
-            address, data = line.split(":")
-            data = data.strip().strip(";")  # Remove trailing semicolon
-            memory_map[address.strip()] = data
-        except ValueError as e:
-            print(f"Error parsing line: {line}. Exception: {e}")
-            continue
-
-    if start_address is None:
+    if character is not None:
+        first_address = index.address_of(character, strikeout)
+        if first_address is None:
+            code_point = character if isinstance(character, int) else ord(character)
+            print(f"Error: Character U+{code_point:04X} is not in the file.")
+            return
+        start_address = f"{first_address:04X}"
+    elif start_address is None:
         print("Error: No starting address provided. Please specify a character address.")
         return
+    else:
+        first_address = int(start_address, 16)
 
     # Retrieve the rows for the specified character
-    current_address = int(start_address, 16)
-    current_bitmap = []
+    words, present = index.rows(first_address, char_height)
+    for offset in np.flatnonzero(~present):
+        print(f"Warning: Address {first_address + offset:04X} not found in the file.")
 
-    for _ in range(char_height):
-        address = f"{current_address:04X}"  # Format as 4-digit hex
-        if address in memory_map:
-            hex_value = memory_map[address]
-            # Split into two bytes and convert each to binary
-            high_byte = hex_value[:2]  # First byte (e.g., FC from FC7F)
-            low_byte = hex_value[2:]   # Second byte (e.g., 7F from FC7F)
-            binary_row = hex_to_binary(high_byte) + hex_to_binary(low_byte)
-            current_bitmap.append(binary_row[:char_width])  # Trim to character width (16 bits)
-        else:
-            print(f"Warning: Address {address} not found in the file.")
-            current_bitmap.append("0" * char_width)  # Add an empty row
-        current_address += 1
+    # Most significant bit first, trimmed to the character width
+    current_bitmap = MifImage(char_height, index.width, words).bits()[:, :char_width]
 
     # Print the character bitmap
     print(f"=== Character at Address {start_address.upper()} ===")
     for row in current_bitmap:
-        print("".join("#" if bit == "1" else "." for bit in row))
+        print("".join("#" if bit else "." for bit in row))
     print("\n--- End of Character ---\n")
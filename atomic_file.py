@@ -0,0 +1,45 @@
+import os
+
+
+class AtomicFile:
+    """
+    File written under a temporary name next to `path` and moved over `path` by commit(), so readers
+    (and a build that is cancelled or fails half-way) never see a partially written file.
+
+    As a context manager it yields the open file and commits when the block finishes without an
+    exception; otherwise the temporary file is discarded and `path` is left as it was:
+
+        with AtomicFile(path, "w", encoding="utf-8") as f:
+            f.write(...)
+    """
+
+    def __init__(self, path, mode="w", **kwargs):
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.temp_path, mode, **kwargs)
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def commit(self):
+        """Closes the temporary file and replaces `path` with it."""
+        if self.file.closed:
+            return
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def discard(self):
+        """Closes and deletes the temporary file; `path` is not touched."""
+        if self.file.closed:
+            return
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,233 @@
+"""
+Headless batch builder: reads a JSON job file and builds every font x profile ROM in parallel.
+
+Usage:
+    python batch_build.py jobs.json [--jobs 4] [--output-root build] [--full] [--no-cache] [--profile]
+
+Job file:
+    {
+        "output_root": "build",
+        "char_sets": {
+            "arrows": ["0x2190-0x2193", "0x21CC"]
+        },
+        "jobs": [
+            {"name": "cambria", "fonts": ["C:/Windows/Fonts/cambria.ttc"], "face_index": 0,
+             "fallback_fonts": ["C:/Windows/Fonts/seguisym.ttf"],
+             "profiles": ["32x64", "16x32"], "chars": "default", "dedup": "rows", "packed": true,
+             "raster_backend": "direct",
+             "settings": {"16x32": {"padding_top": 3}, "32x64": {"compact_mif": true}}},
+            {"name": "terminal", "fonts": ["fonts/a.ttf", "fonts/b.ttf"],
+             "profiles": ["8x16"], "chars": "ascii"}
+        ]
+    }
+
+Profiles "32x64" and "16x32" are built like the wipbin GUI (XBM/MIF files per profile plus
+FontRomCombined.bin); "8x16" is curr_conv's dual-height build. A job may not mix the two.
+"chars" is a named set ("default", "ascii", or one from "char_sets") or an inline list whose
+entries are literal strings, code points, "0xXXXX" or "0xXXXX-0xYYYY" ranges.
+"settings" override profile values per profile; "compact_mif": true writes that profile's MIFs with
+[AAAA..BBBB] : VALUE; range records, and "threshold_value": "auto" thresholds every glyph at its
+own Otsu threshold (threshold_sweep.py reports the coverage of each choice). "dedup" ("glyphs" or
+"rows") also writes FontRomDedup.bin, the ROM with every distinct glyph stored once, and its size
+report; "packed": true writes FontRomPacked.bin, the glyphs trimmed to their bounding box, and its
+report (neither for 8x16 jobs).
+"raster_backend": "direct" renders glyphs with FreeType at their target size instead of resizing a
+larger drawing (32x64/16x32 jobs). "fallback_fonts" (paths, "path:face_index" for a TTC face)
+supply, in order, the characters a font does not have; which font each character comes from is in
+build.log before anything is rendered.
+Each font of a job is built into <output_root>/<name>/<font file stem> with its output in build.log.
+With --profile, each build also writes trace.json (Chrome trace-event format) and a per-stage
+summary at the end of build.log. The exit code is 1 when any build fails.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from font_profiles import DEFAULT_CHAR_LIST, DEFAULT_PROFILES
+import instrumentation
+
+
+CHAR_SETS = {
+    "default": DEFAULT_CHAR_LIST,
+    "ascii": [chr(i) for i in range(0x20, 0x7F)],
+}
+
+WIPBIN_PROFILES = {f"{profile['canvas_width']}x{profile['canvas_height']}": profile for profile in DEFAULT_PROFILES}
+
+# curr_conv GUI defaults
+CURR_CONV_SETTINGS = {
+    "forced_height_1": 14, "forced_height_2": 13, "max_width": 7, "padding_top": 1,
+    "bottom_padding_1": 1, "bottom_padding_2": 2, "threshold_value": 70,
+}
+
+
+def parse_char_set(spec, char_sets):
+    """Turns a char set name or inline list into a list of characters."""
+    if isinstance(spec, str):
+        if spec in char_sets:
+            return list(char_sets[spec])
+        raise ValueError(f"Unknown char set '{spec}'.")
+
+    chars = []
+    for entry in spec:
+        if isinstance(entry, int):
+            chars.append(chr(entry))
+        elif entry.lower().startswith("0x"):
+            first, _, last = entry.partition("-")
+            chars.extend(chr(code_point) for code_point in range(int(first, 16), int(last or first, 16) + 1))
+        else:
+            chars.extend(entry)
+    return chars
+
+
+def load_jobs(job_file, output_root=None):
+    """Reads a job file and returns one job dict per (job, font)."""
+    with open(job_file, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(job_file))
+    output_root = output_root or os.path.join(base_dir, config.get("output_root", "build"))
+    char_sets = dict(CHAR_SETS)
+    for name, spec in config.get("char_sets", {}).items():
+        char_sets[name] = parse_char_set(spec, char_sets)
+
+    jobs = []
+    for i, job in enumerate(config["jobs"]):
+        name = job.get("name", f"job{i + 1}")
+        profiles = job.get("profiles", ["32x64", "16x32"])
+        unknown = [profile for profile in profiles if profile not in WIPBIN_PROFILES and profile != "8x16"]
+        if unknown:
+            raise ValueError(f"Job '{name}': unknown profile(s) {', '.join(unknown)}.")
+        if "8x16" in profiles and len(profiles) > 1:
+            raise ValueError(f"Job '{name}': the 8x16 profile has to be in a job of its own.")
+        dedup = job.get("dedup")
+        if dedup not in (None, "glyphs", "rows") or (dedup and "8x16" in profiles):
+            raise ValueError(f"Job '{name}': dedup has to be \"glyphs\" or \"rows\" on a 32x64/16x32 job.")
+        packed = bool(job.get("packed", False))
+        if packed and "8x16" in profiles:
+            raise ValueError(f"Job '{name}': packed is only available on a 32x64/16x32 job.")
+        raster_backend = job.get("raster_backend", "resize")
+        if raster_backend not in ("resize", "direct") or (raster_backend != "resize" and "8x16" in profiles):
+            raise ValueError(f"Job '{name}': raster_backend has to be \"resize\" or \"direct\" on a 32x64/16x32 job.")
+
+        chars = parse_char_set(job.get("chars", "default"), char_sets)
+        fonts = job.get("fonts") or [job["font"]]
+        for font in fonts:
+            font_path = os.path.join(base_dir, font)
+            stem = os.path.splitext(os.path.basename(font_path))[0]
+            jobs.append({
+                "name": f"{name}/{stem}" if len(fonts) > 1 else name,
+                "font": font_path,
+                "face_index": job.get("face_index", 0),
+                "profiles": profiles,
+                "chars": chars,
+                "settings": job.get("settings", {}),
+                "dedup": dedup,
+                "packed": packed,
+                "raster_backend": raster_backend,
+                "fallback_fonts": [os.path.join(base_dir, fallback) for fallback in job.get("fallback_fonts", [])],
+                "output_dir": os.path.join(output_root, name, stem),
+            })
+    return jobs
+
+
+def _build(job, incremental, use_cache):
+    # The core (NumPy, PIL) is only loaded in the worker processes that build
+    from glyph_cache import GlyphCache
+    from incremental_build import build_font_rom
+
+    if not os.path.exists(job["font"]):
+        raise FileNotFoundError(f"Font not found: {job['font']}")
+
+    if job["profiles"] == ["8x16"]:
+        import curr_conv
+
+        settings = dict(CURR_CONV_SETTINGS, **job["settings"].get("8x16", {}))
+        curr_conv.build_files(job["font"], job["output_dir"], job["chars"], fallback_fonts=job["fallback_fonts"],
+                              **settings)
+    else:
+        profiles = [dict(WIPBIN_PROFILES[profile], **job["settings"].get(profile, {}))
+                    for profile in job["profiles"]]
+        build_font_rom(job["font"], job["output_dir"], profiles, job["chars"],
+                       cache=GlyphCache() if use_cache else None, face_index=job["face_index"],
+                       incremental=incremental, debug_log=True, dedup=job["dedup"],
+                       packed=job["packed"], fallback_fonts=job["fallback_fonts"],
+                       raster_backend=job["raster_backend"])
+
+
+def run_job(job, incremental=True, use_cache=True, profile=False):
+    """
+    Builds one job, sending everything it prints to <output_dir>/build.log.
+    With profile, stage timings and peak memory go to the log and <output_dir>/trace.json.
+
+    Returns:
+        tuple: (name, ok, seconds, log_path)
+    """
+    os.makedirs(job["output_dir"], exist_ok=True)
+    log_path = os.path.join(job["output_dir"], "build.log")
+    start = time.perf_counter()
+    ok = True
+
+    with open(log_path, "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        print(f"Job '{job['name']}': {job['font']} -> {job['output_dir']}")
+        metrics = instrumentation.Instrumentation(trace_memory=True) if profile else None
+        try:
+            with instrumentation.collect(metrics) if metrics else contextlib.nullcontext():
+                _build(job, incremental, use_cache)
+        except Exception:
+            traceback.print_exc()
+            ok = False
+        print(f"{'Finished' if ok else 'FAILED'} in {time.perf_counter() - start:.2f} s")
+
+        if metrics:
+            print(metrics.format_summary())
+            metrics.write_trace(os.path.join(job["output_dir"], "trace.json"))
+
+    return job["name"], ok, time.perf_counter() - start, log_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build font ROMs from a job file without the GUI")
+    parser.add_argument("job_file")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Builds to run at the same time")
+    parser.add_argument("--output-root", help="Overrides the job file's output_root")
+    parser.add_argument("--full", action="store_true", help="Rebuild everything instead of patching the last build")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk glyph cache")
+    parser.add_argument("--profile", action="store_true", help="Write per-stage metrics and a trace.json per build")
+    args = parser.parse_args()
+
+    try:
+        jobs = load_jobs(args.job_file, args.output_root)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Unable to read job file '{args.job_file}'. Reason: {e}", file=sys.stderr)
+        return 2
+
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(jobs)))) as executor:
+        futures = {executor.submit(run_job, job, not args.full, not args.no_cache, args.profile): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                name, ok, seconds, log_path = future.result()
+            except Exception as e:
+                # The worker process itself died; there may be no log
+                print(f"[FAILED] {futures[future]['name']} Reason: {e}")
+                failed += 1
+                continue
+            print(f"[{'ok' if ok else 'FAILED'}] {name} ({seconds:.2f} s) log: {log_path}")
+            failed += not ok
+
+    print(f"{len(jobs) - failed}/{len(jobs)} builds succeeded.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Needed for the process pool when running as a frozen (PyInstaller) executable on Windows
+    multiprocessing.freeze_support()
+    sys.exit(main())
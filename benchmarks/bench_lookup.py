@@ -0,0 +1,88 @@
+"""
+Measures code point -> glyph index lookup throughput of code_point_table.CodePointTable.
+
+Tables are built for the default character list and for larger sparse sets (--sizes random BMP
+code points, in random ROM order so most ranges hold a single code point, the worst case). Each is
+queried with --queries random code points, half of them in the table, through:
+
+    dict            a plain {code point: index} dict, for comparison
+    lookup          CodePointTable.lookup, one bisect per code point (the reference implementation)
+    lookup_many     CodePointTable.lookup_many, one searchsorted call for all of them
+
+The best of --repeat runs is reported as lookups/sec. Results of lookup and lookup_many are checked
+against the dict before timing.
+
+Usage:
+    python benchmarks/bench_lookup.py [--sizes 1000,10000,50000] [--queries 200000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_point_table import CodePointTable, NO_GLYPH
+from font_profiles import DEFAULT_CHAR_LIST
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def char_sets(sizes, rng):
+    yield "default", list(DEFAULT_CHAR_LIST)
+    # BMP code points outside the surrogates
+    bmp = np.concatenate([np.arange(0x20, 0xD800), np.arange(0xE000, 0xFFFF)])
+    for size in sizes:
+        yield f"random {size}", [chr(code_point) for code_point in rng.choice(bmp, size, replace=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Code point lookup table benchmark")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma separated sizes of the random sets")
+    parser.add_argument("--queries", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    print(f"{'set':<14} {'ranges':>7} {'method':<12} {'lookups/s':>14}")
+    for name, chars in char_sets(sizes, rng):
+        table = CodePointTable.from_chars(chars)
+        index = {ord(char): i for i, char in enumerate(dict.fromkeys(chars))}
+
+        present = np.array(list(index), dtype=np.int64)
+        queries = np.where(rng.random(args.queries) < 0.5, rng.choice(present, args.queries),
+                           rng.integers(0, 0x10000, args.queries))
+        query_list = queries.tolist()
+
+        expected = np.array([index.get(code_point, NO_GLYPH) for code_point in query_list], dtype=np.uint16)
+        found = [table.lookup(code_point) for code_point in query_list]
+        scalar = np.array([NO_GLYPH if glyph is None else glyph for glyph in found], dtype=np.uint16)
+        if not np.array_equal(scalar, expected) or not np.array_equal(table.lookup_many(queries), expected):
+            print(f"{name}: lookup results differ from the dict")
+            return 1
+
+        methods = [
+            ("dict", lambda: [index.get(code_point) for code_point in query_list]),
+            ("lookup", lambda: [table.lookup(code_point) for code_point in query_list]),
+            ("lookup_many", lambda: table.lookup_many(queries)),
+        ]
+        for method, function in methods:
+            seconds = best_time(function, args.repeat)
+            print(f"{name:<14} {len(table):>7} {method:<12} {args.queries / seconds:>14,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Measures glyphs/sec of glyph_raster.render_glyphs as the worker count grows.
+
+Usage:
+    python benchmarks/bench_parallel_raster.py path/to/font.ttf [--count 4000] [--height 39] [--width 17]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from glyph_raster import render_glyphs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel rasterization benchmark")
+    parser.add_argument("ttf_path")
+    parser.add_argument("--count", type=int, default=4000, help="Number of code points to render, starting at U+0021")
+    parser.add_argument("--height", type=int, default=39, help="forced_height")
+    parser.add_argument("--width", type=int, default=17, help="max_width")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    chars = [chr(code_point) for code_point in range(0x21, 0x21 + args.count)]
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    reference = None
+    print(f"{'workers':>8} {'seconds':>9} {'glyphs/sec':>11} {'speedup':>8}  identical")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        results = render_glyphs(args.ttf_path, chars, args.height, args.width, workers=workers)
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = (results, elapsed)
+        identical = all(
+            (isinstance(a, Exception) and isinstance(b, Exception)) or
+            (not isinstance(a, Exception) and not isinstance(b, Exception) and np.array_equal(a, b))
+            for a, b in zip(reference[0], results)
+        )
+        print(f"{workers:>8} {elapsed:>9.3f} {len(chars) / elapsed:>11.0f} {reference[1] / elapsed:>7.2f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
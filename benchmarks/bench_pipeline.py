@@ -0,0 +1,187 @@
+"""
+Times every stage of the font-ROM pipeline for growing char sets and compares against a baseline.
+
+Stages: generate_xbm_data, write_xbm, write_mif (with the Low/High split), write_combined_binary and
+Mifsplit.split_mif_32x64_to_16x64, all on the 32x64 profile. For each stage and char-set size the
+best of --repeat runs is reported as glyphs/sec and bytes/sec (bytes produced), plus the tracemalloc
+peak of a separate run.
+
+Usage:
+    python benchmarks/bench_pipeline.py path/to/font.ttf [--sizes 95,1000,4000] [--repeat 3]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.10] [--min-seconds 0.005]
+
+With --baseline, a stage that is more than --threshold slower (or uses that much more peak memory)
+than in the baseline is reported as a regression and the exit code is 1. Save a run with --output
+and pass it as --baseline later; keep the font and machine the same between the two.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import PIL
+
+from font_rom import generate_xbm_data, write_xbm, write_mif, write_combined_binary
+from glyph_atlas import GlyphAtlas
+from glyph_cache import font_fingerprint
+from Mifsplit import split_mif_32x64_to_16x64
+
+
+STAGES = ["generate_xbm_data", "write_xbm", "write_mif", "write_combined_binary", "split_mif_32x64_to_16x64"]
+
+# 32x64 profile as the wipbin GUI builds it
+FORCED_HEIGHT, MAX_WIDTH, CANVAS_WIDTH, CANVAS_HEIGHT = 39, 17, 32, 64
+
+
+def char_set(size):
+    """The printable ASCII set for 95, otherwise the first `size` code points from U+0020 (no surrogates)."""
+    code_points = [code_point for code_point in range(0x20, 0x20 + size + 0x800) if not 0xD800 <= code_point < 0xE000]
+    return [chr(code_point) for code_point in code_points[:size]]
+
+
+def _sizes(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def run_stage(stage, chars, ttf_path, work_dir, state):
+    """Runs one stage; returns the number of bytes it produced. `state` carries results between stages."""
+    mif_file = os.path.join(work_dir, "FontRom64.mif")
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stage == "generate_xbm_data":
+            xbm_data = generate_xbm_data(ttf_path, chars, FORCED_HEIGHT, MAX_WIDTH, CANVAS_WIDTH, CANVAS_HEIGHT,
+                                         padding_top=0, padding_bottom=2)
+            state["atlas"] = GlyphAtlas.from_xbm_dict(xbm_data, CANVAS_WIDTH, CANVAS_HEIGHT)
+            return state["atlas"].planes["normal"].nbytes
+        if stage == "write_xbm":
+            path = os.path.join(work_dir, "FontRom64.xbm")
+            write_xbm(state["atlas"], path, CANVAS_WIDTH, CANVAS_HEIGHT)
+            return _sizes([path])
+        if stage == "write_mif":
+            state["mif_output"] = []
+            write_mif(state["atlas"], mif_file, CANVAS_WIDTH, CANVAS_HEIGHT, state["mif_output"])
+            return _sizes([mif_file] + [os.path.join(work_dir, f"FontRom16x64_{half}.mif") for half in ("Low", "High")])
+        if stage == "write_combined_binary":
+            path = os.path.join(work_dir, "FontRomCombined.bin")
+            write_combined_binary(state["mif_output"], path, target_size=81920)
+            return _sizes([path])
+        if stage == "split_mif_32x64_to_16x64":
+            split_dir = os.path.join(work_dir, "split")
+            split_mif_32x64_to_16x64(mif_file, split_dir)
+            return _sizes([os.path.join(split_dir, name) for name in os.listdir(split_dir)])
+    raise ValueError(f"Unknown stage '{stage}'.")
+
+
+def benchmark(ttf_path, sizes, repeat):
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="fontrom_bench_")
+    try:
+        for size in sizes:
+            chars = char_set(size)
+            state = {}
+            for stage in STAGES:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    produced = run_stage(stage, chars, ttf_path, work_dir, state)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                tracemalloc.start()
+                run_stage(stage, chars, ttf_path, work_dir, state)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                results[f"{stage}@{size}"] = {
+                    "stage": stage,
+                    "glyphs": size,
+                    "seconds": best,
+                    "glyphs_per_sec": size / best,
+                    "bytes_per_sec": produced / best,
+                    "bytes": produced,
+                    "peak_bytes": peak,
+                }
+                print(f"{stage:>26} {size:>6} {best:>9.4f} s {size / best:>11.0f} glyphs/s "
+                      f"{produced / best / 1e6:>9.2f} MB/s {peak / 1e6:>8.2f} MB peak")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds=0.005):
+    """
+    Returns the regressions of `results` against `baseline` as readable lines.
+    Slowdowns smaller than min_seconds are ignored; sub-millisecond stages are mostly timer noise.
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if (result["seconds"] > previous["seconds"] * (1 + threshold)
+                and result["seconds"] - previous["seconds"] > min_seconds):
+            regressions.append(f"{key}: {previous['seconds']:.4f} s -> {result['seconds']:.4f} s "
+                               f"({result['seconds'] / previous['seconds'] - 1:+.0%})")
+        if result["peak_bytes"] > previous["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{key}: peak {previous['peak_bytes'] / 1e6:.2f} MB -> {result['peak_bytes'] / 1e6:.2f} MB "
+                               f"({result['peak_bytes'] / previous['peak_bytes'] - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Font-ROM pipeline benchmark")
+    parser.add_argument("ttf_path")
+    parser.add_argument("--sizes", default="95,1000,4000", help="Comma-separated char-set sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best one is kept")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown/memory growth, 0.10 = 10%%")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"{'stage':>26} {'glyphs':>6} {'time':>11} {'rate':>19} {'throughput':>15} {'memory':>13}")
+    results = benchmark(args.ttf_path, sizes, args.repeat)
+
+    report = {
+        "meta": {
+            "font": os.path.basename(args.ttf_path),
+            "font_sha256": font_fingerprint(args.ttf_path),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "machine": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved as {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("font_sha256") != report["meta"]["font_sha256"]:
+            print("Warning: The baseline was measured with a different font.")
+        regressions = compare(results, baseline["results"], args.threshold, args.min_seconds)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Times the GUI preview (glyph_preview) for the edits a user makes while tuning a profile.
+
+For the 95 printable ASCII characters at 32x64 and 16x32, each case renders the whole set and
+builds the preview image, as one debounced refresh does when every glyph is on screen:
+
+    cold            first render, nothing cached
+    forced_height   forced_height changed: FreeType draws again
+    max_width       max_width changed: cached drawings are scaled again
+    threshold       threshold changed: cached grayscale only
+    padding_top     padding changed: cached grayscale only
+
+The target is under 100 ms per refresh; --check makes the exit code 1 when a case is slower.
+
+Usage:
+    python benchmarks/bench_preview.py path/to/font.ttf [--repeat 5] [--check]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from font_profiles import DEFAULT_PROFILES
+from glyph_preview import GlyphPreview, preview_image
+
+
+TARGET_SECONDS = 0.100
+
+CHARS = [chr(i) for i in range(0x20, 0x7F)]
+
+# Settings changed by each case, applied on top of the profile defaults
+CASES = [
+    ("cold", {}),
+    ("forced_height", {"forced_height": -1}),
+    ("max_width", {"max_width": -1}),
+    ("threshold", {"threshold_value": 32}),
+    ("padding_top", {"padding_top": 1}),
+]
+
+
+def refresh(preview, profile, settings):
+    bitmaps, missing = preview.render(CHARS, profile["canvas_width"], profile["canvas_height"],
+                                      settings["forced_height"], settings["max_width"],
+                                      settings["threshold_value"], settings["padding_top"])
+    return preview_image(bitmaps, columns=6, zoom=2, missing=missing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GUI preview refresh benchmark")
+    parser.add_argument("ttf_path")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Exit with 1 when a case misses the target")
+    args = parser.parse_args()
+
+    slow = 0
+    print(f"{'profile':<8} {'case':<14} {'best ms':>9}")
+    for profile in DEFAULT_PROFILES:
+        name = f"{profile['canvas_width']}x{profile['canvas_height']}"
+        base = {key: profile[key] for key in ("forced_height", "max_width", "threshold_value", "padding_top")}
+        for case, change in CASES:
+            best = None
+            for i in range(args.repeat):
+                preview = GlyphPreview(args.ttf_path)
+                refresh(preview, profile, base)  # Warm the caches with the defaults
+                if case == "cold":
+                    preview = GlyphPreview(args.ttf_path)
+                # Alternate the direction so no repeat is served from the previous one's cache
+                settings = {key: base[key] + (value if i % 2 == 0 else -value) for key, value in change.items()}
+                start = time.perf_counter()
+                refresh(preview, profile, dict(base, **settings))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            slow += case != "cold" and best > TARGET_SECONDS
+            print(f"{name:<8} {case:<14} {best * 1000:>9.1f}")
+
+    if args.check and slow:
+        print(f"{slow} case(s) slower than {TARGET_SECONDS * 1000:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
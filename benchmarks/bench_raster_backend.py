@@ -0,0 +1,120 @@
+"""
+Compares the two rasterization backends of glyph_raster for speed and output.
+
+    resize          rasterize_glyph: PIL draws at twice forced_height, LANCZOS resize, threshold
+    direct          DirectRasterizer: FreeType mono bitmap at the target size (autohinted)
+    direct-unhinted DirectRasterizer(hinting=False)
+
+For each profile of font_profiles.DEFAULT_PROFILES the whole character list is rendered in process,
+best of --repeat runs, with a font / rasterizer opened fresh for every run (opening is not timed).
+The direct backends are then compared with the resize output pixel by pixel: glyphs with the same
+shape, differing pixels among them, and the ink (set pixels) each backend produces. --show prints
+the glyphs that differ most side by side.
+
+Usage:
+    python benchmarks/bench_raster_backend.py path/to/font.ttf [--chars default|ascii] [--repeat 5] [--show 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from font_profiles import DEFAULT_CHAR_LIST, DEFAULT_PROFILES
+from glyph_raster import render_glyphs, DirectRasterizer
+
+
+BACKENDS = [
+    ("resize", "resize", {}),
+    ("direct", "direct", {"hinting": True}),
+    ("direct-unhinted", "direct", {"hinting": False}),
+]
+
+
+def open_font(ttf_path, backend, options, font_size):
+    if backend == "direct":
+        return DirectRasterizer(ttf_path, **options)
+    from PIL import ImageFont
+
+    return ImageFont.truetype(ttf_path, font_size)
+
+
+def render(ttf_path, chars, profile, backend, options, repeat):
+    """Returns (best seconds, results of the last run)."""
+    best = None
+    for _ in range(repeat):
+        font = open_font(ttf_path, backend, options, profile["forced_height"] * 2)
+        start = time.perf_counter()
+        results = render_glyphs(ttf_path, chars, profile["forced_height"], profile["max_width"],
+                                profile["threshold_value"], font=font, backend=backend)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def compare(reference, results):
+    """Returns (same shape count, differing pixels, pixels compared, [(differing pixels, position)])."""
+    same_shape = differing = compared = 0
+    per_glyph = []
+    for i, (a, b) in enumerate(zip(reference, results)):
+        if isinstance(a, Exception) or isinstance(b, Exception) or a.shape != b.shape:
+            continue
+        same_shape += 1
+        count = int(np.count_nonzero(a != b))
+        differing += count
+        compared += a.size
+        per_glyph.append((count, i))
+    return same_shape, differing, compared, sorted(per_glyph, reverse=True)
+
+
+def ink(results):
+    return sum(int(result.sum()) for result in results if not isinstance(result, Exception))
+
+
+def side_by_side(char, arrays, names):
+    lines = [f"'{char}': " + "   ".join(f"{name:<{array.shape[1]}}" for name, array in zip(names, arrays))]
+    for rows in zip(*arrays):
+        lines.append("     " + "   ".join("".join("#" if pixel else "." for pixel in row) for row in rows))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resize vs direct FreeType rasterization benchmark")
+    parser.add_argument("ttf_path")
+    parser.add_argument("--chars", choices=["default", "ascii"], default="default")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--show", type=int, default=0, help="Print this many of the most different glyphs")
+    args = parser.parse_args()
+
+    chars = DEFAULT_CHAR_LIST if args.chars == "default" else [chr(i) for i in range(0x20, 0x7F)]
+    chars = [char for char in dict.fromkeys(chars) if char != " "]
+
+    for profile in DEFAULT_PROFILES:
+        print(f"{profile['canvas_width']}x{profile['canvas_height']}: forced_height {profile['forced_height']}, "
+              f"max_width {profile['max_width']}, {len(chars)} glyphs")
+        print(f"  {'backend':<16} {'ms':>8} {'glyphs/s':>9} {'speedup':>8} {'same shape':>11} "
+              f"{'pixel diff':>11} {'ink':>7}")
+        outputs = {}
+        resize_seconds = None
+        for name, backend, options in BACKENDS:
+            seconds, results = render(args.ttf_path, chars, profile, backend, options, args.repeat)
+            outputs[name] = results
+            resize_seconds = resize_seconds or seconds
+            same_shape, differing, compared, _ = compare(outputs["resize"], results)
+            print(f"  {name:<16} {seconds * 1000:>8.1f} {len(chars) / seconds:>9.0f} {resize_seconds / seconds:>7.2f}x "
+                  f"{same_shape:>5}/{len(chars):<5} {100 * differing / max(compared, 1):>10.2f}% {ink(results):>7}")
+
+        if args.show:
+            _, _, _, worst = compare(outputs["resize"], outputs["direct"])
+            for _, i in worst[:args.show]:
+                print(side_by_side(chars[i], [outputs[name][i] for name, _, _ in BACKENDS],
+                                   [name for name, _, _ in BACKENDS]))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Measures start-up time of the converter entry points in fresh interpreters.
+
+Each case runs in a new `python -c` process (best of --repeat) and reports which of the heavy
+modules (numpy, PIL, tkinter) it ended up loading. "eager imports" is what every start used to pay
+when wipbin imported tkinter, PIL and numpy at the top.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 10] [--window]
+
+--window also creates and destroys the Tk root window (needs a display).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_MODULES = ("import sys, json; "
+                  "print(json.dumps([m for m in ('numpy', 'PIL', 'tkinter') if m in sys.modules]))")
+
+CASES = [
+    ("interpreter only", "pass"),
+    ("eager imports", "import tkinter, numpy; from PIL import Image, ImageDraw, ImageFont"),
+    ("wipbin GUI start", "import wipbin, tkinter"),
+    ("curr_conv GUI start", "import curr_conv, tkinter"),
+    ("headless batch_build", "import batch_build"),
+    ("headless font_rom", "import font_rom"),
+]
+
+WINDOW_CASES = [
+    ("wipbin window", "import wipbin, tkinter; root = tkinter.Tk(); root.update(); root.destroy()"),
+]
+
+
+def time_case(code, repeat):
+    """Returns (best seconds, heavy modules loaded) for running `code` in a fresh interpreter."""
+    best = None
+    modules = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", f"{code}\n{REPORT_MODULES}"], cwd=REPO_DIR,
+                                   capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        modules = json.loads(completed.stdout.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    return best, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up time benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--window", action="store_true", help="Also time creating the Tk window")
+    args = parser.parse_args()
+
+    cases = CASES + (WINDOW_CASES if args.window else [])
+    print(f"{'case':<24} {'best ms':>9}  heavy modules loaded")
+    for name, code in cases:
+        try:
+            seconds, modules = time_case(code, args.repeat)
+        except RuntimeError as e:
+            print(f"{name:<24} {'failed':>9}  {e}")
+            continue
+        print(f"{name:<24} {seconds * 1000:>9.1f}  {', '.join(modules) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+MSB_FIRST = "msb"
+LSB_FIRST = "lsb"
+
+
+def pack_glyphs(glyphs, bit_order=LSB_FIRST, word_bytes=1, byte_order="big"):
+    """
+    Packs a whole stack of thresholded glyphs into ROM bytes in one NumPy call.
+
+    Args:
+        glyphs: Array of shape (glyphs, rows, cols) or (rows, cols); any non-zero pixel is set.
+        bit_order (str): "msb" puts the leftmost pixel in bit 7 of each byte,
+                         "lsb" puts it in bit 0 (what reverse_bits used to produce).
+        word_bytes (int): Number of bytes per ROM word when reordering bytes (e.g. 2 for 16-bit words).
+        byte_order (str): "big" keeps the leftmost byte first inside each word,
+                          "little" swaps the bytes inside each word.
+
+    Returns:
+        numpy.ndarray: uint8 array of shape (glyphs, rows, bytes_per_row).
+                       Rows whose width is not a multiple of 8 are zero padded on the right.
+    """
+    if bit_order not in (MSB_FIRST, LSB_FIRST):
+        raise ValueError(f"Unknown bit order '{bit_order}', expected '{MSB_FIRST}' or '{LSB_FIRST}'.")
+    if byte_order not in ("big", "little"):
+        raise ValueError(f"Unknown byte order '{byte_order}', expected 'big' or 'little'.")
+
+    glyphs = np.asarray(glyphs)
+    if glyphs.ndim == 2:
+        glyphs = glyphs[np.newaxis]
+    if glyphs.ndim != 3:
+        raise ValueError(f"Expected a (glyphs, rows, cols) array, got shape {glyphs.shape}.")
+
+    packed = np.packbits(glyphs != 0, axis=-1, bitorder="big" if bit_order == MSB_FIRST else "little")
+
+    if byte_order == "little" and word_bytes > 1:
+        bytes_per_row = packed.shape[-1]
+        if bytes_per_row % word_bytes:
+            raise ValueError(f"Row of {bytes_per_row} bytes does not split into {word_bytes}-byte words.")
+        words = packed.reshape(packed.shape[:-1] + (bytes_per_row // word_bytes, word_bytes))
+        packed = words[..., ::-1].reshape(packed.shape)
+
+    return np.ascontiguousarray(packed)
+
+
+def unpack_glyphs(packed, canvas_width, bit_order=LSB_FIRST, word_bytes=1, byte_order="big"):
+    """
+    Inverse of pack_glyphs: expands packed rows back into a (glyphs, rows, canvas_width) 0/1 array.
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    if packed.ndim == 2:
+        packed = packed[np.newaxis]
+
+    if byte_order == "little" and word_bytes > 1:
+        bytes_per_row = packed.shape[-1]
+        words = packed.reshape(packed.shape[:-1] + (bytes_per_row // word_bytes, word_bytes))
+        packed = words[..., ::-1].reshape(packed.shape)
+
+    return np.unpackbits(packed, axis=-1, count=canvas_width,
+                         bitorder="big" if bit_order == MSB_FIRST else "little")
+
+
+def packed_to_rows(packed_glyph):
+    """
+    Converts one packed glyph (rows, bytes_per_row) into the list-of-row-lists used by write_xbm/write_mif.
+    """
+    return np.asarray(packed_glyph).tolist()
@@ -0,0 +1,181 @@
+"""
+Code point -> glyph index lookup for the ROMs, so the device does not need a hand-maintained
+mapping for U+2026, U+2190-U+2193, U+21CC, U+25BC, U+2713 and the like.
+
+Characters are stored in ROM order, so a glyph's index is its position in the atlas. The table is
+a sorted list of ranges (first code point, last code point, index of the first one): consecutive
+code points at consecutive ROM positions share a range, and the default character list needs 8
+of them. A lookup is a binary search over the ranges, O(log ranges).
+
+Binary layout (big-endian 16-bit words):
+
+    word 0      range count N
+    word 1      glyph count
+    word 2..    N ranges of 3 words: first code point, last code point, glyph index of the first
+
+The same ranges are written as a C header (with the search as a static inline function) and as a
+48-bit wide MIF, one range per address.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from atomic_file import AtomicFile
+from mif_stream import MifWriter
+
+
+NO_GLYPH = 0xFFFF
+
+RANGE_DTYPE = np.dtype([("first", ">u2"), ("last", ">u2"), ("index", ">u2")])
+
+# Output paths written by write_lookup_files
+LookupFiles = namedtuple("LookupFiles", ["binary", "header", "mif"])
+
+
+class CodePointTable:
+    """
+    Sorted range table. This is the reference implementation of the lookup the C header and the
+    MIF are meant for.
+
+    Attributes:
+        ranges (numpy.ndarray): RANGE_DTYPE array sorted by first code point, without overlaps.
+        glyph_count (int): Glyphs the indexes refer to.
+    """
+
+    def __init__(self, ranges, glyph_count):
+        self.ranges = np.asarray(ranges, dtype=RANGE_DTYPE)
+        self.glyph_count = glyph_count
+        # Plain lists for the scalar lookup; bisect on a list beats NumPy for one value at a time
+        self._firsts = self.ranges["first"].tolist()
+        self._lasts = self.ranges["last"].tolist()
+        self._indexes = self.ranges["index"].tolist()
+
+    @classmethod
+    def from_chars(cls, chars):
+        """Builds the table for characters in ROM order (character i is glyph i); duplicates keep their first position."""
+        chars = list(chars)
+        positions = {}
+        for index, char in enumerate(chars):
+            positions.setdefault(ord(char), index)
+        if any(code_point > 0xFFFF for code_point in positions):
+            raise ValueError("Code points above U+FFFF do not fit the 16-bit lookup table.")
+        if len(chars) >= NO_GLYPH:
+            raise ValueError(f"{len(chars)} glyphs do not fit 16-bit glyph indexes.")
+
+        ranges = []
+        for code_point, index in sorted(positions.items()):
+            if ranges and code_point == ranges[-1][1] + 1 and index == ranges[-1][2] + code_point - ranges[-1][0]:
+                ranges[-1][1] = code_point
+            else:
+                ranges.append([code_point, code_point, index])
+        return cls(np.array([tuple(entry) for entry in ranges], dtype=RANGE_DTYPE), len(chars))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Reads a table from its binary layout."""
+        words = np.frombuffer(data, dtype=">u2", count=2)
+        count, glyph_count = int(words[0]), int(words[1])
+        return cls(np.frombuffer(data, dtype=RANGE_DTYPE, count=count, offset=4).copy(), glyph_count)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def to_bytes(self):
+        return np.array([len(self.ranges), self.glyph_count], dtype=">u2").tobytes() + self.ranges.tobytes()
+
+    def lookup(self, character):
+        """Returns the glyph index of a character or code point, or None when the ROM does not have it."""
+        code_point = character if isinstance(character, int) else ord(character)
+        position = bisect_right(self._firsts, code_point) - 1
+        if position < 0 or code_point > self._lasts[position]:
+            return None
+        return self._indexes[position] + code_point - self._firsts[position]
+
+    def lookup_many(self, code_points):
+        """Looks up an array of code points at once; code points the ROM does not have give NO_GLYPH."""
+        code_points = np.asarray(code_points, dtype=np.int64)
+        result = np.full(code_points.shape, NO_GLYPH, dtype=np.uint16)
+        if not len(self.ranges):
+            return result
+        firsts = self.ranges["first"].astype(np.int64)
+        position = np.searchsorted(firsts, code_points, side="right") - 1
+        clipped = np.maximum(position, 0)
+        hit = (position >= 0) & (code_points <= self.ranges["last"].astype(np.int64)[clipped])
+        result[hit] = (self.ranges["index"].astype(np.int64)[clipped] + code_points - firsts[clipped])[hit]
+        return result
+
+
+def _char_comment(code_point):
+    char = chr(code_point)
+    return repr(char) if char.isprintable() and char not in "*/\\" else f"U+{code_point:04X}"
+
+
+def format_c_header(table, prefix="font_rom"):
+    """Returns a C header holding the ranges and a binary search over them."""
+    macro = prefix.upper()
+    lines = [
+        "/* Code point -> glyph index lookup, generated by code_point_table.py; do not edit. */",
+        f"#ifndef {macro}_LOOKUP_H",
+        f"#define {macro}_LOOKUP_H",
+        "",
+        "#include <stdint.h>",
+        "",
+        f"#define {macro}_GLYPH_COUNT {table.glyph_count}",
+        f"#define {macro}_RANGE_COUNT {len(table)}",
+        f"#define {macro}_NO_GLYPH 0x{NO_GLYPH:04X}",
+        "",
+        "/* {first code point, last code point, glyph index of the first}, sorted by first code point */",
+        f"static const uint16_t {prefix}_ranges[{max(len(table), 1)}][3] = {{",
+    ]
+    for first, last, index in table.ranges.tolist():
+        lines.append(f"    {{0x{first:04X}, 0x{last:04X}, {index}}},  /* {_char_comment(first)}"
+                     + (f"..{_char_comment(last)}" if last != first else "") + " */")
+    if not len(table):
+        lines.append("    {0, 0, 0}")
+    lines += [
+        "};",
+        "",
+        f"/* Returns the glyph index of a code point, or {macro}_NO_GLYPH when the ROM does not have it. */",
+        f"static inline uint16_t {prefix}_glyph_index(uint32_t code_point)",
+        "{",
+        "    int low = 0;",
+        f"    int high = {macro}_RANGE_COUNT - 1;",
+        "    while (low <= high) {",
+        "        int mid = (low + high) / 2;",
+        f"        if (code_point < {prefix}_ranges[mid][0]) {{",
+        "            high = mid - 1;",
+        f"        }} else if (code_point > {prefix}_ranges[mid][1]) {{",
+        "            low = mid + 1;",
+        "        } else {",
+        f"            return (uint16_t)({prefix}_ranges[mid][2] + (code_point - {prefix}_ranges[mid][0]));",
+        "        }",
+        "    }",
+        f"    return {macro}_NO_GLYPH;",
+        "}",
+        "",
+        f"#endif /* {macro}_LOOKUP_H */",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def write_lookup_files(table, base_path, prefix="font_rom"):
+    """
+    Writes <base_path>.bin, <base_path>.h and <base_path>.mif for a table.
+
+    Returns:
+        LookupFiles
+    """
+    files = LookupFiles(f"{base_path}.bin", f"{base_path}.h", f"{base_path}.mif")
+    with AtomicFile(files.binary, "wb") as f:
+        f.write(table.to_bytes())
+    with AtomicFile(files.header, "w", encoding="utf-8") as f:
+        f.write(format_c_header(table, prefix))
+
+    # One 48-bit word per range: first code point, last code point, index
+    with MifWriter(files.mif, max(len(table), 1), 48) as writer:
+        for address, (first, last, index) in enumerate(table.ranges.tolist()):
+            writer.comment(_char_comment(first) + (f"..{_char_comment(last)}" if last != first else ""))
+            writer.word(address, f"{first:04X}{last:04X}{index:04X}")
+    return files
@@ -1,8 +1,4 @@
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
 import os
-import tkinter as tk
-from tkinter import filedialog, messagebox
 
 def strikeout_data(data, width):
     """ Adds a strikeout line across the 7th and 8th row of character data. """
@@ -13,57 +9,91 @@ def strikeout_data(data, width):
 
 
 def generate_xbm_data(ttf_path, char_list, forced_height_1, forced_height_2, max_width=7, threshold_value=70,
-                      padding_top=1, bottom_padding_1=1, bottom_padding_2=2, padding_side="center"):
+                      padding_top=1, bottom_padding_1=1, bottom_padding_2=2, padding_side="center", verbose=False,
+                      fallback_fonts=()):
     """
     Generates XBM data for a list of characters with dual heights and strikeout options.
     Allows certain characters (e.g., periods, commas) to render at their natural dimensions.
+
+    Each glyph is drawn once, resized and thresholded once per distinct height, and the strikeout
+    variant is derived from the thresholded normal array. Set verbose=True for a per-glyph log.
+    Characters the font does not have are drawn with the first of fallback_fonts that has them;
+    the fonts come from the shared font registry, and coverage is checked from their cmaps before
+    anything is drawn. Characters in none of the fonts are still drawn with ttf_path, which gives its
+    .notdef glyph (usually a box); they keep their place in the output and are listed as such.
+    threshold_value "auto" thresholds every glyph at its own Otsu threshold, per height.
     """
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    from bitpack import pack_glyphs, MSB_FIRST
+    from font_registry import fallback_chain, format_coverage_report
+    from glyph_raster import threshold_glyph
+
     font_size = max(forced_height_1, forced_height_2) * 2
-    font = ImageFont.truetype(ttf_path, font_size)
+    chain = fallback_chain(ttf_path, fallback_fonts=fallback_fonts)
+    report = chain.coverage(char_list)
+    if fallback_fonts or report.missing:
+        print(format_coverage_report(report))
+    fonts = {char: face.font(font_size) for face, chars in report.resolved for char in chars}
     all_xbm_data = {}
-    missing_characters = []  # Track missing characters
+    missing_characters = []  # Track characters that could not be processed
     period_set = {'.', ','}  # Characters to render at their natural height
 
-    # Define configurations to process each height and variant
-    output_configurations = [
-        (forced_height_1, padding_top, bottom_padding_1, "normal"),
-        (forced_height_1, padding_top, bottom_padding_1, "strikeout"),
-        (forced_height_2, padding_top, bottom_padding_2, "normal"),
-        (forced_height_2, padding_top, bottom_padding_2, "strikeout"),
-    ]
-
-    for height, top_padding, bottom_padding, variant_label in output_configurations:
-        for char in char_list:
-            try:
-                # Determine if character should use forced height or native rendering
-                use_native_height = char in period_set
-
-                (width, actual_height), (offset_x, offset_y) = font.font.getsize(char)
+    # Distinct heights to render, in configuration order (normal and strikeout share a render)
+    heights = list(dict.fromkeys([forced_height_1, forced_height_2]))
+    top_padding = padding_top
 
-                if actual_height == 0 or width == 0:
-                    if char == ' ':
-                        width, actual_height = max_width, height
-                    else:
-                        raise ValueError(f"Character '{char}' rendered with zero dimensions.")
+    # Width of the previous resized glyph per height; natively sized punctuation is centred with it,
+    # matching what the old per-configuration loop produced
+    last_new_width = {}
+    rendered_count = 0
 
+    for char in char_list:
+        font = fonts[char] if char in fonts else chain.primary.font(font_size)
+        try:
+            (width, actual_height), (offset_x, offset_y) = font.font.getsize(char)
+            image = None
+            if actual_height != 0 and width != 0:
                 image = Image.new('L', (width, actual_height), 0)
                 draw = ImageDraw.Draw(image)
                 draw.text((-offset_x, -offset_y), char, font=font, fill=255)
+            elif char != ' ':
+                raise ValueError(f"Character '{char}' rendered with zero dimensions.")
+        except Exception as e:
+            if char not in missing_characters:
+                missing_characters.append(char)
+            print(f"Warning: Unable to process character '{char}'. Reason: {e}")
+            continue
+
+        # Determine if character should use forced height or native rendering
+        use_native_height = char in period_set
+
+        for height in heights:
+            try:
+                if image is None:
+                    # Blank space with no outline: use an empty max_width x height image
+                    glyph_image = Image.new('L', (max_width, height), 0)
+                    glyph_width, glyph_height = max_width, height
+                else:
+                    glyph_image = image
+                    glyph_width, glyph_height = width, actual_height
 
                 if use_native_height:
                     # Skip resizing for native rendering
-                    img_resized = image
+                    img_resized = glyph_image
+                    new_width = last_new_width[height]
                 else:
                     # Calculate aspect ratio and resize to forced height
-                    aspect_ratio = image.width / image.height
+                    aspect_ratio = glyph_image.width / glyph_image.height
                     new_width = min(int(height * aspect_ratio), max_width)
-                    img_resized = image.resize((new_width, height), Image.Resampling.LANCZOS)
+                    last_new_width[height] = new_width
+                    img_resized = glyph_image.resize((new_width, height), Image.Resampling.LANCZOS)
 
                 resized_array = np.array(img_resized)
-                binary_array = (resized_array > threshold_value).astype(np.uint8)
+                binary_array = threshold_glyph(resized_array, threshold_value)
 
                 # Apply padding to create an 8x16 array
-                total_height = height + top_padding + bottom_padding
                 padded_array = np.zeros((16, 8), dtype=np.uint8)
 
                 # Calculate padding column alignment
@@ -78,31 +108,31 @@ def generate_xbm_data(ttf_path, char_list, forced_height_1, forced_height_2, max
                 start_row = top_padding
                 if use_native_height:
                     # Place the character data at the bottom of the padded array
-                    bottom_row = padded_array.shape[0] - actual_height
-                    padded_array[bottom_row:, start_col:start_col + width] = binary_array[:, :width]
+                    bottom_row = padded_array.shape[0] - glyph_height
+                    padded_array[bottom_row:, start_col:start_col + glyph_width] = binary_array[:, :glyph_width]
                 else:
                     # Place the character data as usual with top padding
                     padded_array[start_row:start_row + height, start_col:start_col + new_width] = binary_array[:, :new_width]
 
-                # Apply strikeout if the variant is "strikeout"
-                if variant_label == "strikeout" and not use_native_height:
-                    padded_array = strikeout_data(padded_array.copy(), new_width)
+                # Convert padded array to xbm_data (byte values), leftmost pixel in bit 7
+                normal_data = pack_glyphs(padded_array, bit_order=MSB_FIRST)[0, :, 0].tolist()
 
-                # Convert padded array to xbm_data (byte values)
-                xbm_data = []
-                for row in padded_array:
-                    byte_value = 0
-                    for col in range(8):
-                        if row[col] > 0:
-                            byte_value |= (1 << (7 - col))
-                    xbm_data.append(byte_value)
+                # The strikeout variant is the same bitmap with the strikeout rows set
+                if use_native_height:
+                    strikeout = normal_data[:]
+                else:
+                    strikeout = strikeout_data(normal_data[:], new_width)
 
                 # Store the data in all_xbm_data
                 if char not in all_xbm_data:
                     all_xbm_data[char] = {}
-                all_xbm_data[char][f"{variant_label}_{height}"] = xbm_data
+                all_xbm_data[char][f"normal_{height}"] = normal_data
+                all_xbm_data[char][f"strikeout_{height}"] = strikeout
+                rendered_count += 1
 
-                print(f"Generated data for character '{char}', Height: {height if not use_native_height else 'native'}, Variant: {variant_label}, Data Length: {len(xbm_data)}")
+                if verbose:
+                    for variant_label in ("normal", "strikeout"):
+                        print(f"Generated data for character '{char}', Height: {height if not use_native_height else 'native'}, Variant: {variant_label}, Data Length: {len(normal_data)}")
 
             except Exception as e:
                 # Log missing characters
@@ -110,7 +140,15 @@ def generate_xbm_data(ttf_path, char_list, forced_height_1, forced_height_2, max
                     missing_characters.append(char)
                 print(f"Warning: Unable to process character '{char}'. Reason: {e}")
 
+    print(f"Generated {len(all_xbm_data)} characters ({rendered_count} renders) at heights "
+          f"{', '.join(str(height) for height in heights)}, normal and strikeout variants.")
+
     # Log all missing characters at the end
+    if report.missing:
+        print(f"\nThe following characters are in none of the fonts and were drawn as the .notdef glyph "
+              f"of {os.path.basename(ttf_path)}:")
+        for char in report.missing:
+            print(f"- '{char}' (Unicode: {ord(char)})")
     if missing_characters:
         print("\nThe following characters were not in the ttf file:")
         for char in missing_characters:
@@ -121,7 +159,10 @@ def generate_xbm_data(ttf_path, char_list, forced_height_1, forced_height_2, max
 
 
 def write_xbm(all_xbm_data, output_file, char_list):
-    """ Writes all character data to a combined XBM file in the specified order. """
+    """ Writes all character data to a combined XBM file in the specified order. Accepts a GlyphAtlas too. """
+    from glyph_atlas import as_variant_dict
+
+    all_xbm_data = as_variant_dict(all_xbm_data)
     with open(output_file, "w", encoding="utf-8") as f:
         f.write("# Combined XBM file with dual heights and strikeout versions, grouped by type\n\n")
 
@@ -154,7 +195,11 @@ def write_mif(char_list, all_xbm_data, output_dir, height, depth=4096, width=8):
     """
     Writes the data for each character to a separate MIF file for the specified height.
     Includes both normal and strikeout characters in the same file.
+    Accepts a GlyphAtlas or the {char: {label: [byte, ...]}} dict.
     """
+    from glyph_atlas import as_variant_dict
+
+    all_xbm_data = as_variant_dict(all_xbm_data)
     file_name = os.path.join(output_dir, f"FontRom_{height}.mif")
     with open(file_name, "w", encoding="utf-8") as f:
         # MIF header
@@ -205,9 +250,14 @@ def write_bin(char_list, all_xbm_data, output_dir):
     - 13px height: Normal and Strikeout (0x0000 - 0x0FFF)
     - 14px height: Normal and Strikeout (0x1000 - 0x1FFF)
     - The last 2 bytes (0x1FFE, 0x1FFF) store a checksum.
+    Accepts a GlyphAtlas or the {char: {label: [byte, ...]}} dict.
     """
+    from glyph_atlas import as_variant_dict
+    from rom_checksum import byte_sum_checksum
+
+    all_xbm_data = as_variant_dict(all_xbm_data)
     binary_file_path = os.path.join(output_dir, "FontRom_combined.bin")
-    data_array = [0x00] * 8192  # Initialize array for 8KB binary file
+    data_array = bytearray(8192)  # 8KB binary file
 
     # Define sections for binary file
     sections = {
@@ -230,48 +280,63 @@ def write_bin(char_list, all_xbm_data, output_dir):
                 current_address += 16  # Increment by 16 bytes per character
 
     # Compute checksum over the first 8190 bytes
-    checksum = sum(data_array[:-2]) & 0xFFFF
+    checksum = byte_sum_checksum(memoryview(data_array)[:-2])
     data_array[-2] = (checksum >> 8) & 0xFF  # High byte
     data_array[-1] = checksum & 0xFF         # Low byte
 
     # Write binary file
     with open(binary_file_path, "wb") as bin_file:
-        bin_file.write(bytearray(data_array))
+        bin_file.write(data_array)
 
     print(f"Binary file saved as {binary_file_path}")
 
 
 
-import tkinter as tk
-from tkinter import filedialog, messagebox
 import os
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
+
+# tkinter, PIL and NumPy are imported where they are used: the GUI comes up with tkinter alone,
+# and the headless build_files path never loads tkinter
 
 # Your existing functions go here: generate_xbm_data, write_xbm, write_mif, write_bin, etc.
 
+def build_files(ttf_path, output_dir, char_list, forced_height_1, forced_height_2, max_width, padding_top,
+                bottom_padding_1, bottom_padding_2, threshold_value=70, fallback_fonts=()):
+    """
+    Writes combined.xbm, the two MIFs and FontRom_combined.bin without any GUI interaction.
+    Characters missing from the font are drawn with the first of fallback_fonts that has them.
+    """
+    all_xbm_data = generate_xbm_data(
+        ttf_path, char_list, 
+        forced_height_1=forced_height_1, 
+        forced_height_2=forced_height_2, 
+        max_width=max_width, 
+        threshold_value=threshold_value,
+        padding_top=padding_top, 
+        bottom_padding_1=bottom_padding_1, 
+        bottom_padding_2=bottom_padding_2,
+        fallback_fonts=fallback_fonts
+    )
+    write_xbm(all_xbm_data, os.path.join(output_dir, "combined.xbm"), char_list)
+    write_mif(char_list, all_xbm_data, output_dir, forced_height_1)
+    write_mif(char_list, all_xbm_data, output_dir, forced_height_2)
+    write_bin(char_list, all_xbm_data, output_dir)
+
 def run_conversion(ttf_path, output_dir, char_list, forced_height_1, forced_height_2, max_width, padding_top, bottom_padding_1, bottom_padding_2):
     """Run the conversion process."""
+    from tkinter import messagebox
+
     try:
-        all_xbm_data = generate_xbm_data(
-            ttf_path, char_list, 
-            forced_height_1=forced_height_1, 
-            forced_height_2=forced_height_2, 
-            max_width=max_width, 
-            padding_top=padding_top, 
-            bottom_padding_1=bottom_padding_1, 
-            bottom_padding_2=bottom_padding_2
-        )
-        write_xbm(all_xbm_data, os.path.join(output_dir, "combined.xbm"), char_list)
-        write_mif(char_list, all_xbm_data, output_dir, forced_height_1)
-        write_mif(char_list, all_xbm_data, output_dir, forced_height_2)
-        write_bin(char_list, all_xbm_data, output_dir)
+        build_files(ttf_path, output_dir, char_list, forced_height_1, forced_height_2, max_width, padding_top,
+                    bottom_padding_1, bottom_padding_2)
         messagebox.showinfo("Success", "Conversion completed successfully!")
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
 
 def browse_file(entry):
     """Open a file dialog and set the entry text to the selected file path."""
+    import tkinter as tk
+    from tkinter import filedialog
+
     file_path = filedialog.askopenfilename(filetypes=[("TrueType Font", "*.ttf")])
     if file_path:
         entry.delete(0, tk.END)
@@ -279,6 +344,9 @@ def browse_file(entry):
 
 def browse_directory(entry):
     """Open a directory dialog and set the entry text to the selected directory."""
+    import tkinter as tk
+    from tkinter import filedialog
+
     directory = filedialog.askdirectory()
     if directory:
         entry.delete(0, tk.END)
@@ -286,6 +354,9 @@ def browse_directory(entry):
 
 # Build the GUI
 def main_gui():
+    import tkinter as tk
+    from tkinter import messagebox
+
     root = tk.Tk()
     root.title("TTF to XBM Converter")
     
@@ -2,14 +2,7 @@ from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import os
 
-
-def reverse_bits(byte):
-    """Reverse the bits in a single byte (8 bits)."""
-    reversed_byte = 0
-    for i in range(8):
-        if byte & (1 << i):
-            reversed_byte |= (1 << (7 - i))
-    return reversed_byte
+from bitpack import pack_glyphs, LSB_FIRST
 
 
 def generate_xbm_data(ttf_path, char_list, forced_height, max_width, canvas_width, canvas_height,
@@ -20,7 +13,8 @@ def generate_xbm_data(ttf_path, char_list, forced_height, max_width, canvas_widt
     """
     font_size = forced_height * 2
     font = ImageFont.truetype(ttf_path, font_size)
-    all_xbm_data = {}
+    rendered_chars = []
+    rendered_arrays = []
 
     # Define punctuation characters and a scaling ratio
     punctuation_set = {',', '.'}
@@ -73,28 +67,22 @@ def generate_xbm_data(ttf_path, char_list, forced_height, max_width, canvas_widt
             padded_array[vertical_start:vertical_start + target_height,
                          horizontal_padding:horizontal_padding + scaled_width] = binary_array
 
-            # Convert each row to two bytes (16 bits)
-            xbm_data = []
-            for row in padded_array:
-                byte1, byte2 = 0, 0
-                for col in range(8):  # First byte (leftmost 8 bits)
-                    if row[col]:
-                        byte1 |= (1 << (7 - col))
-                for col in range(8, 16):  # Second byte (rightmost 8 bits)
-                    if col < canvas_width and row[col]:
-                        byte2 |= (1 << (7 - (col - 8)))  # Adjust bit position correctly
-
-                # Reverse bits for compatibility
-                byte1 = reverse_bits(byte1)
-                byte2 = reverse_bits(byte2)
-
-                xbm_data.append((byte1, byte2))  # Append as a tuple of 2 bytes
-
-            all_xbm_data[char] = xbm_data
+            rendered_chars.append(char)
+            rendered_arrays.append(padded_array)
 
         except Exception as e:
             print(f"Warning: Unable to process character '{char}'. Reason: {e}")
 
+    # Pack all glyphs at once; each row keeps its leftmost 16 bits as two bit-reversed bytes,
+    # zero-filled on canvases narrower than 16 so every row still has exactly two bytes
+    all_xbm_data = {}
+    if rendered_arrays:
+        glyphs = np.stack(rendered_arrays)[:, :, :16]
+        glyphs = np.pad(glyphs, ((0, 0), (0, 0), (0, 16 - glyphs.shape[2])))
+        packed = pack_glyphs(glyphs, bit_order=LSB_FIRST)
+        for char, glyph in zip(rendered_chars, packed):
+            all_xbm_data[char] = [tuple(row) for row in glyph.tolist()]
+
     return all_xbm_data
 
 
@@ -0,0 +1,21 @@
+# Character list and profile settings shared by the GUI, the batch builder and the core.
+# Kept free of NumPy/PIL imports so entry points can read them without loading the heavy modules.
+
+# Character list the combined 32x64 + 16x32 ROM is generated from (the space appears twice;
+# generation keeps one glyph per character, in first-seen order)
+DEFAULT_CHAR_LIST = (
+    [chr(i) for i in range(0x20, 0x61)] +
+    [
+        chr(0x7B), chr(0x7C), chr(0x7D), chr(0x7E), chr(0xB0), chr(0xB1),
+        chr(0x2026), chr(0x2190), chr(0x2191), chr(0x2192), chr(0x2193),
+        chr(0x21CC), chr(0x25BC), chr(0x2713), chr(0x20)
+    ]
+)
+
+# The two profiles the wipbin GUI builds, with its default settings
+DEFAULT_PROFILES = (
+    {"canvas_width": 32, "canvas_height": 64, "forced_height": 39, "max_width": 17,
+     "padding_top": 0, "padding_bottom": 2, "threshold_value": 128},
+    {"canvas_width": 16, "canvas_height": 32, "forced_height": 28, "max_width": 13,
+     "padding_top": 2, "padding_bottom": 2, "threshold_value": 128},
+)
@@ -0,0 +1,332 @@
+"""
+Shared font registry: every face (font file + face index) is read once per process, its cmap is
+turned into a coverage index for "does this face have U+xxxx" queries, and characters are resolved
+through an ordered fallback chain (e.g. Cambria -> Segoe UI Symbol -> DejaVu Sans) before anything
+is rasterized.
+
+The cmap is read straight from the sfnt tables (TTF, OTF and TTC collections; formats 4 and 12),
+so coverage needs neither PIL nor FreeType. ImageFont objects are created per size from the font
+bytes already in memory.
+
+Usage:
+    python font_registry.py font.ttc[:index] [fallback.ttf ...] [--chars default|ascii|"text"]
+
+Prints the coverage report of the chain for a character set without rendering anything. The exit
+code is 1 when a character is in none of the fonts and 2 when a font cannot be read.
+"""
+import argparse
+from collections import namedtuple
+import io
+import os
+import struct
+import sys
+import threading
+
+import numpy as np
+
+
+# cmap subtables in order of preference: (platform, encoding)
+CMAP_PREFERENCE = ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0), (3, 0))
+
+# resolved: [(FontFace, [chars])] in chain order, only faces that resolve something;
+# missing: characters no face of the chain has
+CoverageReport = namedtuple("CoverageReport", ["resolved", "missing"])
+
+
+def _cmap_format_4(table, offset):
+    """Code points with a glyph in a format 4 (BMP segment) subtable."""
+    seg_count = struct.unpack_from(">H", table, offset + 6)[0] // 2
+    arrays = offset + 14
+    end_codes = np.frombuffer(table, dtype=">u2", count=seg_count, offset=arrays)
+    start_codes = np.frombuffer(table, dtype=">u2", count=seg_count, offset=arrays + 2 * seg_count + 2)
+    deltas = np.frombuffer(table, dtype=">u2", count=seg_count, offset=arrays + 4 * seg_count + 2)
+    range_offsets_start = arrays + 6 * seg_count + 2
+    range_offsets = np.frombuffer(table, dtype=">u2", count=seg_count, offset=range_offsets_start)
+
+    covered = []
+    for i in range(seg_count):
+        start, end = int(start_codes[i]), int(end_codes[i])
+        if start > end or start == 0xFFFF:
+            continue
+        codes = np.arange(start, end + 1)
+        if range_offsets[i] == 0:
+            glyphs = (codes + int(deltas[i])) & 0xFFFF
+        else:
+            # idRangeOffset counts bytes from its own position to the glyph id of the segment's first code
+            position = range_offsets_start + 2 * i + int(range_offsets[i]) + 2 * (codes - start)
+            inside = position + 2 <= len(table)
+            glyphs = np.zeros(len(codes), dtype=np.int64)
+            raw = np.frombuffer(table, dtype=np.uint8)
+            glyphs[inside] = (raw[position[inside]].astype(np.int64) << 8) | raw[position[inside] + 1]
+            glyphs = np.where(glyphs != 0, (glyphs + int(deltas[i])) & 0xFFFF, 0)
+        covered.append(codes[glyphs != 0])
+    return np.concatenate(covered) if covered else np.zeros(0, dtype=np.int64)
+
+
+def _cmap_format_12(table, offset):
+    """Code points with a glyph in a format 12 (segmented coverage) subtable."""
+    count = struct.unpack_from(">I", table, offset + 12)[0]
+    groups = np.frombuffer(table, dtype=">u4", count=3 * count, offset=offset + 16).reshape(count, 3)
+    covered = []
+    for start, end, glyph in groups.tolist():
+        # Glyph 0 is .notdef: a group starting at it does not cover its first code point
+        covered.append(np.arange(start + (glyph == 0), end + 1))
+    return np.concatenate(covered) if covered else np.zeros(0, dtype=np.int64)
+
+
+def read_cmap(path, face_index=0, data=None):
+    """
+    Returns the sorted code points a face maps to a real glyph, read from its cmap table.
+
+    Args:
+        path (str): Font file (TTF/OTF/TTC).
+        face_index (int): Face inside a TTC collection.
+        data (bytes): The file contents when already in memory.
+
+    Returns:
+        numpy.ndarray: Sorted, unique int64 code points.
+    """
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+
+    offset = 0
+    if data[:4] == b"ttcf":
+        count = struct.unpack_from(">I", data, 8)[0]
+        if not 0 <= face_index < count:
+            raise ValueError(f"Face {face_index} out of range, '{path}' has {count}.")
+        offset = struct.unpack_from(">I", data, 12 + 4 * face_index)[0]
+    elif face_index != 0:
+        raise ValueError(f"'{path}' is not a collection, it only has face 0.")
+
+    num_tables = struct.unpack_from(">H", data, offset + 4)[0]
+    for i in range(num_tables):
+        tag, _, table_offset, length = struct.unpack_from(">4sIII", data, offset + 12 + 16 * i)
+        if tag == b"cmap":
+            break
+    else:
+        raise ValueError(f"'{path}' has no cmap table.")
+    table = data[table_offset:table_offset + length]
+
+    subtables = {}
+    for i in range(struct.unpack_from(">H", table, 2)[0]):
+        platform, encoding, sub_offset = struct.unpack_from(">HHI", table, 4 + 8 * i)
+        subtables.setdefault((platform, encoding), sub_offset)
+
+    for key in CMAP_PREFERENCE:
+        if key not in subtables:
+            continue
+        sub_offset = subtables[key]
+        table_format = struct.unpack_from(">H", table, sub_offset)[0]
+        if table_format == 12:
+            return np.unique(_cmap_format_12(table, sub_offset))
+        if table_format == 4:
+            return np.unique(_cmap_format_4(table, sub_offset))
+    raise ValueError(f"'{path}' has no Unicode cmap subtable of format 4 or 12.")
+
+
+class FontFace:
+    """
+    One face of a font file: its bytes, its cmap coverage and ImageFont objects per size, all
+    created on first use and kept for the life of the registry.
+    """
+
+    def __init__(self, path, face_index=0):
+        self.path = path
+        self.face_index = face_index
+        self.name = os.path.basename(path) + (f":{face_index}" if face_index else "")
+        self._data = None
+        self._coverage = None
+        self._code_points = None
+        self._fonts = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"FontFace({self.name!r})"
+
+    @property
+    def data(self):
+        """The font file contents, read on first use."""
+        if self._data is None:
+            with open(self.path, "rb") as f:
+                self._data = f.read()
+        return self._data
+
+    @property
+    def code_points(self):
+        """Sorted array of the code points the face has a glyph for."""
+        if self._code_points is None:
+            self._code_points = read_cmap(self.path, self.face_index, self.data)
+        return self._code_points
+
+    def has(self, char):
+        """True when the face's cmap maps the character (or code point) to a glyph."""
+        if self._coverage is None:
+            self._coverage = frozenset(self.code_points.tolist())
+        return (char if isinstance(char, int) else ord(char)) in self._coverage
+
+    def font(self, size):
+        """Returns the PIL ImageFont of the face at `size` pixels, created from the bytes in memory once per size."""
+        with self._lock:
+            font = self._fonts.get(size)
+            if font is None:
+                from PIL import ImageFont
+
+                font = self._fonts[size] = ImageFont.truetype(io.BytesIO(self.data), size, index=self.face_index)
+            return font
+
+
+class FallbackChain:
+    """Ordered faces; a character resolves to the first face that has it."""
+
+    def __init__(self, faces):
+        if not faces:
+            raise ValueError("A fallback chain needs at least one font.")
+        self.faces = list(faces)
+
+    @property
+    def primary(self):
+        return self.faces[0]
+
+    def resolve(self, char):
+        """Returns the first face having the character, or None."""
+        for face in self.faces:
+            if face.has(char):
+                return face
+        return None
+
+    def resolve_all(self, chars):
+        """Returns {char: face or None} for every distinct character."""
+        return {char: self.resolve(char) for char in dict.fromkeys(chars)}
+
+    def coverage(self, chars):
+        """
+        Resolves every character from the cmaps alone; nothing is rasterized.
+
+        A primary face whose cmap read_cmap cannot read (no format 4/12 Unicode subtable: symbol
+        fonts with a (3, 0) format 6 table, older Mac fonts) gets every character, as it did before
+        there were fallback fonts; PIL draws such fonts fine. Unreadable fallback fonts still raise.
+        """
+        try:
+            self.primary.code_points
+        except (ValueError, struct.error) as e:
+            print(f"Warning: Unable to read the cmap of {self.primary.name}, drawing every character with it. "
+                  f"Reason: {e}")
+            return CoverageReport([(self.primary, list(dict.fromkeys(chars)))], [])
+
+        faces = self.resolve_all(chars)
+        resolved = [(face, [char for char, resolved_face in faces.items() if resolved_face is face])
+                    for face in self.faces]
+        return CoverageReport([(face, chars) for face, chars in resolved if chars],
+                              [char for char, face in faces.items() if face is None])
+
+
+class FontRegistry:
+    """
+    Process-wide store of FontFace objects keyed by (absolute path, face index). Thread-safe.
+    A face is replaced when its file's size or mtime changes, like the glyph cache's fingerprints.
+    """
+
+    def __init__(self):
+        self._faces = {}
+        self._lock = threading.Lock()
+
+    def face(self, path, face_index=0):
+        """Returns the face for a font file, loading nothing until it is used."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), face_index)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._faces.get(key)
+            if entry is None or entry[0] != signature:
+                entry = self._faces[key] = (signature, FontFace(path, face_index))
+            return entry[1]
+
+    def chain(self, fonts):
+        """
+        Returns a FallbackChain for font specs in order. A spec is a path, "path:index" for a TTC
+        face, or a (path, face_index) tuple.
+        """
+        return FallbackChain([self.face(*parse_font_spec(spec)) for spec in fonts])
+
+    def clear(self):
+        with self._lock:
+            self._faces.clear()
+
+
+def parse_font_spec(spec):
+    """Turns a path, "path:index" or (path, face_index) into (path, face_index)."""
+    if isinstance(spec, (tuple, list)):
+        return spec[0], int(spec[1])
+    path, separator, index = spec.rpartition(":")
+    if separator and index.isdigit() and path:
+        return path, int(index)
+    return spec, 0
+
+
+# Shared by every generator in the process
+REGISTRY = FontRegistry()
+
+
+def face(path, face_index=0):
+    """Returns the shared registry's face for a font file."""
+    return REGISTRY.face(path, face_index)
+
+
+def fallback_chain(ttf_path, face_index=0, fallback_fonts=()):
+    """Returns the shared registry's chain of the primary face followed by fallback_fonts."""
+    return REGISTRY.chain([(ttf_path, face_index)] + list(fallback_fonts))
+
+
+def _describe(char):
+    return f"'{char}' (U+{ord(char):04X})"
+
+
+def format_coverage_report(report, total=None):
+    """Formats a CoverageReport as the lines printed before a build renders."""
+    total = total if total is not None else sum(len(chars) for _, chars in report.resolved) + len(report.missing)
+    lines = []
+    for i, (face, chars) in enumerate(report.resolved):
+        line = f"  {face.name}: {len(chars)} of {total} characters"
+        if i:
+            # Fallback faces usually fill in a handful of characters; name them
+            line += f" ({', '.join(_describe(char) for char in chars[:8])}{', ...' if len(chars) > 8 else ''})"
+        lines.append(line)
+    if report.missing:
+        lines.append(f"  In none of the fonts, drawn as .notdef: "
+                     f"{', '.join(_describe(char) for char in report.missing)}")
+    return "Coverage:\n" + "\n".join(lines)
+
+
+def main():
+    from font_profiles import DEFAULT_CHAR_LIST
+
+    parser = argparse.ArgumentParser(description="Report which font of a fallback chain has each character")
+    parser.add_argument("fonts", nargs="+", help="Font files in fallback order (path or path:face_index)")
+    parser.add_argument("--chars", default="default",
+                        help='"default", "ascii", or the characters themselves (default: the ROM character list)')
+    args = parser.parse_args()
+
+    if args.chars == "default":
+        chars = DEFAULT_CHAR_LIST
+    elif args.chars == "ascii":
+        chars = [chr(i) for i in range(0x20, 0x7F)]
+    else:
+        chars = list(args.chars)
+
+    registry = FontRegistry()
+    try:
+        chain = registry.chain(args.fonts)
+        for chain_face in chain.faces:
+            chain_face.code_points
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error: Unable to read the fonts. Reason: {e}", file=sys.stderr)
+        return 2
+
+    report = chain.coverage(chars)
+    print(format_coverage_report(report))
+    return 1 if report.missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
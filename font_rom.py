@@ -0,0 +1,457 @@
+import os
+
+import numpy as np
+
+from atomic_file import AtomicFile
+from bitpack import LSB_FIRST
+from code_point_table import CodePointTable, write_lookup_files
+from font_registry import fallback_chain, format_coverage_report
+from glyph_atlas import GlyphAtlas, as_xbm_dict
+from glyph_cache import font_fingerprint
+from glyph_raster import render_glyphs, PUNCTUATION_SCALE, NARROW_CHAR_SCALE
+import instrumentation
+from mif_stream import glyph_sections, stream_glyph_mif
+from rom_builder import build_rom_image, describe_truncation, truncation_report, write_rom_image
+import rom_checksum
+import rom_dedup
+import rom_packed
+
+
+# Low/High 16-bit halves written next to FontRom64.mif for the 32x64 profile
+SPLIT_MIF_FILES = ("FontRom16x64_Low.mif", "FontRom16x64_High.mif")
+
+# Code point lookup files (.bin, .h, .mif) written next to the ROM
+LOOKUP_BASE_NAME = "FontRomLookup"
+
+
+def mif_layout(canvas_width, canvas_height):
+    """Returns (depth, strikeout_start_address) of the MIF written for a canvas size."""
+    if canvas_width == 16 and canvas_height == 32:
+        return 8192, 8192
+    return 16384, 16384 // 2
+
+
+def place_glyph(binary_array, canvas_width, canvas_height, padding_top=0):
+    """
+    Places a thresholded glyph on an empty canvas: centred in the 17x39 grid for 32x64,
+    otherwise centred horizontally with its top at padding_top.
+
+    Returns:
+        numpy.ndarray: (canvas_height, canvas_width) uint8 array of 0/1 pixels.
+    """
+    target_height, scaled_width = binary_array.shape
+    padded_array = np.zeros((canvas_height, canvas_width), dtype=np.uint8)
+
+    if canvas_width == 32 and canvas_height == 64:
+        grid_width, grid_height = 17, 39
+        vertical_offset = max((grid_height - target_height) // 2, 0)
+        horizontal_offset = max((grid_width - scaled_width) // 2, 0)
+        # Ensure binary_array fits within the grid
+        padded_array[vertical_offset:vertical_offset + target_height,
+                     horizontal_offset:horizontal_offset + scaled_width] = binary_array
+    else:
+        vertical_start = padding_top
+        horizontal_padding = (canvas_width - scaled_width) // 2
+        padded_array[vertical_start:vertical_start + target_height,
+                     horizontal_padding:horizontal_padding + scaled_width] = binary_array
+
+    return padded_array
+
+
+def generate_xbm_data(ttf_path, char_list, forced_height, max_width, canvas_width, canvas_height,
+                      threshold_value=128, padding_top=0, padding_bottom=0, cache=None, face_index=0, workers=1,
+                      fallback_fonts=(), raster_backend="resize"):
+    """
+    Generates XBM data for characters as {char: [[byte, ...], ...]}.
+    Kept for existing callers; generate_glyph_atlas returns the same glyphs as a GlyphAtlas.
+    """
+    atlas = generate_glyph_atlas(ttf_path, char_list, forced_height, max_width, canvas_width, canvas_height,
+                                 threshold_value=threshold_value, padding_top=padding_top,
+                                 padding_bottom=padding_bottom, cache=cache, face_index=face_index,
+                                 workers=workers, fallback_fonts=fallback_fonts, raster_backend=raster_backend)
+    return atlas.to_xbm_dict()
+
+
+@instrumentation.staged("generate")
+def generate_glyph_atlas(ttf_path, char_list, forced_height, max_width, canvas_width, canvas_height,
+                         threshold_value=128, padding_top=0, padding_bottom=0, cache=None, face_index=0, workers=1,
+                         fallback_fonts=(), raster_backend="resize"):
+    """
+    Generates a GlyphAtlas for characters, ensuring proper alignment within grids, narrow character handling, and padding.
+    If a GlyphCache is given, thresholded glyphs are looked up there first and the font is only
+    opened when at least one glyph has to be rendered.
+    With workers > 1, glyphs that still need rendering are spread over that many processes.
+    With fallback_fonts (paths or "path:face_index"), each character comes from the first font of
+    ttf_path + fallback_fonts whose cmap has it; characters in none of them still come from ttf_path,
+    as its .notdef glyph. Coverage is checked from the cmaps before rendering and reported when a
+    fallback is used or a character is in none of the fonts.
+    raster_backend "direct" renders monochrome glyphs at their target size with FreeType instead of
+    resizing a larger PIL drawing (see glyph_raster.RASTER_BACKENDS); threshold_value is then unused.
+    """
+    binary_arrays = render_glyph_arrays(ttf_path, char_list, forced_height, max_width, threshold_value, cache=cache,
+                                        face_index=face_index, workers=workers, fallback_fonts=fallback_fonts,
+                                        raster_backend=raster_backend)
+    return place_glyph_arrays(binary_arrays, char_list, canvas_width, canvas_height, padding_top)
+
+
+def render_glyph_arrays(ttf_path, char_list, forced_height, max_width, threshold_value=128, cache=None, face_index=0,
+                        workers=1, fallback_fonts=(), raster_backend="resize"):
+    """
+    The render half of generate_glyph_atlas: every distinct character but the space, thresholded
+    and not yet placed on a canvas (the arrays GlyphCache stores).
+
+    Returns:
+        dict: {char: (height, width) uint8 array of 0/1 pixels, or the Exception rendering it raised}
+    """
+    # Resolve every character to a face up front, so missing glyphs show up before any rendering
+    with instrumentation.span("coverage"):
+        chain = fallback_chain(ttf_path, face_index, fallback_fonts)
+        distinct = [char for char in dict.fromkeys(char_list) if char != " "]
+        report = chain.coverage(distinct)
+        if fallback_fonts or report.missing:
+            print(format_coverage_report(report, len(distinct)))
+        faces = {char: face for face, chars in report.resolved for char in chars}
+        for char in report.missing:
+            faces[char] = chain.primary
+
+    # Look up every distinct glyph in the cache, then render the misses in one batch per face
+    binary_arrays = {}
+    cache_keys = {}
+    with instrumentation.span("cache_lookup"):
+        if cache is not None:
+            for char in distinct:
+                face = faces[char]
+                cache_keys[char] = cache.make_key(font_fingerprint(face.path), face.face_index, char, forced_height,
+                                                  max_width, threshold_value, PUNCTUATION_SCALE, NARROW_CHAR_SCALE,
+                                                  backend=raster_backend)
+                cached = cache.get(cache_keys[char])
+                if cached is not None:
+                    binary_arrays[char] = cached
+
+    to_render = {}
+    for char in distinct:
+        if char not in binary_arrays:
+            to_render.setdefault(faces[char], []).append(char)
+    for face, chars in to_render.items():
+        with instrumentation.span("render"):
+            results = render_glyphs(face.path, chars, forced_height, max_width, threshold_value,
+                                    face_index=face.face_index, workers=workers, backend=raster_backend)
+        for char, result in zip(chars, results):
+            binary_arrays[char] = result
+            # Empty bitmaps are cached too so missing glyphs are not re-rendered either
+            if cache is not None and not isinstance(result, Exception):
+                cache.put(cache_keys[char], result)
+
+    return binary_arrays
+
+
+def place_glyph_arrays(binary_arrays, char_list, canvas_width, canvas_height, padding_top=0):
+    """
+    The placement half of generate_glyph_atlas: places the arrays of render_glyph_arrays on the
+    canvas (place_glyph) in char_list order and packs them. The space gets an empty canvas; characters
+    that failed to render or have an empty glyph are reported and left out.
+
+    Returns:
+        GlyphAtlas
+    """
+    rendered_arrays = {}
+    with instrumentation.span("place"):
+        for char in char_list:
+            try:
+                if char == " ":
+                    # Ensure empty grid for space character
+                    rendered_arrays[char] = np.zeros((canvas_height, canvas_width), dtype=np.uint8)
+                    continue
+
+                binary_array = binary_arrays[char]
+                if isinstance(binary_array, Exception):
+                    raise binary_array
+                if binary_array.size == 0:
+                    continue
+                rendered_arrays[char] = place_glyph(binary_array, canvas_width, canvas_height, padding_top)
+
+            except Exception as e:
+                print(f"Warning: Unable to process character '{char}'. Reason: {e}")
+
+    # Pack every glyph in one pass (LSB-first, same bytes the old reverse_bits loop produced)
+    with instrumentation.span("pack"):
+        bitmaps = (np.stack(list(rendered_arrays.values())) if rendered_arrays
+                   else np.zeros((0, canvas_height, canvas_width), dtype=np.uint8))
+        return GlyphAtlas.from_bitmaps(list(rendered_arrays), bitmaps, canvas_width, canvas_height, bit_order=LSB_FIRST)
+
+@instrumentation.staged("write_xbm")
+def write_xbm(all_xbm_data, output_file, canvas_width, canvas_height):
+    """
+    Writes XBM data to a file, including both normal and strikeout versions.
+    Accepts a GlyphAtlas or the {char: [[byte, ...], ...]} dict.
+    """
+    all_xbm_data = as_xbm_dict(all_xbm_data)
+
+    def add_strikeout(xbm_data, canvas_width, canvas_height):
+        """
+        Adds a strikeout with three lines across the middle of the character.
+        Centered relative to the grid for both configurations.
+        """
+        strikeout_data = []
+        grid_width = 17 if canvas_width == 32 and canvas_height == 64 else canvas_width
+        grid_height = 39 if canvas_width == 32 and canvas_height == 64 else canvas_height
+
+        middle_start = (grid_height // 2) - 1
+        middle_end = middle_start + 3  # Draw 3 rows
+
+        for i, row_bytes in enumerate(xbm_data):
+            if middle_start <= i < middle_end:
+                new_row = [0xFF] * len(row_bytes)
+            else:
+                new_row = row_bytes[:]
+            strikeout_data.append(new_row)
+
+        return strikeout_data
+
+    with AtomicFile(output_file, "w", encoding="utf-8") as f:
+        f.write("# XBM File\n\n")
+
+        normal_data = []
+        strikeout_data = []
+       
+
+        for char, xbm_data in all_xbm_data.items():
+            normal_data.append((char, xbm_data))
+            strikeout_data.append((char, add_strikeout(xbm_data, canvas_width, canvas_height)))
+
+        # Write normal characters
+        for char, xbm_data in normal_data:
+            f.write(f"/* Character: '{char}' */\n")
+            f.write(f"#define {char}_width {canvas_width}\n")
+            f.write(f"#define {char}_height {canvas_height}\n")
+            f.write(f"static char {char}_bits[] = {{\n")
+
+            for row_bytes in xbm_data:
+                f.write("  " + ", ".join(f"0x{byte:02X}" for byte in row_bytes) + ",\n")
+
+            f.write("};\n\n")
+
+        # Write strikeout characters
+        for char, strikeout in strikeout_data:
+            f.write(f"/* Strikeout Character: '{char}' */\n")
+            f.write(f"static char {char}_strikeout_bits[] = {{\n")
+
+            for row_bytes in strikeout:
+                f.write("  " + ", ".join(f"0x{byte:02X}" for byte in row_bytes) + ",\n")
+
+            f.write("};\n\n")
+
+    print(f"XBM file saved as {output_file}")
+
+
+
+@instrumentation.staged("write_mif")
+def write_mif(all_xbm_data, output_file, canvas_width, canvas_height, mif_output=None, compact=False):
+    """
+    Writes MIF data to a file, including both normal and strikeout versions.
+    For 32x64, the two 16x64 MIF files for Low and High are written in the same pass.
+    With compact, runs of equal words (the empty rows of every glyph) become '[AAAA..BBBB] : VALUE;' records.
+    Optionally appends MifSection records (packed words per section) to `mif_output` for write_combined_binary.
+    Accepts a GlyphAtlas or the {char: [[byte, ...], ...]} dict.
+    """
+    if isinstance(all_xbm_data, GlyphAtlas):
+        atlas = all_xbm_data
+    else:
+        atlas = GlyphAtlas.from_xbm_dict(all_xbm_data, canvas_width, canvas_height)
+
+    depth, strikeout_start_address = mif_layout(canvas_width, canvas_height)
+
+    # Strikeout rows are centred on the canvas; the space stays blank
+    with instrumentation.span("strikeout"):
+        strikeout = atlas.strikeout_plane((canvas_height // 2) - 1, rows=3, blank_chars=(" ",))
+
+    split_files = None
+    if canvas_width == 32 and canvas_height == 64:
+        output_dir = os.path.dirname(output_file)
+        split_files = tuple(os.path.join(output_dir, name) for name in SPLIT_MIF_FILES)
+
+    sections = stream_glyph_mif(
+        output_file, depth, atlas.chars,
+        [("Character", 0x0000, atlas.planes["normal"]),
+         ("Strikeout Character", strikeout_start_address, strikeout)],
+        split_files=split_files,
+        compact=compact,
+    )
+
+    print(f"MIF file saved as {output_file}")
+    if split_files:
+        print(f"Low split MIF saved: {split_files[0]}")
+        print(f"High split MIF saved: {split_files[1]}")
+
+    if mif_output is not None:
+        mif_output.extend(sections)
+
+
+def atlas_sections(atlas):
+    """Returns the MifSection records write_mif produces for an atlas, without writing the MIFs."""
+    _, strikeout_start_address = mif_layout(atlas.canvas_width, atlas.canvas_height)
+    strikeout = atlas.strikeout_plane((atlas.canvas_height // 2) - 1, rows=3, blank_chars=(" ",))
+    return glyph_sections(
+        [("Character", 0x0000, atlas.planes["normal"]), ("Strikeout Character", strikeout_start_address, strikeout)],
+        split=atlas.canvas_width == 32 and atlas.canvas_height == 64,
+    )
+
+
+def _checksum_size(rom):
+    return rom_checksum.ALGORITHMS[rom.checksum_algorithm].size if rom.checksum is not None else 0
+
+
+@instrumentation.staged("write_combined_binary")
+def write_combined_binary(mif_output, output_file, target_size=81920, append_checksum=False, debug_log=False,
+                          checksum_algorithm="word_sum"):
+    """
+    Generates a combined binary file from the MifSection records collected in `mif_output`,
+    using only the 16-bit sections (the split Low/High files and the 16x32 ROM).
+    The image is assembled in memory by rom_builder and written with a single write().
+    With append_checksum the last bytes hold the rom_checksum `checksum_algorithm` (by default the
+    16-bit ones' complement word sum), computed while the image is assembled;
+    with debug_log a per-word listing is saved next to the binary as *_debug.txt.
+    """
+    try:
+        with instrumentation.span("build_rom_image"):
+            rom = build_rom_image(mif_output, target_size, append_checksum=append_checksum,
+                                  checksum_algorithm=checksum_algorithm)
+        with instrumentation.span("write_rom_image"):
+            write_rom_image(rom, output_file)
+
+        if rom.truncated:
+            print(describe_truncation(mif_output, rom))
+        padding = target_size - rom.data_bytes - _checksum_size(rom)
+        if padding > 0:
+            print(f"Padded with {padding} zero bytes to meet {target_size} bytes.")
+
+        print(f"Binary file saved: {output_file} ({rom.data_bytes} bytes written).")
+        if rom.checksum is not None:
+            print(f"Checksum added: {rom_checksum.format_checksum(rom.checksum_algorithm, rom.checksum)}")
+
+        if debug_log:
+            debug_file_path = output_file.replace(".bin", "_debug.txt")
+            with instrumentation.span("write_debug_log"):
+                write_combined_binary_debug(mif_output, rom, debug_file_path, target_size)
+            print(f"Debug log saved: {debug_file_path}")
+
+    except Exception as e:
+        print(f"Error writing binary file: {e}")
+
+
+def write_combined_binary_debug(mif_output, rom, debug_file_path, target_size):
+    """
+    Writes the per-word listing of a combined binary: one 'ADDR : WORD' line per 16-bit word placed.
+    """
+    placed_sections = [section for section in mif_output if section.width == 16][:len(rom.placements)]
+    with AtomicFile(debug_file_path, "w") as debug_file:
+        for section, (_, _, length) in zip(placed_sections, rom.placements):
+            hex_words = section.data.tobytes().hex().upper()
+            full_words = length // 2
+            debug_file.write("".join(
+                f"{section.start_address + i:04X} : {hex_words[i * 4:(i + 1) * 4]}\n" for i in range(full_words)
+            ))
+            if rom.truncated and full_words < len(section.data):
+                remaining_bytes = length - full_words * 2
+                debug_file.write(f"{section.start_address + full_words:04X} : {hex_words[full_words * 4:(full_words + 1) * 4]}"
+                                 f" (truncated to {remaining_bytes} bytes)\n")
+
+        if rom.truncated:
+            cut, dropped = truncation_report(mif_output, rom)
+            if cut is None and dropped and len(dropped[0].data):
+                # Stopped at a section boundary: the next section's first word is the one left out
+                section = dropped[0]
+                debug_file.write(f"{section.start_address:04X} : {section.data[0].tobytes().hex().upper()}"
+                                 f" (truncated to 0 bytes)\n")
+            debug_file.write(describe_truncation(mif_output, rom) + "\n")
+
+        padding = target_size - rom.data_bytes - _checksum_size(rom)
+        if padding > 0:
+            debug_file.write(f"Padding with {padding} zero bytes to meet {target_size} bytes.\n")
+        if rom.checksum is not None:
+            algorithm = rom_checksum.ALGORITHMS[rom.checksum_algorithm]
+            debug_file.write(f"Checksum ({algorithm.description}): "
+                             f"{rom_checksum.format_checksum(algorithm.name, rom.checksum)}\n")
+
+
+@instrumentation.staged("write_dedup_binary")
+def write_dedup_binary(atlases, output_file, char_list=None, target_size=81920, dedup_rows=False):
+    """
+    Writes the 16-bit planes of the combined binary (same planes, same order) as a deduplicated ROM:
+    every distinct glyph is stored once and reached through per-plane index tables (see rom_dedup),
+    zero padded to target_size. The size report is printed and saved next to it as *_report.txt.
+    char_list sets the code point table order (by default the characters of the atlases).
+    """
+    try:
+        planes = []
+        for atlas in atlases:
+            for section in atlas_sections(atlas):
+                if section.width == 16:
+                    planes.append((section.name, atlas.chars,
+                                   section.data.reshape(len(atlas.chars), atlas.canvas_height, 2)))
+        rom = rom_dedup.dedup_rom(planes, slots=char_list, dedup_rows=dedup_rows)
+
+        report = rom_dedup.format_report(rom, target_size)
+        with AtomicFile(output_file.replace(".bin", "_report.txt"), "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+        print(report)
+
+        if len(rom.image) > target_size:
+            print(f"Error writing deduplicated binary: {len(rom.image)} bytes do not fit {target_size} bytes.")
+            return
+        with AtomicFile(output_file, "wb") as f:
+            f.write(rom.image + bytes(target_size - len(rom.image)))
+        print(f"Deduplicated binary saved: {output_file} ({len(rom.image)} bytes written).")
+
+    except Exception as e:
+        print(f"Error writing deduplicated binary: {e}")
+
+
+@instrumentation.staged("write_packed_binary")
+def write_packed_binary(atlases, output_file, target_size=81920):
+    """
+    Writes the glyphs of every atlas trimmed to their bounding box, each found through an 8-byte
+    header (offset, size, bearing; see rom_packed), zero padded to target_size. The strikeout is
+    left to the reader. The size report is printed and saved next to it as *_report.txt.
+    """
+    try:
+        rom = rom_packed.pack_rom(atlases)
+
+        report = rom_packed.format_report(rom, target_size)
+        with AtomicFile(output_file.replace(".bin", "_report.txt"), "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+        print(report)
+
+        if len(rom.image) > target_size:
+            print(f"Error writing packed binary: {len(rom.image)} bytes do not fit {target_size} bytes.")
+            return
+        with AtomicFile(output_file, "wb") as f:
+            f.write(rom.image + bytes(target_size - len(rom.image)))
+        print(f"Packed binary saved: {output_file} ({len(rom.image)} bytes written).")
+
+    except Exception as e:
+        print(f"Error writing packed binary: {e}")
+
+
+@instrumentation.staged("write_lookup_tables")
+def write_lookup_tables(atlases, output_dir):
+    """
+    Writes the code point -> glyph index table of the ROM (code_point_table) as FontRomLookup.bin,
+    .h and .mif. Profiles normally hold the same characters and share one table; when a glyph is
+    missing from one profile, its positions differ and every profile gets its own
+    FontRomLookup<height> files instead.
+
+    Returns:
+        list: LookupFiles per table written.
+    """
+    same_chars = all(atlas.chars == atlases[0].chars for atlas in atlases)
+    written = []
+    for atlas in atlases[:1] if same_chars else atlases:
+        suffix = "" if same_chars else str(atlas.canvas_height)
+        table = CodePointTable.from_chars(atlas.chars)
+        files = write_lookup_files(table, os.path.join(output_dir, LOOKUP_BASE_NAME + suffix),
+                                   prefix="font_rom" + (f"_{suffix}" if suffix else ""))
+        print(f"Lookup table saved: {files.binary}, {files.header}, {files.mif} "
+              f"({len(table)} ranges for {table.glyph_count} glyphs)")
+        written.append(files)
+    return written
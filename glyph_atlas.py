@@ -0,0 +1,179 @@
+import numpy as np
+
+from bitpack import pack_glyphs, unpack_glyphs, LSB_FIRST
+
+
+METRICS_DTYPE = np.dtype([("x", np.int16), ("y", np.int16), ("width", np.int16), ("height", np.int16)])
+
+
+class GlyphAtlas:
+    """
+    Packed glyph store: one contiguous uint8 array per variant plane instead of a dict of lists.
+
+    Attributes:
+        chars (list): Characters in ROM order (one entry per glyph, no duplicates).
+        index (dict): Code point -> glyph index.
+        planes (dict): Plane name ("normal", "strikeout", "normal_13", ...) -> uint8 array of
+                       shape (n_glyphs, canvas_height, bytes_per_row).
+        metrics (numpy.ndarray): Per-glyph ink bounding box (x, y, width, height) inside the cell.
+    """
+
+    def __init__(self, chars, normal, canvas_width, canvas_height, bit_order=LSB_FIRST):
+        normal = np.ascontiguousarray(normal, dtype=np.uint8)
+        if normal.shape != (len(chars), canvas_height, (canvas_width + 7) // 8):
+            raise ValueError(f"Glyph array of shape {normal.shape} does not match {len(chars)} "
+                             f"glyphs of {canvas_width}x{canvas_height}.")
+
+        self.chars = list(chars)
+        self.index = {ord(char): i for i, char in enumerate(self.chars)}
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.bit_order = bit_order
+        self.planes = {"normal": normal}
+        self.present = {}  # Plane name -> bool mask of glyphs that plane really has (variant dicts only)
+        self.metrics = self.compute_metrics(normal)
+
+    @classmethod
+    def from_bitmaps(cls, chars, bitmaps, canvas_width, canvas_height, bit_order=LSB_FIRST):
+        """Builds an atlas from a (glyphs, rows, cols) 0/1 array, packing it in one call."""
+        bitmaps = np.asarray(bitmaps, dtype=np.uint8).reshape(len(chars), canvas_height, canvas_width)
+        return cls(chars, pack_glyphs(bitmaps, bit_order=bit_order), canvas_width, canvas_height, bit_order)
+
+    @classmethod
+    def from_xbm_dict(cls, all_xbm_data, canvas_width, canvas_height, bit_order=LSB_FIRST):
+        """Adapter for the old {char: [[byte, ...], ...]} format returned by generate_xbm_data."""
+        chars = list(all_xbm_data)
+        bytes_per_row = (canvas_width + 7) // 8
+        normal = np.array([all_xbm_data[char] for char in chars], dtype=np.uint8)
+        normal = normal.reshape(len(chars), canvas_height, bytes_per_row)
+        return cls(chars, normal, canvas_width, canvas_height, bit_order)
+
+    @classmethod
+    def from_variant_dict(cls, all_xbm_data, char_list, canvas_width=8, bit_order=LSB_FIRST):
+        """
+        Adapter for curr_conv's {char: {"normal_13": [byte, ...], ...}} format (one byte per row).
+        Every label becomes a plane; characters missing a label get an all-zero glyph in that plane.
+        """
+        chars = [char for char in dict.fromkeys(char_list) if char in all_xbm_data]
+        labels = list(dict.fromkeys(label for char in chars for label in all_xbm_data[char]))
+        if not labels:
+            raise ValueError("No glyph data to build an atlas from.")
+
+        canvas_height = max(len(all_xbm_data[char][label]) for char in chars for label in all_xbm_data[char])
+        bytes_per_row = (canvas_width + 7) // 8
+
+        planes = {}
+        present = {}
+        for label in labels:
+            plane = np.zeros((len(chars), canvas_height, bytes_per_row), dtype=np.uint8)
+            mask = np.zeros(len(chars), dtype=bool)
+            for i, char in enumerate(chars):
+                if label in all_xbm_data[char]:
+                    rows = np.asarray(all_xbm_data[char][label], dtype=np.uint8)
+                    plane[i, :len(rows)] = rows.reshape(len(rows), -1)
+                    mask[i] = True
+            planes[label] = plane
+            present[label] = mask
+
+        atlas = cls(chars, planes[labels[0]], canvas_width, canvas_height, bit_order)
+        atlas.planes = planes
+        atlas.present = present
+        return atlas
+
+    def __len__(self):
+        return len(self.chars)
+
+    def __contains__(self, char):
+        return self._code_point(char) in self.index
+
+    @staticmethod
+    def _code_point(char):
+        return char if isinstance(char, int) else ord(char)
+
+    @property
+    def bytes_per_row(self):
+        return self.planes["normal"].shape[2]
+
+    def add_plane(self, name, packed):
+        """Adds a variant plane with the same shape as the normal plane."""
+        packed = np.ascontiguousarray(packed, dtype=np.uint8)
+        if packed.shape != self.planes["normal"].shape:
+            raise ValueError(f"Plane '{name}' has shape {packed.shape}, expected {self.planes['normal'].shape}.")
+        self.planes[name] = packed
+        return packed
+
+    def strikeout_plane(self, middle_start, rows=3, blank_chars=()):
+        """
+        Returns a strikeout copy of the normal plane with `rows` rows filled starting at middle_start.
+        Characters in blank_chars get an all-zero glyph instead (write_mif does this for the space).
+        """
+        strikeout = self.planes["normal"].copy()
+        strikeout[:, middle_start:middle_start + rows, :] = 0xFF
+        for char in blank_chars:
+            if char in self:
+                strikeout[self.index[self._code_point(char)]] = 0
+        return strikeout
+
+    def add_strikeout_plane(self, middle_start, rows=3, blank_chars=(), name="strikeout"):
+        """Derives a strikeout plane (see strikeout_plane) and stores it under `name`."""
+        return self.add_plane(name, self.strikeout_plane(middle_start, rows, blank_chars))
+
+    def glyph(self, char, plane="normal"):
+        """Returns a (canvas_height, bytes_per_row) view of one glyph, looked up by character or code point."""
+        return self.planes[plane][self.index[self._code_point(char)]]
+
+    def bitmap(self, char, plane="normal"):
+        """Returns one glyph expanded to a (canvas_height, canvas_width) 0/1 array."""
+        return unpack_glyphs(self.glyph(char, plane), self.canvas_width, bit_order=self.bit_order)[0]
+
+    def compute_metrics(self, packed):
+        """Computes each glyph's ink bounding box; empty glyphs get an all-zero box."""
+        metrics = np.zeros(len(packed), dtype=METRICS_DTYPE)
+        if len(packed) == 0:
+            return metrics
+
+        bitmaps = unpack_glyphs(packed, self.canvas_width, bit_order=self.bit_order).astype(bool)
+        row_ink = bitmaps.any(axis=2)
+        col_ink = bitmaps.any(axis=1)
+        has_ink = row_ink.any(axis=1)
+
+        top = np.argmax(row_ink, axis=1)
+        bottom = self.canvas_height - np.argmax(row_ink[:, ::-1], axis=1)
+        left = np.argmax(col_ink, axis=1)
+        right = self.canvas_width - np.argmax(col_ink[:, ::-1], axis=1)
+
+        metrics["x"] = np.where(has_ink, left, 0)
+        metrics["y"] = np.where(has_ink, top, 0)
+        metrics["width"] = np.where(has_ink, right - left, 0)
+        metrics["height"] = np.where(has_ink, bottom - top, 0)
+        return metrics
+
+    def to_xbm_dict(self, plane="normal"):
+        """Converts one plane back to the {char: [[byte, ...], ...]} format the writers take."""
+        rows = self.planes[plane].tolist()
+        return dict(zip(self.chars, rows))
+
+    def to_variant_dict(self):
+        """Converts a curr_conv style atlas back to {char: {label: [byte, ...]}} (one byte per row)."""
+        all_xbm_data = {}
+        for label, plane in self.planes.items():
+            values = plane[:, :, 0].tolist()
+            mask = self.present.get(label)
+            for i, char in enumerate(self.chars):
+                if mask is None or mask[i]:
+                    all_xbm_data.setdefault(char, {})[label] = values[i]
+        return all_xbm_data
+
+
+def as_xbm_dict(all_xbm_data, plane="normal"):
+    """Lets writers accept either a GlyphAtlas or the old dict-of-lists format."""
+    if isinstance(all_xbm_data, GlyphAtlas):
+        return all_xbm_data.to_xbm_dict(plane)
+    return all_xbm_data
+
+
+def as_variant_dict(all_xbm_data):
+    """Lets curr_conv writers accept either a GlyphAtlas or the {char: {label: [...]}} format."""
+    if isinstance(all_xbm_data, GlyphAtlas):
+        return all_xbm_data.to_variant_dict()
+    return all_xbm_data
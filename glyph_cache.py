@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".fontrom_cache")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Part of every key: bump it whenever glyph_raster renders differently for the same parameters,
+# so entries rendered by the old code are never returned
+CACHE_VERSION = 1
+
+_fingerprints = {}
+
+
+def font_fingerprint(ttf_path):
+    """
+    Returns the SHA-256 of a font file.
+    The hash is remembered per (path, size, mtime) so a build only reads each font once.
+    """
+    stat = os.stat(ttf_path)
+    memo_key = (os.path.abspath(ttf_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _fingerprints:
+        digest = hashlib.sha256()
+        with open(ttf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _fingerprints[memo_key] = digest.hexdigest()
+    return _fingerprints[memo_key]
+
+
+class GlyphCache:
+    """
+    Content-addressed on-disk cache of thresholded glyph bitmaps.
+
+    Each entry is the binary array a glyph has after resize + threshold and before it is placed
+    on the canvas, so layout parameters (canvas size, padding) can change without re-rendering.
+    Entries are stored as one .npy file per key. The file mtime is used as the last-access time
+    and the least recently used entries are removed once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Current entry sizes, used to decide when to evict
+        self._sizes = {}
+        for name in os.listdir(cache_dir):
+            if name.endswith(".npy"):
+                self._sizes[name[:-4]] = os.path.getsize(os.path.join(cache_dir, name))
+
+    @staticmethod
+    def make_key(font_hash, face_index, char, forced_height, max_width, threshold_value,
+                 punctuation_scale, narrow_char_scale, backend="resize"):
+        """Builds the cache key from everything that affects a glyph's rendered bitmap."""
+        params = {
+            "version": CACHE_VERSION,
+            "font": font_hash,
+            "face": face_index,
+            "char": ord(char),
+            "forced_height": forced_height,
+            "max_width": max_width,
+            "threshold": threshold_value,
+            "punctuation_scale": punctuation_scale,
+            "narrow_char_scale": narrow_char_scale,
+        }
+        # Only set for other backends, so keys of existing resize entries stay the same
+        if backend != "resize":
+            params["backend"] = backend
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """Returns the cached array for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            array = np.load(path, allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+
+        os.utime(path)  # Mark as recently used
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """Stores `array` under `key` and evicts old entries if the cache is over its size limit."""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array, dtype=np.uint8), allow_pickle=False)
+        os.replace(temp_path, path)
+
+        self._sizes[key] = os.path.getsize(path)
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        entries = []
+        for key in self._sizes:
+            try:
+                entries.append((os.path.getmtime(self._path(key)), key))
+            except OSError:
+                entries.append((0, key))
+        entries.sort()
+
+        for _, key in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            total -= self._sizes.pop(key)
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        for key in list(self._sizes):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        self._sizes.clear()
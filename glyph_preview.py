@@ -0,0 +1,123 @@
+import numpy as np
+
+from font_rom import place_glyph
+from glyph_raster import draw_glyph, scale_glyph, threshold_glyph, DirectRasterizer
+
+
+class GlyphPreview:
+    """
+    Renders glyphs for the GUI preview, caching every step of the pipeline separately:
+
+    - the drawn glyph per (font size, char), so only forced_height changes go through FreeType;
+    - the scaled grayscale glyph per (forced_height, max_width, char), so a threshold or padding
+      change is only a comparison and a placement.
+
+    With backend "direct" the glyphs come from a DirectRasterizer instead, as 0/255 "grayscale"
+    that every threshold leaves unchanged.
+
+    Not thread-safe; the GUI calls it from a single preview thread.
+    """
+
+    def __init__(self, ttf_path, face_index=0, max_entries=8192, backend="resize"):
+        self.ttf_path = ttf_path
+        self.face_index = face_index
+        self.max_entries = max_entries
+        self.backend = backend
+        self._rasterizer = None
+        self._fonts = {}   # font_size -> ImageFont
+        self._drawn = {}   # (font_size, char) -> PIL image, or None for an empty glyph
+        self._scaled = {}  # (forced_height, max_width, char) -> grayscale array, None or the exception raised
+
+    def _font(self, font_size):
+        font = self._fonts.get(font_size)
+        if font is None:
+            from PIL import ImageFont
+
+            font = self._fonts[font_size] = ImageFont.truetype(self.ttf_path, font_size, index=self.face_index)
+        return font
+
+    def grayscale(self, char, forced_height, max_width):
+        """Returns the scaled grayscale glyph (None when the font has no visible glyph), or the exception raised."""
+        key = (forced_height, max_width, char)
+        if key in self._scaled:
+            return self._scaled[key]
+        if self.backend == "direct":
+            return self._direct(key)
+
+        font_size = forced_height * 2
+        drawn_key = (font_size, char)
+        if drawn_key not in self._drawn:
+            if len(self._drawn) >= self.max_entries:
+                self._drawn.clear()
+            self._drawn[drawn_key] = draw_glyph(self._font(font_size), char)
+
+        image = self._drawn[drawn_key]
+        try:
+            result = None if image is None else scale_glyph(image, char, forced_height, max_width)
+        except Exception as e:
+            result = e
+        if len(self._scaled) >= self.max_entries:
+            self._scaled.clear()
+        self._scaled[key] = result
+        return result
+
+    def _direct(self, key):
+        forced_height, max_width, char = key
+        if self._rasterizer is None:
+            self._rasterizer = DirectRasterizer(self.ttf_path, self.face_index)
+        try:
+            glyph = self._rasterizer.rasterize(char, forced_height, max_width)
+            result = None if glyph.size == 0 else glyph * np.uint8(255)
+        except Exception as e:
+            result = e
+        if len(self._scaled) >= self.max_entries:
+            self._scaled.clear()
+        self._scaled[key] = result
+        return result
+
+    def render(self, chars, canvas_width, canvas_height, forced_height, max_width, threshold_value=128,
+               padding_top=0):
+        """
+        Renders characters the way generate_glyph_atlas places them.
+
+        Returns:
+            tuple: ((n, canvas_height, canvas_width) uint8 array of 0/1 pixels,
+                    list of the positions whose glyph is missing or does not fit the canvas)
+        """
+        bitmaps = np.zeros((len(chars), canvas_height, canvas_width), dtype=np.uint8)
+        missing = []
+        for i, char in enumerate(chars):
+            if char == " ":
+                continue
+            grayscale = self.grayscale(char, forced_height, max_width)
+            if grayscale is None or isinstance(grayscale, Exception) or grayscale.size == 0:
+                missing.append(i)
+                continue
+            try:
+                bitmaps[i] = place_glyph(threshold_glyph(grayscale, threshold_value),
+                                         canvas_width, canvas_height, padding_top)
+            except ValueError:
+                missing.append(i)
+        return bitmaps, missing
+
+
+def preview_image(bitmaps, columns, zoom=1, gap=2, missing=()):
+    """
+    Tiles glyph bitmaps into a grid and returns it as a binary PGM (accepted by tkinter.PhotoImage).
+    Set pixels are black on white, cells are separated by gray gaps and missing glyphs are shaded.
+    """
+    count, height, width = bitmaps.shape
+    rows = max(-(-count // columns), 1)
+    cell_height, cell_width = height * zoom + gap, width * zoom + gap
+
+    cells = np.where(bitmaps, 0, 255).astype(np.uint8)
+    if len(missing):
+        cells[list(missing)] = 224
+    if zoom > 1:
+        cells = cells.repeat(zoom, axis=1).repeat(zoom, axis=2)
+
+    tiles = np.full((rows * columns, cell_height, cell_width), 160, dtype=np.uint8)
+    tiles[:count, :height * zoom, :width * zoom] = cells
+    image = tiles.reshape(rows, columns, cell_height, cell_width).transpose(0, 2, 1, 3).reshape(
+        rows * cell_height, columns * cell_width)
+    return b"P5 %d %d 255\n" % (image.shape[1], image.shape[0]) + image.tobytes()
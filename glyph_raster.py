@@ -0,0 +1,321 @@
+import ctypes
+import io
+import os
+import time
+
+import numpy as np
+
+import instrumentation
+
+# PIL is imported by the functions that rasterize, so builds served entirely from the glyph cache
+# (and the GUI at start-up) never load it
+
+
+PUNCTUATION_SET = {',', '.'}
+PUNCTUATION_SCALE = 0.25
+NARROW_CHARS = {"I"}
+NARROW_CHAR_SCALE = 0.5
+
+# "resize" draws with PIL at twice forced_height and LANCZOS-scales the grayscale glyph down before
+# thresholding; "direct" renders a monochrome bitmap at the target size with FreeType (DirectRasterizer)
+RASTER_BACKENDS = ("resize", "direct")
+
+# threshold_value that picks each glyph's own Otsu threshold (threshold_sweep.otsu_threshold)
+AUTO_THRESHOLD = "auto"
+
+# Font held by each worker process, opened once by _init_worker (a DirectRasterizer for "direct")
+_worker_font = None
+
+
+def draw_glyph(font, char):
+    """
+    Draws one character at the font's size, cropped to its ink box.
+
+    Returns:
+        PIL.Image.Image: 'L' image of the glyph, or None when the font has no visible glyph for the character.
+    """
+    from PIL import Image, ImageDraw
+
+    with instrumentation.span("draw_text"):
+        (width, height), (offset_x, offset_y) = font.font.getsize(char)
+        if width == 0 or height == 0:
+            return None
+
+        image = Image.new('L', (width, height), 0)
+        draw = ImageDraw.Draw(image)
+        draw.text((-offset_x, -offset_y), char, font=font, fill=255)
+        return image
+
+
+def target_size(char, aspect_ratio, forced_height, max_width,
+                punctuation_scale=PUNCTUATION_SCALE, narrow_char_scale=NARROW_CHAR_SCALE):
+    """Returns (target_height, scaled_width) of a glyph box with the given width / height ratio."""
+    if char in PUNCTUATION_SET:
+        target_height = int(forced_height * punctuation_scale)
+        scaled_width = min(int(target_height * aspect_ratio), max_width)
+    elif char in NARROW_CHARS:
+        target_height = forced_height
+        scaled_width = min(int(target_height * aspect_ratio * narrow_char_scale), max_width)
+    else:
+        target_height = forced_height
+        scaled_width = min(int(target_height * aspect_ratio), max_width)
+    return target_height, scaled_width
+
+
+def scale_glyph(image, char, forced_height, max_width,
+                punctuation_scale=PUNCTUATION_SCALE, narrow_char_scale=NARROW_CHAR_SCALE):
+    """
+    Scales a glyph drawn by draw_glyph to forced_height (narrow and punctuation characters are scaled down).
+
+    Returns:
+        numpy.ndarray: (target_height, scaled_width) uint8 grayscale array, before thresholding.
+    """
+    from PIL import Image
+
+    width, height = image.size
+    target_height, scaled_width = target_size(char, width / height, forced_height, max_width,
+                                              punctuation_scale, narrow_char_scale)
+
+    with instrumentation.span("resize"):
+        return np.array(image.resize((scaled_width, target_height), Image.Resampling.LANCZOS))
+
+
+def threshold_glyph(grayscale, threshold_value):
+    """Returns the 0/1 pixels of a grayscale glyph above threshold_value, or above its Otsu threshold for AUTO_THRESHOLD."""
+    if threshold_value == AUTO_THRESHOLD:
+        from threshold_sweep import otsu_threshold
+
+        threshold_value = otsu_threshold(grayscale)
+    return (grayscale > threshold_value).astype(np.uint8)
+
+
+def rasterize_glyph(font, char, forced_height, max_width, threshold_value=128,
+                    punctuation_scale=PUNCTUATION_SCALE, narrow_char_scale=NARROW_CHAR_SCALE):
+    """
+    Renders one character, scales it to forced_height (narrow and punctuation characters are scaled down)
+    and thresholds it (threshold_value AUTO_THRESHOLD uses the glyph's Otsu threshold).
+
+    Returns:
+        numpy.ndarray: (target_height, scaled_width) uint8 array of 0/1 pixels.
+                       A (0, 0) array means the font has no visible glyph for the character.
+    """
+    image = draw_glyph(font, char)
+    if image is None:
+        return np.zeros((0, 0), dtype=np.uint8)
+
+    grayscale = scale_glyph(image, char, forced_height, max_width, punctuation_scale, narrow_char_scale)
+    with instrumentation.span("threshold"):
+        return threshold_glyph(grayscale, threshold_value)
+
+
+class DirectRasterizer:
+    """
+    Renders glyphs with FreeType straight at their target size in monochrome mode, into one scratch
+    buffer reused for every glyph, instead of drawing at twice the size and resizing.
+
+    The glyph box is the one draw_glyph crops to (advance width, from the top of the ink down to
+    the baseline or the bottom of the ink) scaled like scale_glyph does, so results have the same
+    shape as rasterize_glyph's and are placed the same way. The box is stretched to its target by
+    giving FreeType separate horizontal and vertical sizes; the font's own hinting instructions
+    are not written for that, so glyphs go through FreeType's autohinter (hinting=False renders
+    them unhinted). Mono bitmaps are already 0/1, threshold_value does not apply.
+
+    Needs freetype-py. Not thread-safe: use one per thread or process.
+    """
+
+    def __init__(self, ttf_path, face_index=0, hinting=True):
+        import freetype
+
+        import font_registry
+
+        self._freetype = freetype
+        # The font bytes are shared with the ImageFonts of the registry
+        self.face = freetype.Face(io.BytesIO(font_registry.face(ttf_path, face_index).data), index=face_index)
+        self.load_flags = freetype.FT_LOAD_RENDER | freetype.FT_LOAD_TARGET_MONO | (
+            freetype.FT_LOAD_FORCE_AUTOHINT if hinting else freetype.FT_LOAD_NO_HINTING)
+        self._boxes = {}  # char -> (left, top, width, height) in font units, or None for an empty glyph
+        self._scratch = np.zeros(4096, dtype=np.uint8)
+
+    def _box(self, char):
+        """The unscaled glyph box of a character, as draw_glyph measures it, in font units (y up)."""
+        if char not in self._boxes:
+            self.face.load_char(char, self._freetype.FT_LOAD_NO_SCALE)
+            glyph = self.face.glyph
+            bbox = glyph.outline.get_bbox()
+            left, right = min(0, bbox.xMin), max(glyph.advance.x, bbox.xMax)
+            top, bottom = max(bbox.yMax, 0), min(bbox.yMin, 0)
+            empty = glyph.outline.n_points == 0 or right <= left or top <= bottom
+            self._boxes[char] = None if empty else (left, top, right - left, top - bottom)
+        return self._boxes[char]
+
+    def _bitmap_rows(self, bitmap):
+        """
+        The rows of a mono FT_Bitmap, top row first, as a (rows, abs(pitch)) view of the scratch buffer.
+
+        The bytes are copied straight from the bitmap's buffer pointer into the scratch buffer (grown
+        as needed): bitmap.buffer would build a Python list of every byte for each glyph. A negative
+        pitch means the buffer starts with the bottom row, so the rows are flipped.
+        """
+        rows, pitch = bitmap.rows, bitmap.pitch
+        size = rows * abs(pitch)
+        if size > len(self._scratch):
+            self._scratch = np.zeros(2 * size, dtype=np.uint8)
+        ctypes.memmove(self._scratch.ctypes.data, bitmap._FT_Bitmap.buffer, size)
+        pixels = self._scratch[:size].reshape(rows, abs(pitch))
+        return pixels if pitch >= 0 else pixels[::-1]
+
+    def rasterize(self, char, forced_height, max_width,
+                  punctuation_scale=PUNCTUATION_SCALE, narrow_char_scale=NARROW_CHAR_SCALE):
+        """
+        Renders one character at its target size.
+
+        Returns:
+            numpy.ndarray: (target_height, scaled_width) uint8 array of 0/1 pixels, like rasterize_glyph.
+        """
+        box = self._box(char)
+        if box is None:
+            return np.zeros((0, 0), dtype=np.uint8)
+        left, top, width, height = box
+        target_height, scaled_width = target_size(char, width / height, forced_height, max_width,
+                                                  punctuation_scale, narrow_char_scale)
+        glyph_array = np.zeros((target_height, scaled_width), dtype=np.uint8)
+        if target_height <= 0 or scaled_width <= 0:
+            return glyph_array
+
+        # Pixels per font unit on each axis; at 72 dpi a size in points is a size in pixels
+        scale_x, scale_y = scaled_width / width, target_height / height
+        units_per_em = self.face.units_per_EM
+        with instrumentation.span("draw_text"):
+            self.face.set_char_size(max(round(scale_x * units_per_em * 64), 1),
+                                    max(round(scale_y * units_per_em * 64), 1), 72, 72)
+            self.face.load_char(char, self.load_flags)
+        glyph = self.face.glyph
+        rows, columns = glyph.bitmap.rows, glyph.bitmap.width
+        if rows == 0 or columns == 0:
+            return glyph_array
+        pixels = np.unpackbits(self._bitmap_rows(glyph.bitmap), axis=1, count=columns)
+
+        # Where the bitmap's top left pixel falls in the box; hinting may move it by a pixel
+        row = round(top * scale_y) - glyph.bitmap_top
+        column = glyph.bitmap_left - round(left * scale_x)
+        first_row, first_column = max(row, 0), max(column, 0)
+        last_row, last_column = min(row + rows, target_height), min(column + columns, scaled_width)
+        if last_row > first_row and last_column > first_column:
+            glyph_array[first_row:last_row, first_column:last_column] = \
+                pixels[first_row - row:last_row - row, first_column - column:last_column - column]
+        return glyph_array
+
+
+def _rasterize(font, char, forced_height, max_width, threshold_value):
+    """rasterize_glyph for an ImageFont, DirectRasterizer.rasterize for a DirectRasterizer."""
+    if isinstance(font, DirectRasterizer):
+        return font.rasterize(char, forced_height, max_width)
+    return rasterize_glyph(font, char, forced_height, max_width, threshold_value)
+
+
+def _init_worker(ttf_path, font_size, face_index, backend="resize"):
+    """Opens the font once per worker process so every shard reuses a warm ImageFont (or DirectRasterizer)."""
+    global _worker_font
+    if backend == "direct":
+        _worker_font = DirectRasterizer(ttf_path, face_index)
+        return
+
+    from PIL import ImageFont
+
+    _worker_font = ImageFont.truetype(ttf_path, font_size, index=face_index)
+
+
+def _render_shard(chars, forced_height, max_width, threshold_value):
+    """
+    Renders a shard of characters in a worker process.
+
+    Returns compact results instead of Python lists: a (n, 2) array of glyph shapes,
+    all glyph pixels bit-packed into one uint8 buffer, and {position: message} for failures.
+    """
+    shapes = np.zeros((len(chars), 2), dtype=np.int32)
+    pixels = []
+    errors = {}
+    for i, char in enumerate(chars):
+        try:
+            binary_array = _rasterize(_worker_font, char, forced_height, max_width, threshold_value)
+        except Exception as e:
+            errors[i] = str(e)
+            continue
+        shapes[i] = binary_array.shape
+        pixels.append(binary_array.ravel())
+
+    flat = np.concatenate(pixels) if pixels else np.zeros(0, dtype=np.uint8)
+    return shapes, np.packbits(flat), errors
+
+
+def _unpack_shard(shapes, packed, errors):
+    """Expands a shard returned by _render_shard back into per-glyph arrays (or exceptions)."""
+    sizes = shapes[:, 0] * shapes[:, 1]
+    flat = np.unpackbits(packed, count=int(sizes.sum()))
+    results = []
+    position = 0
+    for i, (height, width) in enumerate(shapes):
+        if i in errors:
+            results.append(RuntimeError(errors[i]))
+            continue
+        size = height * width
+        results.append(flat[position:position + size].reshape(height, width))
+        position += size
+    return results
+
+
+def render_glyphs(ttf_path, chars, forced_height, max_width, threshold_value=128, face_index=0,
+                  workers=1, font=None, backend="resize"):
+    """
+    Renders a list of characters with rasterize_glyph, or with a DirectRasterizer when backend is "direct".
+
+    With workers > 1 the list is split into shards across a ProcessPoolExecutor; each worker keeps
+    its own ImageFont. Results always come back in the order of `chars`, one entry per character:
+    either the thresholded array or the exception raised while rendering it. In-process renders take
+    the font from the shared font registry, so a face is only loaded once per size.
+    """
+    if backend not in RASTER_BACKENDS:
+        raise ValueError(f"Unknown raster backend '{backend}', expected one of {', '.join(RASTER_BACKENDS)}.")
+    font_size = forced_height * 2
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(chars) < 2:
+        if font is None:
+            import font_registry
+
+            with instrumentation.span("load_font"):
+                if backend == "direct":
+                    font = DirectRasterizer(ttf_path, face_index)
+                else:
+                    font = font_registry.face(ttf_path, face_index).font(font_size)
+        metrics = instrumentation.active()
+        results = []
+        for i, char in enumerate(chars):
+            start = time.perf_counter() if metrics else 0
+            try:
+                results.append(_rasterize(font, char, forced_height, max_width, threshold_value))
+            except Exception as e:
+                results.append(e)
+            if metrics:
+                metrics.glyph(char, time.perf_counter() - start)
+                metrics.progress("render", i + 1, len(chars))
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # A few shards per worker keeps all processes busy when some glyphs are slower than others
+    shard_size = max(1, -(-len(chars) // (workers * 4)))
+    shards = [chars[i:i + shard_size] for i in range(0, len(chars), shard_size)]
+
+    results = []
+    with instrumentation.span("render_workers"), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(ttf_path, font_size, face_index, backend)) as executor:
+        for shapes, packed, errors in executor.map(
+                _render_shard, shards,
+                [forced_height] * len(shards), [max_width] * len(shards), [threshold_value] * len(shards)):
+            results.extend(_unpack_shard(shapes, packed, errors))
+            instrumentation.progress("render", len(results), len(chars))
+    return results
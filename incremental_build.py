@@ -0,0 +1,471 @@
+from collections import namedtuple
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from font_profiles import DEFAULT_CHAR_LIST, DEFAULT_PROFILES
+from atomic_file import AtomicFile
+from font_rom import (render_glyph_arrays, place_glyph_arrays, write_xbm, write_mif, write_combined_binary_debug,
+                      write_dedup_binary, write_packed_binary, write_lookup_tables, atlas_sections, mif_layout,
+                      SPLIT_MIF_FILES)
+from font_registry import parse_font_spec
+from glyph_atlas import GlyphAtlas
+from glyph_cache import font_fingerprint
+from glyph_raster import PUNCTUATION_SCALE, NARROW_CHAR_SCALE
+import instrumentation
+from rom_builder import build_rom_image, write_rom_image
+
+
+MANIFEST_FILE = "FontRom.manifest.json"
+MANIFEST_VERSION = 2
+DEDUP_BINARY_FILE = "FontRomDedup.bin"
+PACKED_BINARY_FILE = "FontRomPacked.bin"
+
+# mode is "full", "patched" or "unchanged"; regenerated counts glyphs rendered,
+# changed/appended count glyphs whose rows were patched / inserted after the existing glyphs
+ProfileBuild = namedtuple("ProfileBuild", ["name", "mode", "regenerated", "changed", "appended"])
+
+
+class PatchError(Exception):
+    """An output file does not have the layout the manifest expects; the profile is rebuilt in full."""
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _profile_name(profile):
+    return f"{profile['canvas_width']}x{profile['canvas_height']}"
+
+
+def _profile_files(profile):
+    """Output files of a profile, relative to the output directory."""
+    files = [f"FontRom{profile['canvas_height']}.xbm", f"FontRom{profile['canvas_height']}.mif"]
+    if profile["canvas_width"] == 32 and profile["canvas_height"] == 64:
+        files += list(SPLIT_MIF_FILES)
+    return files
+
+
+def _file_stamps(output_dir, files):
+    """(size, mtime_ns) of every file, or None if one is missing."""
+    stamps = {}
+    for name in files:
+        try:
+            stat = os.stat(os.path.join(output_dir, name))
+        except OSError:
+            return None
+        stamps[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def load_manifest(output_dir):
+    """Returns the manifest of the last build in output_dir, or an empty one."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "profiles": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "profiles": {}}
+    return manifest
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def _state_path(output_dir, profile):
+    return os.path.join(output_dir, f"FontRom{profile['canvas_height']}.atlas.npz")
+
+
+def _load_state(output_dir, profile):
+    """
+    Loads the glyphs of the last build, or None.
+
+    Returns:
+        tuple: (GlyphAtlas of the placed glyphs, {char: thresholded array before placement})
+    """
+    try:
+        with np.load(_state_path(output_dir, profile), allow_pickle=False) as data:
+            chars = [chr(code_point) for code_point in data["chars"].tolist()]
+            atlas = GlyphAtlas(chars, data["normal"], profile["canvas_width"], profile["canvas_height"])
+            stack = data["raw"]
+            raw = {char: stack[i, :height, :width]
+                   for i, (char, (height, width)) in enumerate(zip(chars, data["raw_shapes"].tolist()))}
+            return atlas, raw
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_state(output_dir, profile, atlas, raw):
+    """
+    Saves the placed glyphs and, zero-padded to one stack, the arrays they were placed from, so a
+    placement change (padding) places them again without rendering.
+    """
+    shapes = np.array([raw[char].shape if char in raw else (0, 0) for char in atlas.chars],
+                      dtype=np.int32).reshape(-1, 2)
+    height, width = (int(size) for size in shapes.max(axis=0)) if len(shapes) else (0, 0)
+    stack = np.zeros((len(atlas.chars), height, width), dtype=np.uint8)
+    for i, char in enumerate(atlas.chars):
+        if char in raw:
+            stack[i, :shapes[i, 0], :shapes[i, 1]] = raw[char]
+
+    path = _state_path(output_dir, profile)
+    temp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(temp_path, chars=np.array([ord(char) for char in atlas.chars], dtype=np.int32).reshape(-1),
+             normal=atlas.planes["normal"], raw=stack, raw_shapes=shapes)
+    os.replace(temp_path, path)
+
+
+def _xbm_rows(glyph):
+    return "".join("  " + ", ".join(f"0x{byte:02X}" for byte in row) + ",\n" for row in glyph.tolist())
+
+
+def _mif_rows(glyph, start_address, hex_slice=slice(None)):
+    hex_digits = glyph.shape[1] * 2
+    hex_rows = glyph.tobytes().hex().upper()
+    return "".join(
+        f"{start_address + row:04X} : {hex_rows[row * hex_digits:(row + 1) * hex_digits][hex_slice]};\n"
+        for row in range(glyph.shape[0])
+    )
+
+
+def _patch_rows(path, patches, insertions=()):
+    """
+    Writes a file again with glyph rows replaced and new blocks inserted, copying everything else
+    from the current file. The copy goes through AtomicFile, so an interrupted build leaves the old
+    file (which the manifest still describes) rather than a half-patched one.
+
+    patches is a list of (marker, rows_start, text), in file order: the rows following `marker`
+    (starting right after the marker line, or after the first `rows_start` found past it) are
+    replaced by `text`, which must have the same length and line count as what it replaces.
+    insertions is a list of (marker, text): `text` is inserted right before the last `marker`, or at
+    the end of the file when marker is None.
+    Raises PatchError when a marker is missing or the rows do not line up.
+    """
+    if not patches and not insertions:
+        return
+    with open(path, "rb") as f:
+        old = f.read()
+
+    edits = []
+    position = 0
+    for marker, rows_start, text in patches:
+        marker = marker.encode("utf-8")
+        data = text.encode("utf-8")
+
+        found = old.find(marker, position)
+        if found < 0:
+            raise PatchError(f"'{marker.decode('utf-8').strip()}' not found in '{path}'.")
+        start = found + len(marker)
+        if rows_start is not None:
+            found = old.find(rows_start, start)
+            if found < 0:
+                raise PatchError(f"'{rows_start.decode('utf-8').strip()}' not found after "
+                                 f"'{marker.decode('utf-8').strip()}' in '{path}'.")
+            start = found + len(rows_start)
+
+        end = start + len(data)
+        if end > len(old) or old.count(b"\n", start, end) != data.count(b"\n") or old[end - 1] != 0x0A:
+            raise PatchError(f"Rows after '{marker.decode('utf-8').strip()}' in '{path}' "
+                             f"do not match the expected layout.")
+        edits.append((start, end, data))
+        position = end
+
+    for marker, text in insertions:
+        found = len(old) if marker is None else old.rfind(marker.encode("utf-8"))
+        if found < 0:
+            raise PatchError(f"'{marker.strip()}' not found in '{path}'.")
+        edits.append((found, found, text.encode("utf-8")))
+
+    edits.sort(key=lambda edit: edit[0])
+    view = memoryview(old)
+    position = 0
+    with AtomicFile(path, "wb") as f:
+        for start, end, data in edits:
+            if start < position:
+                raise PatchError(f"Overlapping changes in '{path}'.")
+            f.write(view[position:start])
+            f.write(data)
+            position = end
+        f.write(view[position:])
+
+
+def _xbm_blocks(char, glyph, strikeout, canvas_width, canvas_height):
+    """The normal and strikeout blocks write_xbm writes for one glyph."""
+    normal = (f"/* Character: '{char}' */\n#define {char}_width {canvas_width}\n"
+              f"#define {char}_height {canvas_height}\nstatic char {char}_bits[] = {{\n"
+              f"{_xbm_rows(glyph)}}};\n\n")
+    strikeout = (f"/* Strikeout Character: '{char}' */\nstatic char {char}_strikeout_bits[] = {{\n"
+                 f"{_xbm_rows(strikeout)}}};\n\n")
+    return normal, strikeout
+
+
+@instrumentation.staged("patch")
+def _patch_profile(output_dir, profile, atlas, changed, first_new):
+    """
+    Updates the XBM and MIF files of a profile for the changed glyph indexes and the glyphs from first_new on.
+
+    Changed rows are replaced and new glyphs are inserted where a full build puts them: at the end
+    of the normal blocks (right before the first glyph's strikeout block) and at the end of the
+    strikeout blocks. MIF entries carry their own addresses, so the new normal rows take the
+    addresses after the last glyph and the new strikeout rows the same offsets from
+    strikeout_start_address; nothing already written moves to another address. Compact MIFs have
+    no fixed line per row to patch, so they are written again in full instead.
+    """
+    canvas_width, canvas_height = profile["canvas_width"], profile["canvas_height"]
+    xbm_file, mif_file = _profile_files(profile)[:2]
+    _, strikeout_start_address = mif_layout(canvas_width, canvas_height)
+    grid_height = 39 if canvas_width == 32 and canvas_height == 64 else canvas_height
+
+    normal = atlas.planes["normal"]
+    xbm_strikeout = atlas.strikeout_plane((grid_height // 2) - 1, rows=3)
+    mif_strikeout = atlas.strikeout_plane((canvas_height // 2) - 1, rows=3, blank_chars=(" ",))
+    appended = range(first_new, len(atlas.chars))
+    first_char = atlas.chars[0]
+
+    xbm_patches = []
+    for variant, plane in (("Character", normal), ("Strikeout Character", xbm_strikeout)):
+        for i in changed:
+            xbm_patches.append((f"/* {variant}: '{atlas.chars[i]}' */\n", b"{\n", _xbm_rows(plane[i])))
+    xbm_insertions = []
+    if appended:
+        new_blocks = [_xbm_blocks(atlas.chars[i], normal[i], xbm_strikeout[i], canvas_width, canvas_height)
+                      for i in appended]
+        # The XBM ends with the last strikeout block
+        xbm_insertions = [(f"/* Strikeout Character: '{first_char}' */\n", "".join(block for block, _ in new_blocks)),
+                          (None, "".join(block for _, block in new_blocks))]
+    _patch_rows(os.path.join(output_dir, xbm_file), xbm_patches, xbm_insertions)
+
+    if profile.get("compact_mif"):
+        write_mif(atlas, os.path.join(output_dir, mif_file), canvas_width, canvas_height, compact=True)
+        return
+
+    mif_files = [(mif_file, slice(None))]
+    if canvas_width == 32 and canvas_height == 64:
+        mif_files += [(SPLIT_MIF_FILES[0], slice(4, 8)), (SPLIT_MIF_FILES[1], slice(0, 4))]
+    planes = (("Character", 0x0000, normal), ("Strikeout Character", strikeout_start_address, mif_strikeout))
+
+    for name, hex_slice in mif_files:
+        mif_patches = []
+        for variant, start_address, plane in planes:
+            for i in changed:
+                mif_patches.append((f"-- {variant}: '{atlas.chars[i]}'\n", None,
+                                    _mif_rows(plane[i], start_address + i * canvas_height, hex_slice)))
+        mif_insertions = []
+        if appended:
+            normal_text, strikeout_text = (
+                "".join(f"-- {variant}: '{atlas.chars[i]}'\n"
+                        + _mif_rows(plane[i], start_address + i * canvas_height, hex_slice) for i in appended)
+                for variant, start_address, plane in planes
+            )
+            mif_insertions = [(f"-- Strikeout Character: '{first_char}'\n", normal_text), ("END;", strikeout_text)]
+        _patch_rows(os.path.join(output_dir, name), mif_patches, mif_insertions)
+
+
+def _update_rom_file(rom, output_file):
+    """
+    Writes the ROM (atomically, write_rom_image) only when it differs from the file on disk.
+
+    Returns:
+        int: Number of bytes that changed (the whole image when there was no file of the same size).
+    """
+    new = np.frombuffer(rom.image, dtype=np.uint8)
+    try:
+        with open(output_file, "rb") as f:
+            old = np.frombuffer(f.read(), dtype=np.uint8)
+    except OSError:
+        old = None
+
+    changed = len(new) if old is None or len(old) != len(new) else int(np.count_nonzero(old != new))
+    if changed:
+        write_rom_image(rom, output_file)
+    return changed
+
+
+def build_font_rom(ttf_path, output_dir, profiles=DEFAULT_PROFILES, char_list=DEFAULT_CHAR_LIST,
+                   target_size=81920, cache=None, face_index=0, workers=1, incremental=True, debug_log=False,
+                   dedup=None, packed=False, fallback_fonts=(), raster_backend="resize"):
+    """
+    Builds the XBM/MIF files of every profile and FontRomCombined.bin, reusing the previous build
+    in output_dir where possible.
+
+    A manifest (FontRom.manifest.json) records, per profile, the render inputs (font hashes, face,
+    forced_height, max_width, threshold, scales, backend) and the placement inputs (canvas size,
+    padding) separately, and per glyph the hash of its render inputs and code point and the SHA-256
+    of its packed output. FontRom<height>.atlas.npz keeps the packed glyphs and the thresholded
+    arrays they were placed from. On the next run:
+
+    - glyphs whose render inputs are unchanged are not rendered again, the stored arrays are used;
+    - only glyphs rendered again, or every glyph when the placement inputs changed, are placed
+      again, and only those whose output hash differs have their rows rewritten in the XBM and MIF files;
+    - characters added at the end of char_list are rendered alone and their blocks inserted where a
+      full build puts them (after the last normal block and after the last strikeout block);
+    - the combined binary is rebuilt in memory and only written when it differs from the file;
+    - the code point lookup table (FontRomLookup.bin/.h/.mif) is written again, it is tiny.
+
+    Every file is written under a temporary name and then replaced, patched files included, so an
+    interrupted build leaves complete files; the manifest keeps their size and mtime, and a file
+    that does not match gives a full rebuild of its profile.
+    Removed or reordered characters, edited output files, or incremental=False write the files in
+    full with the regular writers (still from the stored arrays when the state is usable). A profile with "compact_mif": True gets MIFs with range records
+    (write_mif compact), which are written again in full rather than patched.
+
+    With dedup set to "glyphs" (or "rows" to deduplicate rows as well), FontRomDedup.bin is written
+    too: the same planes with every distinct glyph stored once (write_dedup_binary), with its size report.
+    With packed, FontRomPacked.bin holds the glyphs trimmed to their bounding box (write_packed_binary).
+    Characters missing from the font come from the first of fallback_fonts that has them
+    (generate_glyph_atlas); the fallback fonts' hashes are part of every glyph's inputs.
+    raster_backend selects how glyphs are rasterized ("resize" or "direct", see generate_glyph_atlas).
+
+    Returns:
+        list: ProfileBuild per profile.
+    """
+    if dedup not in (None, "glyphs", "rows"):
+        raise ValueError(f"Unknown dedup mode '{dedup}', expected 'glyphs' or 'rows'.")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir) if incremental else {"version": MANIFEST_VERSION, "profiles": {}}
+    font_hash = font_fingerprint(ttf_path)
+    # Only present when set, so manifests of single-font resize builds stay valid
+    extra_inputs = {}
+    if fallback_fonts:
+        extra_inputs["fallback"] = [[font_fingerprint(path), index]
+                                    for path, index in map(parse_font_spec, fallback_fonts)]
+    if raster_backend != "resize":
+        extra_inputs["raster_backend"] = raster_backend
+    wanted = list(dict.fromkeys(char_list))
+
+    results = []
+    atlases = []
+    for profile in profiles:
+        name = _profile_name(profile)
+        canvas_width, canvas_height = profile["canvas_width"], profile["canvas_height"]
+        # The MIF format does not change any glyph, so it is kept out of the glyph inputs
+        compact_mif = bool(profile.get("compact_mif", False))
+        render_inputs = dict(font=font_hash, face=face_index, **extra_inputs,
+                             forced_height=profile["forced_height"], max_width=profile["max_width"],
+                             threshold_value=profile["threshold_value"],
+                             punctuation_scale=PUNCTUATION_SCALE, narrow_char_scale=NARROW_CHAR_SCALE)
+        placement_inputs = {key: value for key, value in profile.items()
+                            if key not in render_inputs and key != "compact_mif"}
+        render_hash = _hash(json.dumps(render_inputs, sort_keys=True).encode("utf-8"))
+        placement_hash = _hash(json.dumps(placement_inputs, sort_keys=True).encode("utf-8"))
+        files = _profile_files(profile)
+
+        def glyph_hash(char):
+            return _hash(f"{render_hash}:{ord(char)}".encode("utf-8"))
+
+        def render(chars):
+            with instrumentation.stage("generate"):
+                return render_glyph_arrays(ttf_path, chars, profile["forced_height"], profile["max_width"],
+                                           profile["threshold_value"], cache=cache, face_index=face_index,
+                                           workers=workers, fallback_fonts=fallback_fonts,
+                                           raster_backend=raster_backend)
+
+        def place(raw, chars):
+            with instrumentation.stage("generate"):
+                return place_glyph_arrays(raw, chars, canvas_width, canvas_height, profile["padding_top"])
+
+        previous = manifest["profiles"].get(name)
+        state = _load_state(output_dir, profile) if previous else None
+        usable = (state is not None and previous.get("files") == _file_stamps(output_dir, files)
+                  and previous.get("compact_mif", False) == compact_mif
+                  and [ord(char) for char in state[0].chars] == [cp for cp, _, _ in previous["glyphs"]])
+
+        atlas = None
+        mode = "full"
+        regenerated = changed = appended = 0
+        if usable:
+            old_atlas, old_raw = state
+            old_glyph_hashes = {cp: glyph_hash for cp, glyph_hash, _ in previous["glyphs"]}
+            placement_changed = previous["placement_hash"] != placement_hash
+
+            # Glyphs whose render inputs changed, and new ones, are rendered; the others are reused
+            to_render = [char for char in wanted
+                         if char != " " and (char not in old_atlas or old_glyph_hashes[ord(char)] != glyph_hash(char))]
+            raw = {char: array for char, array in old_raw.items() if char in old_atlas}
+            if to_render:
+                raw.update(render(to_render))
+            rendered = set(to_render)
+            placed = place(raw, [char for char in wanted
+                                 if placement_changed or char in rendered or char not in old_atlas])
+
+            chars = [char for char in wanted if char in placed or (char in old_atlas and char not in rendered
+                                                                   and not placement_changed)]
+            sources = np.concatenate([old_atlas.planes["normal"], placed.planes["normal"]])
+            normal = sources[[placed.index[ord(char)] + len(old_atlas) if char in placed
+                              else old_atlas.index[ord(char)] for char in chars]]
+            atlas = GlyphAtlas(chars, normal, canvas_width, canvas_height)
+
+            first_new = len(old_atlas)
+            old_hashes = [output_hash for _, _, output_hash in previous["glyphs"]]
+            # Removed or reordered characters move every later glyph: the files are written in full
+            if chars[:first_new] == old_atlas.chars:
+                changed_indexes = [i for i in range(first_new)
+                                   if chars[i] in placed and _hash(normal[i].tobytes()) != old_hashes[i]]
+                try:
+                    if changed_indexes or len(chars) > first_new:
+                        _patch_profile(output_dir, profile, atlas, changed_indexes, first_new)
+                        mode = "patched"
+                    else:
+                        mode = "unchanged"
+                    changed, appended = len(changed_indexes), len(chars) - first_new
+                except (OSError, PatchError) as e:
+                    print(f"Warning: Unable to patch the {name} files, writing them in full. Reason: {e}")
+            regenerated = len(to_render)
+        else:
+            raw = render(wanted)
+            atlas = place(raw, wanted)
+            regenerated = len([char for char in wanted if char != " "])
+
+        if mode == "full":
+            write_xbm(atlas, os.path.join(output_dir, files[0]), canvas_width, canvas_height)
+            write_mif(atlas, os.path.join(output_dir, files[1]), canvas_width, canvas_height,
+                      compact=compact_mif)
+        if mode != "unchanged" or regenerated:
+            _save_state(output_dir, profile, atlas, raw)
+        manifest["profiles"][name] = {
+            "inputs": {"render": render_inputs, "placement": placement_inputs},
+            "render_hash": render_hash,
+            "placement_hash": placement_hash,
+            "compact_mif": compact_mif,
+            # [code point, render inputs hash, output hash] per glyph, in ROM order
+            "glyphs": [[ord(char), glyph_hash(char), _hash(atlas.planes["normal"][i].tobytes())]
+                       for i, char in enumerate(atlas.chars)],
+            "files": _file_stamps(output_dir, files),
+        }
+
+        print(f"{name}: {mode} ({regenerated} regenerated, {changed} patched, {appended} appended)")
+        results.append(ProfileBuild(name, mode, regenerated, changed, appended))
+        atlases.append(atlas)
+
+    # Same sections write_mif hands to write_combined_binary, without writing the MIFs again
+    mif_output = []
+    for atlas in atlases:
+        mif_output.extend(atlas_sections(atlas))
+
+    output_binary_file = os.path.join(output_dir, "FontRomCombined.bin")
+    with instrumentation.stage("write_combined_binary"):
+        rom = build_rom_image(mif_output, target_size, append_checksum=False)
+        written = _update_rom_file(rom, output_binary_file)
+        print(f"Binary file updated: {output_binary_file} ({written} bytes changed).")
+        if debug_log and written:
+            debug_file_path = output_binary_file.replace(".bin", "_debug.txt")
+            write_combined_binary_debug(mif_output, rom, debug_file_path, target_size)
+            print(f"Debug log saved: {debug_file_path}")
+
+    write_lookup_tables(atlases, output_dir)
+    if dedup:
+        write_dedup_binary(atlases, os.path.join(output_dir, DEDUP_BINARY_FILE), wanted, target_size,
+                           dedup_rows=dedup == "rows")
+    if packed:
+        write_packed_binary(atlases, os.path.join(output_dir, PACKED_BINARY_FILE), target_size)
+
+    save_manifest(output_dir, manifest)
+    return results
@@ -0,0 +1,220 @@
+from contextlib import contextmanager, nullcontext
+import functools
+import heapq
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+# Metrics collector the pipeline reports to; None when instrumentation is off
+_active = None
+
+_NULL_CONTEXT = nullcontext()
+
+
+class BuildCancelled(Exception):
+    """Raised inside the pipeline when the cancel_event of the active Instrumentation is set."""
+
+
+class Instrumentation:
+    """
+    Opt-in metrics for the generate -> write_xbm -> write_mif -> split -> write_combined_binary chain.
+
+    Pipeline code reports through the module functions stage(), span() and progress() (and
+    active().glyph() for per-glyph times), which do nothing unless an Instrumentation is activated
+    with collect().
+
+    - Stages are the coarse steps (generate, write_mif, ...). They get wall time, call counts,
+      a tracemalloc peak (with trace_memory) and a callback on start and end.
+    - Spans are the fine steps inside them (load_font, draw_text, resize, threshold, pack, I/O)
+      and only get wall time and call counts, so they stay cheap per glyph.
+    - glyph() keeps the slowest N glyphs; progress() forwards done/total counts to the callback.
+    - With a cancel_event, stage() and progress() raise BuildCancelled once the event is set, so a
+      build running in another thread stops at the next glyph.
+
+    Everything is also recorded as Chrome trace events (chrome://tracing, Perfetto) for write_trace().
+    Glyphs rendered in worker processes (workers > 1) are only covered by the enclosing stage.
+
+    Args:
+        callback (callable): Called as callback(event, data) with event "stage_start", "stage_end"
+                             or "progress" and a dict of details.
+        trace_memory (bool): Track the tracemalloc peak of every stage (slows the build down).
+        slowest (int): Number of slowest glyphs to keep.
+        trace_spans (bool): Also write span events to the trace; the span totals are kept either way.
+        cancel_event (threading.Event): Set it to cancel the build.
+    """
+
+    def __init__(self, callback=None, trace_memory=False, slowest=10, trace_spans=True, cancel_event=None):
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.trace_memory = trace_memory
+        self.slowest = slowest
+        self.trace_spans = trace_spans
+        self.stats = {}           # name -> {"kind", "calls", "seconds", "max_seconds", "peak_bytes"}
+        self.events = []          # Chrome trace events
+        self.slowest_glyphs = []  # min-heap of (seconds, char, stage)
+        self._stage_stack = []    # [name, peak_bytes] of the open stages
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+
+    def _record(self, kind, name, start, end, args=None):
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = self.stats[name] = {"kind": kind, "calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+        elapsed = end - start
+        entry["calls"] += 1
+        entry["seconds"] += elapsed
+        entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+
+        if kind == "stage" or self.trace_spans:
+            event = {"name": name, "cat": kind, "ph": "X", "ts": (start - self._origin) * 1e6,
+                     "dur": elapsed * 1e6, "pid": os.getpid(), "tid": threading.get_ident()}
+            if args:
+                event["args"] = args
+            self.events.append(event)
+        return entry
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise BuildCancelled("The build was cancelled.")
+
+    @contextmanager
+    def stage(self, name, **args):
+        self.check_cancelled()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            if self._stage_stack:
+                # Hand the peak so far to the enclosing stage before resetting it for this one
+                self._stage_stack[-1][1] = max(self._stage_stack[-1][1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stage_stack.append([name, 0])
+        if self.callback is not None:
+            self.callback("stage_start", {"stage": name, **args})
+
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            end = time.perf_counter()
+            _, peak = self._stage_stack.pop()
+            entry = self._record("stage", name, start, end, args)
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak)
+                if self._stage_stack:
+                    self._stage_stack[-1][1] = max(self._stage_stack[-1][1], peak)
+                tracemalloc.reset_peak()
+            if self.callback is not None:
+                self.callback("stage_end", {"stage": name, "seconds": end - start, **args})
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._record("span", name, start, time.perf_counter())
+
+    def glyph(self, char, seconds):
+        """Records how long one glyph took; only the `slowest` slowest are kept."""
+        stage = self._stage_stack[-1][0] if self._stage_stack else None
+        item = (seconds, char, stage)
+        if len(self.slowest_glyphs) < self.slowest:
+            heapq.heappush(self.slowest_glyphs, item)
+        elif seconds > self.slowest_glyphs[0][0]:
+            heapq.heapreplace(self.slowest_glyphs, item)
+
+    def progress(self, stage, done, total):
+        self.check_cancelled()
+        if self.callback is not None:
+            self.callback("progress", {"stage": stage, "done": done, "total": total})
+
+    def close(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def summary(self):
+        """Returns the per-stage/per-span totals and the slowest glyphs as a JSON-friendly dict."""
+        return {
+            "stages": {name: dict(entry) for name, entry in self.stats.items()},
+            "slowest_glyphs": [
+                {"char": char, "code_point": f"U+{ord(char):04X}", "seconds": seconds, "stage": stage}
+                for seconds, char, stage in sorted(self.slowest_glyphs, reverse=True)
+            ],
+        }
+
+    def write_trace(self, path):
+        """Writes a Chrome trace-event JSON file, with the summary under otherData."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "otherData": self.summary()}, f)
+
+    def format_summary(self):
+        """Returns the summary as a plain-text table."""
+        lines = [f"{'name':<24} {'kind':<6} {'calls':>7} {'seconds':>9} {'max ms':>8} {'peak MB':>8}"]
+        for name, entry in sorted(self.stats.items(), key=lambda item: -item[1]["seconds"]):
+            peak = f"{entry['peak_bytes'] / 1e6:8.2f}" if "peak_bytes" in entry else f"{'':>8}"
+            lines.append(f"{name:<24} {entry['kind']:<6} {entry['calls']:>7} {entry['seconds']:>9.4f} "
+                         f"{entry['max_seconds'] * 1000:>8.2f} {peak}")
+        if self.slowest_glyphs:
+            lines.append("Slowest glyphs: " + ", ".join(
+                f"'{char}' U+{ord(char):04X} {seconds * 1000:.2f} ms"
+                for seconds, char, _ in sorted(self.slowest_glyphs, reverse=True)))
+        return "\n".join(lines)
+
+
+@contextmanager
+def collect(instrumentation=None, **kwargs):
+    """
+    Activates an Instrumentation (a new one built from kwargs if none is given) for the block:
+
+        with collect(trace_memory=True) as metrics:
+            build_font_rom(...)
+        metrics.write_trace("trace.json")
+    """
+    global _active
+    instrumentation = instrumentation or Instrumentation(**kwargs)
+    previous = _active
+    _active = instrumentation
+    try:
+        yield instrumentation
+    finally:
+        _active = previous
+        instrumentation.close()
+
+
+def active():
+    """Returns the active Instrumentation, or None."""
+    return _active
+
+
+def stage(name, **args):
+    """Context manager timing a pipeline stage; a no-op when instrumentation is off."""
+    return _NULL_CONTEXT if _active is None else _active.stage(name, **args)
+
+
+def span(name):
+    """Context manager timing a step inside a stage; a no-op when instrumentation is off."""
+    return _NULL_CONTEXT if _active is None else _active.span(name)
+
+
+def progress(stage_name, done, total):
+    if _active is not None:
+        _active.progress(stage_name, done, total)
+
+
+def staged(name):
+    """Decorator running every call of a pipeline function as stage `name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            with _active.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
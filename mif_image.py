@@ -0,0 +1,165 @@
+import re
+
+import numpy as np
+
+from mif_stream import MifWriter
+
+
+RADIX_BASES = {"HEX": 16, "DEC": 10, "UNS": 10, "OCT": 8, "BIN": 2}
+
+_HEADER_RE = re.compile(r"\b(DEPTH|WIDTH|ADDRESS_RADIX|DATA_RADIX)\s*=\s*(\w+)\s*;", re.IGNORECASE)
+_CONTENT_BEGIN_RE = re.compile(r"\bCONTENT\s+BEGIN\b", re.IGNORECASE)
+_CONTENT_RE = re.compile(
+    r"--([^\n]*)"                                              # 1: line comment
+    r"|%([^%]*)%"                                              # 2: block comment
+    r"|\b(END)\s*;"                                            # 3: end of content
+    r"|\[\s*(\w+)\s*\.\.\s*(\w+)\s*\]\s*:\s*([^;]*);"          # 4-6: [first..last] : value;
+    r"|(\w+)\s*:\s*([^;]*);",                                  # 7-8: address : value [value ...];
+    re.IGNORECASE,
+)
+
+
+class MifImage:
+    """
+    A MIF held as a NumPy array of words, parsed once instead of re-split line by line by every tool.
+
+    Attributes:
+        depth (int), width (int): From the MIF header.
+        words (numpy.ndarray): uint64 word per address. Sized to the highest address used when a file
+                               writes past DEPTH (the 16x32 strikeout section does).
+        written (numpy.ndarray): bool per address, True where the file assigns a value.
+        comments (list): (address, text) annotations; each '-- text' comment is attached to the
+                         address of the next data word.
+    """
+
+    def __init__(self, depth, width, words=None, written=None, comments=None,
+                 address_radix="HEX", data_radix="HEX"):
+        self.depth = depth
+        self.width = width
+        self.address_radix = address_radix
+        self.data_radix = data_radix
+        self.words = np.zeros(depth, dtype=np.uint64) if words is None else np.asarray(words, dtype=np.uint64)
+        self.written = np.zeros(len(self.words), dtype=bool) if written is None else np.asarray(written, dtype=bool)
+        self.comments = [] if comments is None else list(comments)
+
+    @classmethod
+    def read(cls, path):
+        """Parses a MIF file."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.parse(f.read())
+
+    @classmethod
+    def parse(cls, text):
+        """Parses MIF text, including [a..b] : v; ranges and multi-value 'a : v1 v2;' entries."""
+        begin = _CONTENT_BEGIN_RE.search(text)
+        if begin is None:
+            raise ValueError("MIF has no CONTENT BEGIN section.")
+
+        header = re.sub(r"--[^\n]*|%[^%]*%", "", text[:begin.start()])
+        settings = {key.upper(): value.upper() for key, value in _HEADER_RE.findall(header)}
+        if "DEPTH" not in settings or "WIDTH" not in settings:
+            raise ValueError("MIF header must define DEPTH and WIDTH.")
+
+        depth = int(settings["DEPTH"])
+        width = int(settings["WIDTH"])
+        address_radix = settings.get("ADDRESS_RADIX", "HEX")
+        data_radix = settings.get("DATA_RADIX", "HEX")
+        address_base = RADIX_BASES[address_radix]
+        data_base = RADIX_BASES[data_radix]
+
+        addresses = []
+        values = []
+        pending_comments = []
+        comments = []
+
+        for match in _CONTENT_RE.finditer(text, begin.end()):
+            line_comment, block_comment, end, first, last, range_value, address, value = match.groups()
+            if line_comment is not None or block_comment is not None:
+                pending_comments.append((line_comment if line_comment is not None else block_comment).strip())
+                continue
+            if end is not None:
+                break
+
+            if first is not None:
+                start = int(first, address_base)
+                entry_values = [int(range_value.split()[0], data_base)] * (int(last, address_base) - start + 1)
+            else:
+                start = int(address, address_base)
+                entry_values = value.split()
+
+            if pending_comments:
+                comments.extend((start, comment) for comment in pending_comments)
+                pending_comments = []
+
+            if len(entry_values) == 1:
+                # Common case: one word per line
+                addresses.append(start)
+                values.append(entry_values[0] if first is not None else int(entry_values[0], data_base))
+            else:
+                addresses.extend(range(start, start + len(entry_values)))
+                values.extend(entry_values if first is not None else (int(v, data_base) for v in entry_values))
+
+        size = max(depth, max(addresses) + 1) if addresses else depth
+        for comment in pending_comments:
+            comments.append((size, comment))
+
+        image = cls(depth, width, np.zeros(size, dtype=np.uint64), None, comments, address_radix, data_radix)
+        if addresses:
+            address_array = np.array(addresses, dtype=np.int64)
+            image.words[address_array] = np.array(values, dtype=np.uint64)
+            image.written[address_array] = True
+        return image
+
+    @property
+    def bytes_per_word(self):
+        return (self.width + 7) // 8
+
+    def word_bytes(self, start=0, count=None):
+        """Returns words [start, start + count) as a (count, bytes_per_word) uint8 array, most significant byte first."""
+        stop = len(self.words) if count is None else start + count
+        big_endian = self.words[start:stop].astype(">u8").view(np.uint8).reshape(-1, 8)
+        return big_endian[:, 8 - self.bytes_per_word:]
+
+    def bits(self, start=0, count=None):
+        """Returns words [start, start + count) as a (count, width) 0/1 array, most significant bit first."""
+        return np.unpackbits(self.word_bytes(start, count), axis=1)[:, self.bytes_per_word * 8 - self.width:]
+
+    def slice_bits(self, lsb, width):
+        """Returns a new MifImage holding `width` bits of every word starting at bit `lsb`, comments included."""
+        mask = np.uint64((1 << width) - 1)
+        words = (self.words >> np.uint64(lsb)) & mask
+        return MifImage(self.depth, width, words, self.written.copy(), self.comments,
+                        self.address_radix, self.data_radix)
+
+    def write(self, path, final_newline=True, compact=False):
+        """
+        Serializes the written addresses (with their comments) back to a HEX MIF.
+        With compact, consecutive addresses holding the same value (and no comment between them)
+        are written as one '[AAAA..BBBB] : VALUE;' range record.
+        """
+        digits = (self.width + 3) // 4
+        comments_by_address = {}
+        for address, text in self.comments:
+            comments_by_address.setdefault(address, []).append(text)
+
+        written_addresses = np.flatnonzero(self.written)
+        values = self.words[written_addresses]
+        starts = np.ones(len(written_addresses), dtype=bool)
+        if compact and len(written_addresses) > 1:
+            starts[1:] = (np.diff(written_addresses) != 1) | (values[1:] != values[:-1])
+            starts |= np.isin(written_addresses, list(comments_by_address))
+        run_starts = np.flatnonzero(starts)
+        run_ends = np.append(run_starts[1:], len(written_addresses)) - 1
+
+        with MifWriter(path, self.depth, self.width, final_newline=final_newline) as writer:
+            for first, last in zip(written_addresses[run_starts].tolist(), written_addresses[run_ends].tolist()):
+                for text in comments_by_address.pop(first, ()):
+                    writer.comment(text)
+                hex_value = f"{int(self.words[first]):0{digits}X}"
+                if first == last:
+                    writer.word(first, hex_value)
+                else:
+                    writer.range(first, last, hex_value)
+            for address in sorted(comments_by_address):
+                for text in comments_by_address[address]:
+                    writer.comment(text)
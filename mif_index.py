@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from mif_image import MifImage
+
+
+SIDECAR_SUFFIX = ".glyphidx.npz"
+# Bumped whenever build() changes how comments map to addresses, so older sidecars are rebuilt
+INDEX_VERSION = 2
+
+_CHARACTER_COMMENT_RE = re.compile(r"(Strikeout )?Character: '(.)'")
+_STRIKEOUT_SECTION_RE = re.compile(r"Strikeout characters\b")
+
+# Indexes already loaded in this process, keyed by absolute MIF path
+_loaded = {}
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MifGlyphIndex:
+    """
+    Glyph lookup table for a generated font MIF.
+
+    Holds the parsed words plus code point -> start address maps built from the
+    "-- Character: 'X'" and "-- Strikeout Character: 'X'" comments. Plain "Character" comments
+    after a "-- Strikeout characters ..." section header (curr_conv) also mark the strikeout
+    variant. A character listed more than once keeps its first address.
+    """
+
+    def __init__(self, width, words, written, normal, strikeout, mtime_ns, size, sha256):
+        self.width = width
+        self.words = words
+        self.written = written
+        self.normal = normal
+        self.strikeout = strikeout
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
+
+    @classmethod
+    def build(cls, mif_file):
+        """Parses the MIF and collects the glyph start address of every character comment."""
+        stat = os.stat(mif_file)
+        mif = MifImage.read(mif_file)
+
+        normal = {}
+        strikeout = {}
+        in_strikeout_section = False
+        for address, text in mif.comments:
+            if _STRIKEOUT_SECTION_RE.match(text):
+                in_strikeout_section = True
+                continue
+            match = _CHARACTER_COMMENT_RE.match(text)
+            if not match:
+                continue
+            code_point = ord(match.group(2))
+            if match.group(1) or in_strikeout_section:
+                strikeout.setdefault(code_point, address)
+            else:
+                normal.setdefault(code_point, address)
+
+        return cls(mif.width, mif.words, mif.written, normal, strikeout,
+                   stat.st_mtime_ns, stat.st_size, _file_sha256(mif_file))
+
+    def save(self, sidecar_file):
+        """Writes the index next to the MIF as a compressed .npz sidecar."""
+        np.savez_compressed(
+            sidecar_file,
+            width=np.int64(self.width),
+            words=self.words,
+            written=self.written,
+            normal=np.array(sorted(self.normal.items()), dtype=np.int64).reshape(-1, 2),
+            strikeout=np.array(sorted(self.strikeout.items()), dtype=np.int64).reshape(-1, 2),
+            stamp=np.array([self.mtime_ns, self.size], dtype=np.int64),
+            sha256=np.array(self.sha256),
+            version=np.int64(INDEX_VERSION),
+        )
+
+    @classmethod
+    def load(cls, sidecar_file):
+        with np.load(sidecar_file, allow_pickle=False) as data:
+            if "version" not in data.files or int(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"Glyph index '{sidecar_file}' was written by another version.")
+            return cls(
+                int(data["width"]), data["words"], data["written"],
+                {int(cp): int(address) for cp, address in data["normal"]},
+                {int(cp): int(address) for cp, address in data["strikeout"]},
+                int(data["stamp"][0]), int(data["stamp"][1]), str(data["sha256"]),
+            )
+
+    def address_of(self, character, strikeout=False):
+        """Returns the start address of a character (str or code point), or None if the MIF does not have it."""
+        code_point = character if isinstance(character, int) else ord(character)
+        return (self.strikeout if strikeout else self.normal).get(code_point)
+
+    def rows(self, start_address, char_height):
+        """
+        Returns (words, present) for char_height rows from start_address.
+        Rows past the end of the file come back as 0 and not present.
+        """
+        addresses = np.arange(start_address, start_address + char_height)
+        in_range = addresses < len(self.words)
+        words = np.zeros(char_height, dtype=np.uint64)
+        present = np.zeros(char_height, dtype=bool)
+        words[in_range] = self.words[addresses[in_range]]
+        present[in_range] = self.written[addresses[in_range]]
+        return words, present
+
+
+def load_glyph_index(mif_file):
+    """
+    Returns the MifGlyphIndex for a MIF, parsing it only when needed.
+
+    The index is kept in memory and in a '<mif>.glyphidx.npz' sidecar. Both are reused while the
+    MIF's size and mtime are unchanged; if only the mtime moved, the SHA-256 decides whether the
+    content really changed.
+    """
+    path = os.path.abspath(mif_file)
+    stat = os.stat(path)
+
+    index = _loaded.get(path)
+    if index is None:
+        try:
+            index = MifGlyphIndex.load(path + SIDECAR_SUFFIX)
+        except (OSError, ValueError, KeyError):
+            index = None
+
+    if index is not None and (index.mtime_ns, index.size) != (stat.st_mtime_ns, stat.st_size):
+        if index.size == stat.st_size and index.sha256 == _file_sha256(path):
+            # Touched but not changed: keep the index and refresh its stamp
+            index.mtime_ns = stat.st_mtime_ns
+            index.save(path + SIDECAR_SUFFIX)
+        else:
+            index = None
+
+    if index is None:
+        index = MifGlyphIndex.build(path)
+        try:
+            index.save(path + SIDECAR_SUFFIX)
+        except OSError as e:
+            print(f"Warning: Unable to write glyph index for '{mif_file}'. Reason: {e}")
+
+    _loaded[path] = index
+    return index
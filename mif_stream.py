@@ -0,0 +1,196 @@
+from collections import namedtuple
+
+import numpy as np
+
+from atomic_file import AtomicFile
+import instrumentation
+
+
+DEFAULT_BUFFER_LINES = 4096
+
+# One contiguous run of ROM words as written to a MIF.
+# data is a (n_words, width // 8) uint8 array holding each word's bytes most significant first.
+MifSection = namedtuple("MifSection", ["name", "start_address", "width", "data"])
+
+
+class MifWriter:
+    """
+    Buffered MIF emitter. Lines are collected in a list of at most buffer_lines entries
+    and written in one call when it fills up, so memory stays bounded whatever the ROM size.
+    The file is written under a temporary name and only replaces `path` on close(); discard()
+    drops it, so an interrupted build never leaves a half-written MIF behind.
+    """
+
+    def __init__(self, path, depth, width, buffer_lines=DEFAULT_BUFFER_LINES, final_newline=True):
+        self.path = path
+        self.buffer_lines = buffer_lines
+        self.final_newline = final_newline
+        self._buffer = []
+        self._atomic = AtomicFile(path, "w", encoding="utf-8")
+        self._file = self._atomic.file
+        self._file.write(f"DEPTH = {depth};\nWIDTH = {width};\nADDRESS_RADIX = HEX;\nDATA_RADIX = HEX;\nCONTENT BEGIN\n\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def _append(self, line):
+        self._buffer.append(line)
+        if len(self._buffer) >= self.buffer_lines:
+            self.flush()
+
+    def comment(self, text):
+        """Writes a '-- text' comment line."""
+        self._append(f"-- {text}\n")
+
+    def word(self, address, hex_value):
+        """Writes one 'AAAA : VALUE;' line; hex_value is the already formatted data word."""
+        self._append(f"{address:04X} : {hex_value};\n")
+
+    def range(self, first, last, hex_value):
+        """Writes one '[AAAA..BBBB] : VALUE;' line setting every address from first to last."""
+        self._append(f"[{first:04X}..{last:04X}] : {hex_value};\n")
+
+    def words(self, address, hex_values, run_starts):
+        """
+        Writes consecutive words from `address` on, one range record per run of equal words.
+        run_starts are the sorted positions in hex_values where a new run begins (0 first).
+        """
+        run_ends = run_starts[1:] + [len(hex_values)]
+        for start, end in zip(run_starts, run_ends):
+            if end - start == 1:
+                self.word(address + start, hex_values[start])
+            else:
+                self.range(address + start, address + end - 1, hex_values[start])
+
+    def flush(self):
+        self._file.write("".join(self._buffer))
+        self._buffer.clear()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._append("END;\n" if self.final_newline else "END;")
+        self.flush()
+        self._atomic.commit()
+
+    def discard(self):
+        """Abandons the file; whatever was at `path` before stays there."""
+        self._buffer.clear()
+        self._atomic.discard()
+
+
+def run_starts(words, rows):
+    """
+    Returns a bool per word of a (n_words, bytes_per_word) array, True where a run of equal words
+    starts. Every `rows` words (one glyph) a new run starts regardless, so runs never cross a glyph.
+    """
+    starts = np.ones(len(words), dtype=bool)
+    if len(words) > 1:
+        starts[1:] = np.any(words[1:] != words[:-1], axis=1)
+    starts[::rows] = True
+    return starts
+
+
+def stream_glyph_mif(output_file, depth, chars, planes, split_files=None, buffer_lines=DEFAULT_BUFFER_LINES,
+                     compact=False):
+    """
+    Writes packed glyph planes to a MIF in one pass, optionally splitting every word into
+    Low (least significant 16 bits) and High (most significant 16 bits) MIFs at the same time.
+    With compact, runs of equal words inside a glyph (the empty rows, mostly) are written as
+    '[AAAA..BBBB] : VALUE;' range records; the addresses and values written stay the same.
+
+    Args:
+        output_file (str): Path of the full-width MIF.
+        depth (int): DEPTH written in the MIF header(s).
+        chars (list): Character of each glyph, used for the '-- Character' comments.
+        planes (list): (comment_label, start_address, plane) tuples written in order, where plane is a
+                       (n_glyphs, rows, bytes_per_row) uint8 array.
+        split_files (tuple): Optional (low_path, high_path) for the 16-bit split files.
+        buffer_lines (int): Maximum number of lines held before writing to disk.
+        compact (bool): Collapse runs of equal words into range records.
+
+    Returns:
+        list: MifSection records for the full file, then the Low and High sections when split.
+    """
+    bytes_per_row = planes[0][2].shape[2]
+    width = bytes_per_row * 8
+    hex_digits = bytes_per_row * 2
+
+    writers = [MifWriter(output_file, depth, width, buffer_lines)]
+    if split_files:
+        writers += [MifWriter(path, depth, 16, buffer_lines, final_newline=False) for path in split_files]
+
+    # (byte columns, hex digits) of every writer's words: the full word, then the Low and High halves
+    columns = [(slice(None), slice(None)), (slice(2, 4), slice(4, 8)), (slice(0, 2), slice(0, 4))][:len(writers)]
+
+    total = sum(len(plane) for _, _, plane in planes)
+    done = 0
+    try:
+        for comment_label, start_address, plane in planes:
+            rows = plane.shape[1]
+            glyph_runs = None
+            if compact:
+                # Run starts per writer, found for the whole plane at once, and where each glyph's begin
+                plane_words = plane.reshape(-1, bytes_per_row)
+                glyph_runs = []
+                for byte_slice, _ in columns:
+                    starts = np.flatnonzero(run_starts(plane_words[:, byte_slice], rows))
+                    glyph_runs.append((starts, np.searchsorted(starts, np.arange(len(plane) + 1) * rows)))
+
+            address = start_address
+            for i, (char, glyph) in enumerate(zip(chars, plane)):
+                comment = f"{comment_label}: '{char}'"
+                for writer in writers:
+                    writer.comment(comment)
+
+                hex_rows = glyph.tobytes().hex().upper()
+                if compact:
+                    words = [hex_rows[row * hex_digits:(row + 1) * hex_digits] for row in range(rows)]
+                    for writer, (_, hex_slice), (starts, bounds) in zip(writers, columns, glyph_runs):
+                        glyph_starts = (starts[bounds[i]:bounds[i + 1]] - i * rows).tolist()
+                        writer.words(address, [word[hex_slice] for word in words], glyph_starts)
+                    address += rows
+                else:
+                    for row in range(glyph.shape[0]):
+                        word = hex_rows[row * hex_digits:(row + 1) * hex_digits]
+                        writers[0].word(address, word)
+                        if split_files:
+                            writers[1].word(address, word[4:8])
+                            writers[2].word(address, word[0:4])
+                        address += 1
+                done += 1
+                instrumentation.progress("write_mif", done, total)
+    except BaseException:
+        for writer in writers:
+            writer.discard()
+        raise
+    for writer in writers:
+        writer.close()
+
+    return glyph_sections(planes, split=bool(split_files))
+
+
+def glyph_sections(planes, split=False):
+    """
+    Returns the MifSection records stream_glyph_mif produces for `planes` without writing anything:
+    the full-width sections, then (with split) the Low and High 16-bit halves.
+    """
+    bytes_per_row = planes[0][2].shape[2]
+    width = bytes_per_row * 8
+
+    sections = []
+    for comment_label, start_address, plane in planes:
+        sections.append(MifSection(f"{comment_label} x{width}", start_address, width,
+                                   plane.reshape(-1, bytes_per_row)))
+    if split:
+        for half, byte_slice in (("Low", slice(2, 4)), ("High", slice(0, 2))):
+            for comment_label, start_address, plane in planes:
+                sections.append(MifSection(f"{comment_label} x16 {half}", start_address, 16,
+                                           plane.reshape(-1, bytes_per_row)[:, byte_slice]))
+    return sections
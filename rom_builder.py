@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+import numpy as np
+
+from atomic_file import AtomicFile
+import rom_checksum
+
+# Still importable from here; the list itself lives in font_profiles, the checksums in rom_checksum
+from font_profiles import DEFAULT_CHAR_LIST
+from rom_checksum import word_sum_checksum
+
+
+# image: the finished ROM; data_bytes: glyph bytes placed before padding;
+# placements: (section name, offset, length) of every section that made it into the image;
+# checksum_algorithm: the rom_checksum algorithm of `checksum`, None when no checksum was appended
+RomImage = namedtuple("RomImage", ["image", "data_bytes", "truncated", "checksum", "placements",
+                                   "checksum_algorithm"])
+
+
+def build_rom_image(sections, target_size=81920, append_checksum=True, width=16, checksum_algorithm="word_sum"):
+    """
+    Places the data of every `width`-bit MifSection back to back in a preallocated image.
+
+    Sections are laid out in order at computed offsets with slice assignment; anything beyond the
+    data area is truncated, and the rest of the image stays zero. When append_checksum is set, the
+    last bytes hold the rom_checksum `checksum_algorithm` (2 bytes, 4 for crc32) over everything
+    before them, big-endian. The checksum is fed each section as it is placed, so the finished
+    image is not read a second time.
+
+    Returns:
+        RomImage
+    """
+    engine = rom_checksum.new(checksum_algorithm) if append_checksum else None
+    image = bytearray(target_size)
+    view = memoryview(image)
+    limit = target_size - engine.size if engine else target_size
+
+    offset = 0
+    truncated = False
+    placements = []
+    for section in sections:
+        if section.width != width:
+            continue
+
+        data = np.ascontiguousarray(section.data, dtype=np.uint8).reshape(-1)
+        length = min(len(data), limit - offset)
+        if length < len(data):
+            truncated = True
+        if length > 0:
+            view[offset:offset + length] = data[:length]
+            if engine:
+                engine.update(view[offset:offset + length])
+            placements.append((section.name, offset, length))
+            offset += length
+        if truncated:
+            break
+
+    checksum = None
+    if engine:
+        engine.update(view[offset:limit])  # Zero padding; only changes the CRCs
+        checksum = engine.value
+        view[limit:] = checksum.to_bytes(engine.size, "big")
+
+    return RomImage(image, offset, truncated, checksum, placements, checksum_algorithm if engine else None)
+
+
+def truncation_report(sections, rom, width=16):
+    """
+    Where a truncated RomImage stopped.
+
+    Returns:
+        tuple: (name of the section cut short, or None when the data area ended exactly at a section
+               boundary; [the `width`-bit sections left out entirely, as MifSection records])
+    """
+    candidates = [section for section in sections if section.width == width]
+    placed = len(rom.placements)
+    cut = None
+    if placed and rom.placements[-1][2] < candidates[placed - 1].data.nbytes:
+        cut = rom.placements[-1][0]
+    return cut, candidates[placed:]
+
+
+def describe_truncation(sections, rom, width=16):
+    """One line naming the section cut short and the sections left out of a truncated RomImage."""
+    cut, dropped = truncation_report(sections, rom, width)
+    parts = ([f"'{cut}' was cut short"] if cut else []) + (
+        [f"{', '.join(section.name for section in dropped)} left out"] if dropped else [])
+    return f"Stopped writing at {len(rom.image)} bytes: {' and '.join(parts) or 'nothing left out'}."
+
+
+def write_rom_image(rom, output_file):
+    """Writes a RomImage to disk with a single write() call, replacing output_file only once complete."""
+    with AtomicFile(output_file, "wb") as f:
+        f.write(rom.image)
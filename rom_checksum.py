@@ -0,0 +1,223 @@
+"""
+ROM checksums: the 16-bit word sum (ones' complement), the 16-bit byte sum, CRC-16-CCITT and CRC-32.
+
+Every algorithm is an incremental engine: feed the image with update() while it is being built and
+read .value at the end, so the finished file never has to be read back. The sums run as one NumPy
+pass per update() over a memoryview; the CRCs use the table-driven C code in binascii and zlib.
+
+Usage:
+    python rom_checksum.py verify FontRomCombined.bin [more.bin ...] [--algorithm word_sum]
+    python rom_checksum.py sum FontRomCombined.bin [more.bin ...]
+
+verify recomputes the checksum over everything but the trailing checksum bytes and compares it to
+the stored value; without --algorithm every algorithm is tried and the matching ones are reported.
+sum prints every checksum over the whole file. The exit code of verify is 1 when a file does not
+verify and 2 when it cannot be read.
+"""
+import argparse
+import binascii
+import mmap
+import sys
+import zlib
+
+import numpy as np
+
+
+class WordSum:
+    """
+    16-bit ones' complement of the sum of all big-endian 16-bit words, the checksum
+    cooklingmasterclass appends to FontRomCombined.bin. A trailing odd byte counts as its own
+    value, like a short read of 1 byte; an odd byte between two update() calls pairs with the next one.
+    """
+    name = "word_sum"
+    description = "16-bit complement"
+    size = 2
+
+    def __init__(self):
+        self._total = 0
+        self._pending = None  # Odd byte left over from the last update()
+
+    def update(self, data):
+        data = memoryview(data).cast("B")
+        if not len(data):
+            return self
+        if self._pending is not None:
+            self._total += (self._pending << 8) | data[0]
+            self._pending = None
+            data = data[1:]
+        if len(data) % 2:
+            self._pending = data[-1]
+            data = data[:-1]
+        if len(data):
+            self._total += int(np.frombuffer(data, dtype=">u2").sum(dtype=np.uint64))
+        return self
+
+    @property
+    def value(self):
+        return (~(self._total + (self._pending or 0))) & 0xFFFF
+
+
+class ByteSum:
+    """Sum of all bytes, kept to 16 bits (curr_conv.write_bin / Bin.write_binary)."""
+    name = "byte_sum"
+    description = "16-bit byte sum"
+    size = 2
+
+    def __init__(self):
+        self._total = 0
+
+    def update(self, data):
+        data = memoryview(data).cast("B")
+        if len(data):
+            self._total += int(np.frombuffer(data, dtype=np.uint8).sum(dtype=np.uint64))
+        return self
+
+    @property
+    def value(self):
+        return self._total & 0xFFFF
+
+
+class Crc16Ccitt:
+    """CRC-16-CCITT (polynomial 0x1021, initial value 0xFFFF, no reflection or final XOR)."""
+    name = "crc16_ccitt"
+    description = "CRC-16-CCITT"
+    size = 2
+
+    def __init__(self):
+        self.value = 0xFFFF
+
+    def update(self, data):
+        self.value = binascii.crc_hqx(memoryview(data).cast("B"), self.value)
+        return self
+
+
+class Crc32:
+    """CRC-32 as used by zlib, PNG and Ethernet."""
+    name = "crc32"
+    description = "CRC-32"
+    size = 4
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(memoryview(data).cast("B"), self.value)
+        return self
+
+
+ALGORITHMS = {algorithm.name: algorithm for algorithm in (WordSum, ByteSum, Crc16Ccitt, Crc32)}
+
+
+def new(name):
+    """Returns a fresh engine for the named algorithm."""
+    if name not in ALGORITHMS:
+        raise ValueError(f"Unknown checksum '{name}', expected one of {', '.join(ALGORITHMS)}.")
+    return ALGORITHMS[name]()
+
+
+def compute(name, data):
+    """Checksum of `data` (any bytes-like object) in one pass."""
+    return new(name).update(data).value
+
+
+def word_sum_checksum(data):
+    return compute("word_sum", data)
+
+
+def byte_sum_checksum(data):
+    return compute("byte_sum", data)
+
+
+def format_checksum(name, value):
+    """Formats a checksum as hex padded to the algorithm's width, e.g. 0x1A2B."""
+    return f"0x{value:0{ALGORITHMS[name].size * 2}X}"
+
+
+def stored_checksum(data, name):
+    """Returns the big-endian checksum stored in the last bytes of `data`."""
+    return int.from_bytes(bytes(data[-ALGORITHMS[name].size:]), "big")
+
+
+def verify(data, name):
+    """Returns (ok, stored, computed) for an image with the named checksum in its last bytes."""
+    size = ALGORITHMS[name].size
+    if len(data) <= size:
+        raise ValueError(f"The image is too short ({len(data)} bytes) to hold a {name} checksum.")
+    computed = compute(name, memoryview(data)[:-size])
+    stored = stored_checksum(data, name)
+    return computed == stored, stored, computed
+
+
+def _map_file(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _verify_command(args):
+    status = 0
+    for path in args.files:
+        try:
+            data = _map_file(path)
+        except (OSError, ValueError) as e:
+            print(f"Error: Unable to read '{path}'. Reason: {e}", file=sys.stderr)
+            status = 2
+            continue
+
+        with data:
+            names = [args.algorithm] if args.algorithm else list(ALGORITHMS)
+            matches = []
+            for name in names:
+                if len(data) <= ALGORITHMS[name].size:
+                    continue
+                ok, stored, computed = verify(data, name)
+                if ok:
+                    matches.append(f"{name} {format_checksum(name, stored)}")
+                elif args.algorithm:
+                    print(f"[FAILED] {path}: {name} stored {format_checksum(name, stored)}, "
+                          f"computed {format_checksum(name, computed)}")
+
+        if matches:
+            print(f"[ok] {path}: {', '.join(matches)}")
+        else:
+            if not args.algorithm:
+                print(f"[FAILED] {path}: no checksum matches the last bytes ({', '.join(names)} tried)")
+            status = max(status, 1)
+    return status
+
+
+def _sum_command(args):
+    status = 0
+    for path in args.files:
+        try:
+            data = _map_file(path)
+        except (OSError, ValueError) as e:
+            print(f"Error: Unable to read '{path}'. Reason: {e}", file=sys.stderr)
+            status = 2
+            continue
+        with data:
+            print(f"{path} ({len(data)} bytes)")
+            for name in ALGORITHMS:
+                print(f"  {name:<12} {format_checksum(name, compute(name, data))}")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or compute font ROM checksums")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = commands.add_parser("verify", help="Check the checksum stored in the last bytes of each ROM")
+    verify_parser.add_argument("files", nargs="+")
+    verify_parser.add_argument("--algorithm", choices=list(ALGORITHMS),
+                               help="Only accept this checksum (default: report any that matches)")
+    verify_parser.set_defaults(run=_verify_command)
+
+    sum_parser = commands.add_parser("sum", help="Print every checksum over each whole file")
+    sum_parser.add_argument("files", nargs="+")
+    sum_parser.set_defaults(run=_sum_command)
+
+    args = parser.parse_args()
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
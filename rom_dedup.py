@@ -0,0 +1,293 @@
+"""
+Deduplicated font ROM: every distinct glyph bitmap is stored once and reached through index tables,
+so identical glyphs (blank halves of the 16x64 Low/High split, the space in every plane, 'O'/'0' at
+16x32, ...) stop costing a full glyph each. Optionally the rows are deduplicated as well: a store whose
+distinct rows fit 1-byte row numbers then holds its glyphs as row numbers into a table of those rows.
+
+Layout (big-endian 16-bit words; offsets count words from the start of the image):
+
+    word 0      slot count N (characters in the ROM)
+    word 1      plane count P
+    word 2      offset of the code point table: N code points, one per slot
+    word 3..    P plane descriptors of 5 words: index table offset, glyph store offset, rows per glyph,
+                row number size in bytes (0 when the glyphs hold their rows), row table offset
+
+Every plane has an index table of N words giving the slot's glyph number in the plane's store
+(0xFFFF when the plane has no glyph for it). Planes with the same glyph height share one store.
+A stored glyph is `rows` words, or `rows` row numbers padded to a whole word.
+
+Usage:
+    python rom_dedup.py FontRomCombined.bin [--rows] [--output FontRomDedup.bin] [--target-size 81920]
+
+Prints the size report for a wipbin FontRomCombined.bin built from the default character list and
+optionally writes its deduplicated image. The exit code is 1 when the image does not fit
+--target-size and 2 when the ROM cannot be read.
+"""
+import argparse
+from collections import namedtuple
+import sys
+
+import numpy as np
+
+
+MISSING_GLYPH = 0xFFFF
+HEADER_WORDS = 3
+DESCRIPTOR_WORDS = 5
+
+# name: section name; glyphs: glyphs in the source plane; store: position in DedupRom.stores;
+# index: glyph number in that store per slot (MISSING_GLYPH when the plane has none)
+DedupPlane = namedtuple("DedupPlane", ["name", "glyphs", "store", "index"])
+
+# glyphs: (n_unique, rows) array of the distinct glyphs as 16-bit words, in first-seen order;
+# references: glyphs of all planes pointing into the store; row_table: the distinct rows and
+# row_numbers: (n_unique, rows) positions in it when the store is row deduplicated, otherwise None
+DedupStore = namedtuple("DedupStore", ["rows", "glyphs", "references", "row_table", "row_numbers"])
+
+# image: the finished bytes; slots: characters in slot order; placements: (part name, byte offset, length);
+# source_bytes: size of the planes as stored in a regular combined ROM
+DedupRom = namedtuple("DedupRom", ["image", "slots", "planes", "stores", "placements", "source_bytes"])
+
+
+def _unique_first_seen(keys):
+    """
+    Returns (distinct entries of `keys` in first-seen order, position of every entry among them).
+    keys is a 1-D array or a 2-D array whose rows are compared as a whole.
+    """
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return keys[first[order]], rank[inverse.reshape(-1)]
+
+
+def stored_glyph_bytes(store):
+    """Bytes one glyph takes in a store: its rows, or its 1-byte row numbers padded to a whole word."""
+    if store.row_table is None:
+        return store.rows * 2
+    return -(-store.rows // 2) * 2
+
+
+def _dedup_store_rows(rows, glyphs, references):
+    """Returns the store for `glyphs`, row deduplicated when that fits 1-byte row numbers and saves space."""
+    store = DedupStore(rows, glyphs, references, None, None)
+    row_table, row_numbers = _unique_first_seen(glyphs.reshape(-1))
+    if len(row_table) > 0x100:
+        return store
+    deduped = DedupStore(rows, glyphs, references, row_table, row_numbers.reshape(glyphs.shape))
+    if len(glyphs) * stored_glyph_bytes(deduped) + len(row_table) * 2 >= len(glyphs) * rows * 2:
+        return store
+    return deduped
+
+
+def dedup_rom(planes, slots=None, dedup_rows=False):
+    """
+    Builds a deduplicated image from glyph planes.
+
+    Args:
+        planes (list): (name, chars, plane) tuples in ROM order, where plane is a (n_glyphs, rows, 2)
+                       uint8 array of big-endian 16-bit rows and chars the character of each glyph.
+        slots (list): Characters of the code point table, in order. By default every character of
+                      the planes, in first-seen order.
+        dedup_rows (bool): Also store the distinct rows of each store once, for the stores where
+                           1-byte row numbers make it smaller.
+
+    Returns:
+        DedupRom
+    """
+    planes = [(name, list(chars), np.asarray(plane, dtype=np.uint8)) for name, chars, plane in planes]
+    for name, chars, plane in planes:
+        if plane.ndim != 3 or plane.shape[0] != len(chars) or plane.shape[2] != 2:
+            raise ValueError(f"Plane '{name}' of shape {plane.shape} is not {len(chars)} glyphs of 16-bit rows.")
+    if slots is None:
+        slots = [char for _, chars, _ in planes for char in chars]
+    slots = list(dict.fromkeys(slots))
+    if any(ord(char) > 0xFFFF for char in slots):
+        raise ValueError("Code points above U+FFFF do not fit the 16-bit code point table.")
+
+    # One store per glyph height; the glyphs of every plane sharing it are deduplicated together
+    heights = list(dict.fromkeys(plane.shape[1] for _, _, plane in planes))
+    stores = []
+    numbers = {}  # Plane -> store glyph number of each of its glyphs
+    for rows in heights:
+        members = [i for i, (_, _, plane) in enumerate(planes) if plane.shape[1] == rows]
+        words = np.concatenate([planes[i][2].view(">u2").reshape(-1, rows) for i in members]).astype(np.uint16)
+        unique, inverse = _unique_first_seen(words)
+        if len(unique) >= MISSING_GLYPH:
+            raise ValueError(f"{len(unique)} distinct {rows}-row glyphs do not fit 16-bit glyph numbers.")
+        store = DedupStore(rows, unique, len(words), None, None)
+        stores.append(_dedup_store_rows(rows, unique, len(words)) if dedup_rows else store)
+        numbers.update(zip(members, np.split(inverse, np.cumsum([len(planes[i][1]) for i in members])[:-1])))
+
+    dedup_planes = []
+    for i, (name, chars, plane) in enumerate(planes):
+        position = {char: j for j, char in enumerate(chars)}
+        index = np.array([numbers[i][position[char]] if char in position else MISSING_GLYPH for char in slots],
+                         dtype=np.uint16)
+        dedup_planes.append(DedupPlane(name, len(chars), heights.index(plane.shape[1]), index))
+
+    # Word offsets of every part, in image order
+    offset = HEADER_WORDS + DESCRIPTOR_WORDS * len(planes)
+    placements = [("header", 0, offset * 2), ("code points", offset * 2, len(slots) * 2)]
+    code_point_offset = offset
+    offset += len(slots)
+    index_offsets = []
+    for plane in dedup_planes:
+        index_offsets.append(offset)
+        placements.append((f"index {plane.name}", offset * 2, len(slots) * 2))
+        offset += len(slots)
+    store_offsets = []
+    row_table_offsets = []
+    for store in stores:
+        store_offsets.append(offset)
+        placements.append((f"glyphs {store.rows} rows", offset * 2, len(store.glyphs) * stored_glyph_bytes(store)))
+        offset += len(store.glyphs) * stored_glyph_bytes(store) // 2
+        row_table_offsets.append(0 if store.row_table is None else offset)
+        if store.row_table is not None:
+            placements.append((f"row table {store.rows} rows", offset * 2, len(store.row_table) * 2))
+            offset += len(store.row_table)
+    if offset > 0xFFFF:
+        raise ValueError(f"The deduplicated image ({offset * 2} bytes) is too large for 16-bit word offsets.")
+
+    image = np.zeros(offset, dtype=">u2")
+    image[:HEADER_WORDS] = (len(slots), len(planes), code_point_offset)
+    for i, plane in enumerate(dedup_planes):
+        store = stores[plane.store]
+        start = HEADER_WORDS + DESCRIPTOR_WORDS * i
+        image[start:start + DESCRIPTOR_WORDS] = (index_offsets[i], store_offsets[plane.store], store.rows,
+                                                 0 if store.row_table is None else 1, row_table_offsets[plane.store])
+    image[code_point_offset:code_point_offset + len(slots)] = [ord(char) for char in slots]
+    for plane, index_offset in zip(dedup_planes, index_offsets):
+        image[index_offset:index_offset + len(slots)] = plane.index
+    for store, store_offset, row_table_offset in zip(stores, store_offsets, row_table_offsets):
+        if store.row_table is None:
+            image[store_offset:store_offset + store.glyphs.size] = store.glyphs.reshape(-1)
+            continue
+        row_numbers = np.zeros((len(store.glyphs), stored_glyph_bytes(store)), dtype=np.uint8)
+        row_numbers[:, :store.rows] = store.row_numbers
+        image.view(np.uint8)[store_offset * 2:store_offset * 2 + row_numbers.size] = row_numbers.reshape(-1)
+        image[row_table_offset:row_table_offset + len(store.row_table)] = store.row_table
+
+    source_bytes = sum(plane.nbytes for _, _, plane in planes)
+    return DedupRom(bytearray(image.tobytes()), slots, dedup_planes, stores, placements, source_bytes)
+
+
+def decode_glyph(image, plane, code_point):
+    """
+    Reference decoder: looks up one glyph in a deduplicated image using nothing but the image.
+
+    Args:
+        image: bytes-like deduplicated image.
+        plane (int): Plane number, in the order the planes were given to dedup_rom.
+        code_point (int): Character code point.
+
+    Returns:
+        numpy.ndarray: (rows, 2) uint8 glyph, big-endian 16-bit rows, or None when the ROM has no glyph for it.
+    """
+    words = np.frombuffer(image, dtype=">u2", count=len(image) // 2)
+    slot_count, plane_count, code_point_offset = (int(word) for word in words[:HEADER_WORDS])
+    if not 0 <= plane < plane_count:
+        raise IndexError(f"Plane {plane} out of range, the image has {plane_count}.")
+    descriptor = HEADER_WORDS + DESCRIPTOR_WORDS * plane
+    index_offset, store_offset, rows, row_number_size, row_table_offset = (
+        int(word) for word in words[descriptor:descriptor + DESCRIPTOR_WORDS])
+
+    slots = np.flatnonzero(words[code_point_offset:code_point_offset + slot_count] == code_point)
+    if len(slots) == 0:
+        return None
+    number = int(words[index_offset + slots[0]])
+    if number == MISSING_GLYPH:
+        return None
+
+    if not row_number_size:
+        glyph = words[store_offset + number * rows:store_offset + (number + 1) * rows]
+    else:
+        glyph_bytes = -(-rows // 2) * 2
+        row_numbers = np.frombuffer(image, dtype=np.uint8, count=rows, offset=store_offset * 2 + number * glyph_bytes)
+        glyph = words[row_table_offset + row_numbers.astype(np.intp)]
+    return glyph.astype(">u2").view(np.uint8).reshape(rows, 2)
+
+
+def estimate_capacity(rom, target_size):
+    """
+    Returns (free bytes, more characters at the current duplicate rate, more characters if every new
+    glyph is distinct) for a deduplicated image padded to target_size.
+    """
+    free = target_size - len(rom.image)
+    if free <= 0:
+        return free, 0, 0
+    # A new character takes a code point and an index entry per plane, plus a glyph per plane
+    entry_bytes = 2 + 2 * len(rom.planes)
+    worst = entry_bytes + sum(stored_glyph_bytes(rom.stores[plane.store]) for plane in rom.planes)
+    typical = entry_bytes + sum(stored_glyph_bytes(rom.stores[plane.store]) * len(rom.stores[plane.store].glyphs)
+                                / max(rom.stores[plane.store].references, 1) for plane in rom.planes)
+    return free, int(free // typical), int(free // worst)
+
+
+def format_report(rom, target_size=81920):
+    """Size report of a deduplicated image against a regular combined ROM of the same planes."""
+    size = len(rom.image)
+    lines = [f"Deduplicated ROM: {size} bytes for {len(rom.slots)} characters "
+             f"(the planes take {rom.source_bytes} bytes in a regular combined ROM, "
+             f"{100 * (1 - size / max(rom.source_bytes, 1)):.1f}% less)"]
+
+    lines.append(f"  {'plane':<28} {'glyphs':>6} {'store':>6}")
+    for plane in rom.planes:
+        lines.append(f"  {plane.name:<28} {plane.glyphs:>6} {plane.store:>6}")
+    for i, store in enumerate(rom.stores):
+        rows = "" if store.row_table is None else f", as row numbers into {len(store.row_table)} distinct rows"
+        lines.append(f"  store {i}: {len(store.glyphs)} distinct {store.rows}-row glyphs out of "
+                     f"{store.references}{rows}")
+
+    lines.append(f"  {'part':<28} {'offset':>8} {'bytes':>8}")
+    for name, offset, length in rom.placements:
+        lines.append(f"  {name:<28} {offset:>#8x} {length:>8}")
+
+    free, typical, worst = estimate_capacity(rom, target_size)
+    if free < 0:
+        lines.append(f"Does not fit {target_size} bytes ({-free} bytes over).")
+    else:
+        lines.append(f"Free in {target_size} bytes: {free} bytes, room for about {typical} more characters "
+                     f"at the current duplicate rate ({worst} if every new glyph is distinct).")
+    return "\n".join(lines)
+
+
+def main():
+    from rom_reader import combined_rom_sections
+
+    parser = argparse.ArgumentParser(description="Size report (and image) of a deduplicated font ROM")
+    parser.add_argument("rom")
+    parser.add_argument("--rows", action="store_true", help="Deduplicate rows as well as glyphs")
+    parser.add_argument("--output", help="Write the deduplicated image, zero padded to --target-size")
+    parser.add_argument("--target-size", type=int, default=81920)
+    args = parser.parse_args()
+
+    try:
+        with open(args.rom, "rb") as f:
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+    except OSError as e:
+        print(f"Error: Unable to read '{args.rom}'. Reason: {e}", file=sys.stderr)
+        return 2
+
+    planes = []
+    for section in combined_rom_sections():
+        size = len(section.chars) * section.rows * 2
+        if section.offset + size > len(data):
+            print(f"Error: '{args.rom}' ends inside section '{section.name}'.", file=sys.stderr)
+            return 2
+        planes.append((section.name, section.chars,
+                       data[section.offset:section.offset + size].reshape(len(section.chars), section.rows, 2)))
+
+    rom = dedup_rom(planes, dedup_rows=args.rows)
+    print(format_report(rom, args.target_size))
+    if len(rom.image) > args.target_size:
+        return 1
+    if args.output:
+        from atomic_file import AtomicFile
+
+        with AtomicFile(args.output, "wb") as f:
+            f.write(rom.image + bytes(args.target_size - len(rom.image)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
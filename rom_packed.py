@@ -0,0 +1,209 @@
+"""
+Packed font ROM: every glyph trimmed to its ink bounding box and stored as a bit stream, found
+through a per-glyph header instead of at a fixed cell offset. A 32x64 cell holds a glyph of at most
+17x39 pixels, so most of the 256 bytes the combined ROM spends per glyph (512 with the strikeout
+copy) are zeros; here a glyph costs its header plus width x height bits.
+
+Layout (big-endian 16-bit words; offsets count words from the start of the image):
+
+    word 0      font count F (one per profile)
+    word 1..    F font descriptors of 5 words: glyph count N, cell width, cell height,
+                first strikeout row, glyph header table offset
+
+Each font has a table of N 8-byte glyph headers in ROM order:
+
+    bytes 0-1   code point (big-endian)
+    bytes 2-3   offset of the glyph bits (big-endian, in words)
+    byte 4      width       byte 5  height
+    byte 6      x bearing   byte 7  y bearing (position of the box's top left pixel in the cell)
+
+The bits of a glyph are its box row by row, pixel (row, column) at bit row * width + column, the
+first pixel in bit 0 of the first byte (the LSB-first order of the other ROMs), padded to a word.
+Empty glyphs have width and height 0. The strikeout is not stored: it is the glyph with
+STRIKEOUT_ROWS rows filled from the first strikeout row, except for the space, which stays blank
+(as write_mif writes it).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from bitpack import pack_glyphs, LSB_FIRST
+
+
+FONT_DESCRIPTOR_WORDS = 5
+GLYPH_HEADER_BYTES = 8
+STRIKEOUT_ROWS = 3
+
+GLYPH_HEADER_DTYPE = np.dtype([("code_point", ">u2"), ("offset", ">u2"), ("width", "u1"), ("height", "u1"),
+                               ("x", "u1"), ("y", "u1")])
+
+# name: profile name; headers: GLYPH_HEADER_DTYPE array; source_bytes: normal + strikeout planes of
+# the font as stored in the combined ROM
+PackedFont = namedtuple("PackedFont", ["name", "canvas_width", "canvas_height", "strikeout_start", "headers",
+                                       "source_bytes"])
+
+# image: the finished bytes; placements: (part name, byte offset, length)
+PackedRom = namedtuple("PackedRom", ["image", "fonts", "placements"])
+
+
+def _glyph_bits(bitmap, box):
+    """Packs the box of one (rows, cols) 0/1 bitmap into LSB-first bytes padded to a whole word."""
+    x, y, width, height = (int(value) for value in box)
+    bits = np.packbits(bitmap[y:y + height, x:x + width].reshape(-1), bitorder="little")
+    if len(bits) % 2:
+        bits = np.append(bits, np.uint8(0))
+    return bits
+
+
+def _check_word_offset(offset):
+    """Raises ValueError when a word offset does not fit the 16-bit header fields."""
+    if offset > 0xFFFF:
+        raise ValueError(f"The packed image (at least {offset * 2} bytes) is too large for 16-bit word offsets.")
+
+
+def pack_rom(atlases, strikeout_starts=None):
+    """
+    Builds a packed image from GlyphAtlas objects (one font per atlas, in order).
+
+    Args:
+        atlases (list): GlyphAtlas per profile.
+        strikeout_starts (list): First strikeout row per atlas; by default (canvas_height // 2) - 1,
+                                 the rows write_mif fills.
+
+    Returns:
+        PackedRom
+    """
+    if strikeout_starts is None:
+        strikeout_starts = [(atlas.canvas_height // 2) - 1 for atlas in atlases]
+    for atlas in atlases:
+        if atlas.canvas_width > 0xFF or atlas.canvas_height > 0xFF:
+            raise ValueError(f"A {atlas.canvas_width}x{atlas.canvas_height} cell does not fit 8-bit glyph boxes.")
+        if any(ord(char) > 0xFFFF for char in atlas.chars):
+            raise ValueError("Code points above U+FFFF do not fit the 16-bit glyph headers.")
+
+    offset = 1 + FONT_DESCRIPTOR_WORDS * len(atlases)
+    placements = [("header", 0, offset * 2)]
+    table_offsets = []
+    for atlas in atlases:
+        table_offsets.append(offset)
+        placements.append((f"glyph headers {atlas.canvas_width}x{atlas.canvas_height}", offset * 2,
+                           len(atlas.chars) * GLYPH_HEADER_BYTES))
+        offset += len(atlas.chars) * GLYPH_HEADER_BYTES // 2
+    _check_word_offset(offset)
+
+    fonts = []
+    chunks = []
+    for atlas, strikeout_start in zip(atlases, strikeout_starts):
+        bitmaps = np.unpackbits(atlas.planes["normal"], axis=-1, count=atlas.canvas_width,
+                                bitorder="little" if atlas.bit_order == LSB_FIRST else "big")
+        headers = np.zeros(len(atlas.chars), dtype=GLYPH_HEADER_DTYPE)
+        headers["code_point"] = [ord(char) for char in atlas.chars]
+        for field in ("x", "y", "width", "height"):
+            headers[field] = atlas.metrics[field]
+
+        start = offset
+        for i, bitmap in enumerate(bitmaps):
+            box = atlas.metrics[i]
+            if box["width"] == 0:
+                continue
+            bits = _glyph_bits(bitmap, (box["x"], box["y"], box["width"], box["height"]))
+            # Checked before the header field is set, which would overflow instead
+            _check_word_offset(offset)
+            headers["offset"][i] = offset
+            chunks.append(bits)
+            offset += len(bits) // 2
+        placements.append((f"glyph bits {atlas.canvas_width}x{atlas.canvas_height}", start * 2, (offset - start) * 2))
+
+        name = f"{atlas.canvas_width}x{atlas.canvas_height}"
+        fonts.append(PackedFont(name, atlas.canvas_width, atlas.canvas_height, strikeout_start, headers,
+                                2 * atlas.planes["normal"].nbytes))
+        _check_word_offset(offset)
+
+    image = np.zeros(offset * 2, dtype=np.uint8)
+    words = image.view(">u2")
+    words[0] = len(atlases)
+    for i, (font, table_offset) in enumerate(zip(fonts, table_offsets)):
+        start = 1 + FONT_DESCRIPTOR_WORDS * i
+        words[start:start + FONT_DESCRIPTOR_WORDS] = (len(font.headers), font.canvas_width, font.canvas_height,
+                                                      font.strikeout_start, table_offset)
+        image[table_offset * 2:table_offset * 2 + font.headers.nbytes] = font.headers.view(np.uint8)
+    data_start = (offset * 2) - sum(len(chunk) for chunk in chunks)
+    if chunks:
+        image[data_start:] = np.concatenate(chunks)
+
+    return PackedRom(bytearray(image.tobytes()), fonts, placements)
+
+
+def read_font(image, font):
+    """Returns (cell width, cell height, first strikeout row, GLYPH_HEADER_DTYPE headers) of one font in a packed image."""
+    words = np.frombuffer(image, dtype=">u2", count=len(image) // 2)
+    if not 0 <= font < int(words[0]):
+        raise IndexError(f"Font {font} out of range, the image has {int(words[0])}.")
+    start = 1 + FONT_DESCRIPTOR_WORDS * font
+    count, canvas_width, canvas_height, strikeout_start, table_offset = (
+        int(word) for word in words[start:start + FONT_DESCRIPTOR_WORDS])
+    headers = np.frombuffer(image, dtype=GLYPH_HEADER_DTYPE, count=count, offset=table_offset * 2)
+    return canvas_width, canvas_height, strikeout_start, headers
+
+
+def decode_glyph(image, font, code_point, strikeout=False):
+    """
+    Reference decoder: re-expands one glyph of a packed image to its fixed cell, using nothing but the image.
+
+    Args:
+        image: bytes-like packed image.
+        font (int): Font number, in the order the atlases were given to pack_rom.
+        code_point (int): Character code point.
+        strikeout (bool): Return the strikeout variant.
+
+    Returns:
+        numpy.ndarray: (cell_height, bytes_per_row) uint8 glyph, packed LSB-first like the combined
+                       ROM and the MIFs, or None when the font has no such character.
+    """
+    canvas_width, canvas_height, strikeout_start, headers = read_font(image, font)
+    found = np.flatnonzero(headers["code_point"] == code_point)
+    if len(found) == 0:
+        return None
+    header = headers[found[0]]
+    x, y, width, height = (int(header[field]) for field in ("x", "y", "width", "height"))
+
+    cell = np.zeros((canvas_height, canvas_width), dtype=np.uint8)
+    if width and height:
+        bits = np.frombuffer(image, dtype=np.uint8, count=-(-width * height // 8), offset=int(header["offset"]) * 2)
+        cell[y:y + height, x:x + width] = np.unpackbits(bits, count=width * height, bitorder="little").reshape(
+            height, width)
+    glyph = pack_glyphs(cell, bit_order=LSB_FIRST)[0]
+    if strikeout and code_point != 0x20:
+        # Filled rows are 0xFF across the whole row, padding bits included, like strikeout_plane
+        glyph[strikeout_start:strikeout_start + STRIKEOUT_ROWS] = 0xFF
+    return glyph
+
+
+def format_report(rom, target_size=81920):
+    """Size report of a packed image against the fixed-cell normal + strikeout planes of the combined ROM."""
+    size = len(rom.image)
+    source_bytes = sum(font.source_bytes for font in rom.fonts)
+    lines = [f"Packed ROM: {size} bytes (the fixed cells take {source_bytes} bytes in a regular combined ROM, "
+             f"{100 * (1 - size / max(source_bytes, 1)):.1f}% less)"]
+
+    lines.append(f"  {'font':<8} {'glyphs':>6} {'bytes/glyph':>12} {'cell bytes/glyph':>17}")
+    per_glyph = []
+    for font in rom.fonts:
+        data = sum(length for name, _, length in rom.placements if name.endswith(font.name))
+        average = data / max(len(font.headers), 1)
+        per_glyph.append(average)
+        lines.append(f"  {font.name:<8} {len(font.headers):>6} {average:>12.1f} "
+                     f"{font.source_bytes / max(len(font.headers), 1):>17.1f}")
+
+    lines.append(f"  {'part':<28} {'offset':>8} {'bytes':>8}")
+    for name, offset, length in rom.placements:
+        lines.append(f"  {name:<28} {offset:>#8x} {length:>8}")
+
+    free = target_size - size
+    if free < 0:
+        lines.append(f"Does not fit {target_size} bytes ({-free} bytes over).")
+    else:
+        # A new character takes a glyph in every font, at the average size so far
+        lines.append(f"Free in {target_size} bytes: {free} bytes, room for about {int(free // max(sum(per_glyph), 1))} "
+                     f"more characters at the average glyph size.")
+    return "\n".join(lines)
@@ -0,0 +1,141 @@
+from collections import namedtuple
+import mmap
+
+import numpy as np
+
+from font_profiles import DEFAULT_CHAR_LIST
+import rom_checksum
+
+
+# One glyph plane inside a ROM binary: glyph_count glyphs of rows x bytes_per_row starting at offset
+RomSection = namedtuple("RomSection", ["name", "offset", "chars", "rows", "bytes_per_row"])
+
+
+def combined_rom_sections(chars_32x64=None, chars_16x32=None):
+    """
+    Section layout of FontRomCombined.bin as written by wipbin.write_combined_binary:
+    16x64 Low normal/strikeout, 16x64 High normal/strikeout, then 16x32 normal/strikeout,
+    each glyph row a big-endian 16-bit word.
+
+    chars_* are the characters that actually made it into each profile, in ROM order
+    (by default the unique characters of DEFAULT_CHAR_LIST).
+    """
+    default_chars = list(dict.fromkeys(DEFAULT_CHAR_LIST))
+    chars_32x64 = list(dict.fromkeys(chars_32x64 or default_chars))
+    chars_16x32 = list(dict.fromkeys(chars_16x32 or default_chars))
+
+    sections = []
+    offset = 0
+    for name, chars, rows in (
+        ("16x64_low_normal", chars_32x64, 64),
+        ("16x64_low_strikeout", chars_32x64, 64),
+        ("16x64_high_normal", chars_32x64, 64),
+        ("16x64_high_strikeout", chars_32x64, 64),
+        ("16x32_normal", chars_16x32, 32),
+        ("16x32_strikeout", chars_16x32, 32),
+    ):
+        sections.append(RomSection(name, offset, chars, rows, 2))
+        offset += len(chars) * rows * 2
+    return sections
+
+
+def curr_conv_rom_sections(char_list, heights=(13, 14)):
+    """
+    Section layout of FontRom_combined.bin as written by curr_conv.write_bin:
+    normal/strikeout for the first height at 0x0000/0x0800, for the second at 0x1000/0x1800,
+    16 one-byte rows per glyph.
+    """
+    chars = list(dict.fromkeys(char_list))
+    sections = []
+    for base, height in zip((0x0000, 0x1000), heights):
+        sections.append(RomSection(f"normal_{height}", base, chars, 16, 1))
+        sections.append(RomSection(f"strikeout_{height}", base + 0x0800, chars, 16, 1))
+    return sections
+
+
+class FontRomReader:
+    """
+    Memory-mapped, read-only view of a font ROM binary.
+
+    Glyphs are returned as NumPy views straight into the mapped file, so a lookup copies nothing.
+    Use it as a context manager, or call close() once the returned views are no longer needed.
+    """
+
+    def __init__(self, path, sections, checksum=None):
+        if checksum is not None:
+            rom_checksum.new(checksum)  # Rejects unknown names up front
+
+        self.path = path
+        self.checksum = checksum
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = np.frombuffer(self._mmap, dtype=np.uint8)
+
+        self.planes = {}
+        self.indexes = {}
+        for section in sections:
+            size = len(section.chars) * section.rows * section.bytes_per_row
+            if section.offset + size > len(self.buffer):
+                raise ValueError(f"Section '{section.name}' ends at byte {section.offset + size}, "
+                                 f"past the end of '{path}' ({len(self.buffer)} bytes).")
+            self.planes[section.name] = self.buffer[section.offset:section.offset + size].reshape(
+                len(section.chars), section.rows, section.bytes_per_row)
+            self.indexes[section.name] = {ord(char): i for i, char in enumerate(section.chars)}
+
+    @classmethod
+    def combined(cls, path, chars_32x64=None, chars_16x32=None, checksum=None):
+        """Opens a wipbin FontRomCombined.bin (checksum: the algorithm it was built with append_checksum, if any)."""
+        return cls(path, combined_rom_sections(chars_32x64, chars_16x32), checksum)
+
+    @classmethod
+    def curr_conv(cls, path, char_list, heights=(13, 14)):
+        """Opens a curr_conv FontRom_combined.bin (byte-sum checksum in the last two bytes)."""
+        return cls(path, curr_conv_rom_sections(char_list, heights), "byte_sum")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the mapping; views handed out earlier must not be used afterwards."""
+        self.planes = {}
+        self.buffer = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is released when it is garbage collected
+            pass
+        self._file.close()
+
+    def glyph(self, character, section):
+        """Returns one glyph (rows, bytes_per_row) by character or code point as a view into the file."""
+        code_point = character if isinstance(character, int) else ord(character)
+        return self.planes[section][self.indexes[section][code_point]]
+
+    def glyphs(self, text, section):
+        """Returns the glyphs of every character of a string (or list of code points) as one array."""
+        index = self.indexes[section]
+        positions = [index[character if isinstance(character, int) else ord(character)] for character in text]
+        return self.planes[section][positions]
+
+    def glyph_32x64(self, character, strikeout=False):
+        """
+        Reassembles a 32x64 glyph (64 rows x 4 bytes, leftmost byte first) from its High and Low halves.
+        The halves live in different sections, so this returns a copy rather than a view.
+        """
+        variant = "strikeout" if strikeout else "normal"
+        high = self.glyph(character, f"16x64_high_{variant}")
+        low = self.glyph(character, f"16x64_low_{variant}")
+        return np.concatenate([high, low], axis=1)
+
+    def stored_checksum(self):
+        """Returns the big-endian value in the last two bytes of the file (four for crc32)."""
+        return rom_checksum.stored_checksum(self.buffer, self.checksum or "word_sum")
+
+    def verify_checksum(self):
+        """Recomputes the checksum over everything but the stored checksum bytes and compares it to the stored one."""
+        if self.checksum is None:
+            raise ValueError("This ROM layout has no checksum to verify.")
+        return rom_checksum.verify(self.buffer, self.checksum)[0]
@@ -0,0 +1,248 @@
+"""
+Threshold sweeps over grayscale glyphs and automatic (Otsu) thresholds.
+
+The glyphs of a profile are drawn and scaled once (glyph_raster.draw_glyph / scale_glyph, the
+pipeline up to the threshold) and kept as one zero-padded (n, height, width) stack, so trying many
+threshold values is a single broadcast comparison instead of a ROM build per value.
+
+Automatic thresholds use Otsu's method on a glyph's gray level histogram: the value that best
+separates ink from background (maximum between-class variance). threshold_value "auto" anywhere
+in the build picks it per glyph (glyph_raster.threshold_glyph); font_threshold gives one value for
+the whole font, from the summed histograms, to use as a fixed threshold_value.
+
+Usage:
+    python threshold_sweep.py font.ttf [--profile 32x64] [--thresholds 16:240:16] [--chars default|ascii] [--glyphs]
+
+Prints the ink coverage and the glyphs that lose all their pixels for each threshold of the sweep,
+then for the profile's threshold_value, the font's Otsu threshold and per-glyph Otsu thresholds.
+The exit code is 2 when the font cannot be read.
+"""
+import argparse
+from collections import namedtuple
+import sys
+
+import numpy as np
+
+
+LEVELS = 256
+
+# chars: characters with a visible glyph; pixels: (n, height, width) uint8 grayscale, zero-padded
+# to the largest glyph; shapes: (n, 2) int32 real (height, width) of each glyph
+GrayscaleStack = namedtuple("GrayscaleStack", ["chars", "pixels", "shapes"])
+
+
+def stack_grayscale(chars, glyphs):
+    """Stacks 2-D grayscale glyphs of different sizes into a GrayscaleStack."""
+    shapes = np.array([glyph.shape for glyph in glyphs], dtype=np.int32).reshape(-1, 2)
+    height, width = (int(size) for size in shapes.max(axis=0)) if len(glyphs) else (0, 0)
+    pixels = np.zeros((len(glyphs), height, width), dtype=np.uint8)
+    for i, glyph in enumerate(glyphs):
+        pixels[i, :glyph.shape[0], :glyph.shape[1]] = glyph
+    return GrayscaleStack(list(chars), pixels, shapes)
+
+
+def render_grayscale(ttf_path, chars, forced_height, max_width, face_index=0):
+    """
+    Draws and scales characters like rasterize_glyph, without thresholding them.
+    Characters without a visible glyph (and the space) are left out.
+
+    Returns:
+        GrayscaleStack
+    """
+    import font_registry
+    from glyph_raster import draw_glyph, scale_glyph
+
+    font = font_registry.face(ttf_path, face_index).font(forced_height * 2)
+    kept = []
+    glyphs = []
+    for char in dict.fromkeys(chars):
+        if char == " ":
+            continue
+        image = draw_glyph(font, char)
+        if image is None:
+            continue
+        grayscale = scale_glyph(image, char, forced_height, max_width)
+        if grayscale.size:
+            kept.append(char)
+            glyphs.append(grayscale)
+    return stack_grayscale(kept, glyphs)
+
+
+def box_mask(stack):
+    """(n, height, width) bool: True inside each glyph's real box, False on the padding."""
+    _, height, width = stack.pixels.shape
+    rows = np.arange(height)[np.newaxis, :, np.newaxis] < stack.shapes[:, 0, np.newaxis, np.newaxis]
+    columns = np.arange(width)[np.newaxis, np.newaxis, :] < stack.shapes[:, 1, np.newaxis, np.newaxis]
+    return rows & columns
+
+
+def sweep(stack, thresholds):
+    """
+    Thresholds every glyph at every value in one broadcast comparison.
+
+    Returns:
+        numpy.ndarray: (len(thresholds), n, height, width) bool. Padding is 0 and never set.
+    """
+    thresholds = np.asarray(thresholds).reshape(-1, 1, 1, 1)
+    return stack.pixels[np.newaxis] > thresholds
+
+
+def coverage(stack, thresholds):
+    """Returns the (len(thresholds), n) set pixel counts of every glyph at every threshold."""
+    return sweep(stack, thresholds).sum(axis=(2, 3))
+
+
+def binarize(stack, thresholds):
+    """
+    Thresholds glyph i at thresholds[i] (or all of them at one value).
+
+    Returns:
+        list: (height, width) uint8 0/1 array per glyph, cropped to its real size.
+    """
+    thresholds = np.broadcast_to(np.asarray(thresholds), (len(stack.chars),))
+    binary = (stack.pixels > thresholds[:, np.newaxis, np.newaxis]).astype(np.uint8)
+    return [binary[i, :height, :width] for i, (height, width) in enumerate(stack.shapes.tolist())]
+
+
+def histograms(stack):
+    """Returns the (n, 256) gray level histograms of the glyphs, padding excluded."""
+    count = len(stack.chars)
+    glyph_index = np.broadcast_to(np.arange(count)[:, np.newaxis, np.newaxis], stack.pixels.shape)
+    mask = box_mask(stack)
+    bins = glyph_index[mask].astype(np.int64) * LEVELS + stack.pixels[mask]
+    return np.bincount(bins, minlength=count * LEVELS).reshape(count, LEVELS)
+
+
+def otsu_from_histograms(histogram):
+    """
+    Otsu thresholds of (..., 256) histograms: the t maximizing the between-class variance of
+    "pixel <= t" and "pixel > t". When several values tie (a glyph with two gray levels only), the
+    middle of the tie is used, so the threshold sits between the levels rather than on one of them.
+
+    Returns:
+        numpy.ndarray: int64 thresholds with the histograms' leading shape.
+    """
+    histogram = np.asarray(histogram, dtype=np.float64)
+    total = histogram.sum(axis=-1, keepdims=True)
+    probability = histogram / np.maximum(total, 1)
+    weight = np.cumsum(probability, axis=-1)
+    mean = np.cumsum(probability * np.arange(LEVELS), axis=-1)
+    total_mean = mean[..., -1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (total_mean * weight - mean) ** 2 / (weight * (1 - weight))
+    variance = np.nan_to_num(variance, nan=0.0, posinf=0.0)
+
+    best = variance.max(axis=-1, keepdims=True)
+    ties = variance >= best * (1 - 1e-9)
+    first = np.argmax(ties, axis=-1)
+    last = LEVELS - 1 - np.argmax(ties[..., ::-1], axis=-1)
+    return (first + last) // 2
+
+
+def otsu_threshold(grayscale):
+    """Otsu threshold of one grayscale glyph."""
+    histogram = np.bincount(np.asarray(grayscale, dtype=np.uint8).ravel(), minlength=LEVELS)
+    return int(otsu_from_histograms(histogram))
+
+
+def glyph_thresholds(stack):
+    """Per-glyph Otsu thresholds, (n,) int64."""
+    return otsu_from_histograms(histograms(stack))
+
+
+def font_threshold(stack):
+    """One Otsu threshold for the whole font, from the glyph histograms summed."""
+    return int(otsu_from_histograms(histograms(stack).sum(axis=0)))
+
+
+def _describe_empty(stack, counts):
+    empty = [stack.chars[i] for i in np.flatnonzero(counts == 0)]
+    if not empty:
+        return "-"
+    return " ".join(empty[:10]) + (f" (+{len(empty) - 10})" if len(empty) > 10 else "")
+
+
+def format_sweep_report(stack, thresholds, configured=None, per_glyph=False):
+    """
+    Coverage report of a sweep and of the automatic choices.
+
+    Args:
+        stack (GrayscaleStack): Glyphs to report on.
+        thresholds (list): Values of the sweep.
+        configured (int): The profile's threshold_value, reported with the automatic choices.
+        per_glyph (bool): Add a line per glyph with its Otsu threshold and ink.
+    """
+    area = int((stack.shapes[:, 0] * stack.shapes[:, 1]).sum())
+    lines = [f"{len(stack.chars)} glyphs, {area} pixels in their boxes"]
+
+    counts = coverage(stack, thresholds)
+    lines.append(f"  {'threshold':>9} {'ink':>8} {'coverage':>9}  glyphs left empty")
+    for threshold, glyph_counts in zip(np.asarray(thresholds).tolist(), counts):
+        lines.append(f"  {threshold:>9} {int(glyph_counts.sum()):>8} {100 * glyph_counts.sum() / max(area, 1):>8.1f}%  "
+                     f"{_describe_empty(stack, glyph_counts)}")
+
+    font_value = font_threshold(stack)
+    otsu = glyph_thresholds(stack)
+    choices = []
+    if configured is not None:
+        choices.append((f"configured ({configured})", np.full(len(stack.chars), configured)))
+    choices.append((f"font Otsu ({font_value})", np.full(len(stack.chars), font_value)))
+    if len(otsu):
+        choices.append((f"glyph Otsu ({int(otsu.min())}-{int(np.median(otsu))}-{int(otsu.max())})", otsu))
+
+    lines.append(f"  {'choice':<24} {'ink':>8} {'coverage':>9}  glyphs left empty")
+    glyph_ink = {}
+    for name, values in choices:
+        ink = np.array([int(glyph.sum()) for glyph in binarize(stack, values)], dtype=np.int64)
+        glyph_ink[name] = ink
+        lines.append(f"  {name:<24} {int(ink.sum()):>8} {100 * ink.sum() / max(area, 1):>8.1f}%  "
+                     f"{_describe_empty(stack, ink)}")
+
+    if per_glyph:
+        names = list(glyph_ink)
+        lines.append(f"  {'char':<6} {'box':>7} {'otsu':>5} " + " ".join(f"{name.split(' ')[0] + ' ink':>14}"
+                                                                        for name in names))
+        for i, char in enumerate(stack.chars):
+            height, width = stack.shapes[i].tolist()
+            lines.append(f"  {char!r:<6} {f'{width}x{height}':>7} {int(otsu[i]):>5} "
+                         + " ".join(f"{int(glyph_ink[name][i]):>14}" for name in names))
+    return "\n".join(lines)
+
+
+def parse_thresholds(text):
+    """'start:stop:step' (stop included) or comma separated values."""
+    if ":" in text:
+        start, stop, step = (int(value) for value in text.split(":"))
+        return list(range(start, stop + 1, step))
+    return [int(value) for value in text.split(",") if value]
+
+
+def main():
+    from font_profiles import DEFAULT_CHAR_LIST, DEFAULT_PROFILES
+
+    profiles = {f"{profile['canvas_width']}x{profile['canvas_height']}": profile for profile in DEFAULT_PROFILES}
+    parser = argparse.ArgumentParser(description="Threshold sweep and automatic thresholds for a font")
+    parser.add_argument("ttf_path")
+    parser.add_argument("--face-index", type=int, default=0)
+    parser.add_argument("--profile", choices=sorted(profiles), default="32x64")
+    parser.add_argument("--thresholds", default="16:240:16", help="start:stop:step or comma separated values")
+    parser.add_argument("--chars", choices=["default", "ascii"], default="default")
+    parser.add_argument("--glyphs", action="store_true", help="Add a line per glyph")
+    args = parser.parse_args()
+
+    profile = profiles[args.profile]
+    chars = DEFAULT_CHAR_LIST if args.chars == "default" else [chr(i) for i in range(0x20, 0x7F)]
+    try:
+        stack = render_grayscale(args.ttf_path, chars, profile["forced_height"], profile["max_width"],
+                                 args.face_index)
+    except OSError as e:
+        print(f"Error: Unable to read the font. Reason: {e}", file=sys.stderr)
+        return 2
+
+    print(f"{args.profile}: forced_height {profile['forced_height']}, max_width {profile['max_width']}")
+    print(format_sweep_report(stack, parse_thresholds(args.thresholds), profile["threshold_value"], args.glyphs))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
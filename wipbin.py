@@ -1,162 +1,30 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
+import importlib
 import os
 
 
-def reverse_bits(byte):
-    """Reverse the bits in a single byte (8 bits)."""
-    reversed_byte = 0
-    for i in range(8):
-        if byte & (1 << i):
-            reversed_byte |= (1 << (7 - i))
-    return reversed_byte
+# Only tkinter is needed to bring the window up. The font_rom core (NumPy, and PIL once a glyph has
+# to be rendered) is imported on the first Generate, which keeps start-up of the frozen exe short.
+# The core functions stay reachable as wipbin.<name> through __getattr__.
+_LAZY_EXPORTS = {
+    "generate_xbm_data": "font_rom",
+    "generate_glyph_atlas": "font_rom",
+    "write_xbm": "font_rom",
+    "write_mif": "font_rom",
+    "write_combined_binary": "font_rom",
+    "write_combined_binary_debug": "font_rom",
+    "write_dedup_binary": "font_rom",
+    "write_packed_binary": "font_rom",
+    "write_lookup_tables": "font_rom",
+    "build_font_rom": "incremental_build",
+    "GlyphCache": "glyph_cache",
+    "DEFAULT_CHAR_LIST": "font_profiles",
+}
 
 
-def generate_xbm_data(ttf_path, char_list, forced_height, max_width, canvas_width, canvas_height,
-                      threshold_value=128, padding_top=0, padding_bottom=0):
-    """
-    Generates XBM data for characters, ensuring proper alignment within grids, narrow character handling, and padding.
-    """
-    font_size = forced_height * 2
-    font = ImageFont.truetype(ttf_path, font_size)
-    all_xbm_data = {}
-
-    punctuation_set = {',', '.'}
-    punctuation_scale = 0.25
-    narrow_chars = {"I"}
-    narrow_char_scale = 0.5
-
-    grid_width = 17 if canvas_width == 32 and canvas_height == 64 else canvas_width
-    grid_height = 39 if canvas_width == 32 and canvas_height == 64 else canvas_height
-
-    for char in char_list:
-        try:
-            if char == " ":
-                xbm_data = [
-                    [0x00 for _ in range(canvas_width // 8)]  # Ensure empty grid for space character
-                    for _ in range(canvas_height)
-                ]
-                all_xbm_data[char] = xbm_data
-                continue
-
-            (width, height), (offset_x, offset_y) = font.font.getsize(char)
-            if width == 0 or height == 0:
-                continue
-
-            image = Image.new('L', (width, height), 0)
-            draw = ImageDraw.Draw(image)
-            draw.text((-offset_x, -offset_y), char, font=font, fill=255)
-
-            if char in punctuation_set:
-                target_height = int(forced_height * punctuation_scale)
-                aspect_ratio = width / height
-                scaled_width = min(int(target_height * aspect_ratio), max_width)
-            elif char in narrow_chars:
-                target_height = forced_height
-                aspect_ratio = width / height
-                scaled_width = min(int(target_height * aspect_ratio * narrow_char_scale), max_width)
-            else:
-                target_height = forced_height
-                aspect_ratio = width / height
-                scaled_width = min(int(target_height * aspect_ratio), max_width)
-
-            img_resized = image.resize((scaled_width, target_height), Image.Resampling.LANCZOS)
-            binary_array = (np.array(img_resized) > threshold_value).astype(np.uint8)
-
-            padded_array = np.zeros((canvas_height, canvas_width), dtype=np.uint8)
-
-            if canvas_width == 32 and canvas_height == 64:
-                vertical_offset = max((grid_height - binary_array.shape[0]) // 2, 0)
-                horizontal_offset = max((grid_width - binary_array.shape[1]) // 2, 0)
-                # Ensure binary_array fits within the grid
-                padded_array[vertical_offset:vertical_offset + binary_array.shape[0],
-                             horizontal_offset:horizontal_offset + binary_array.shape[1]] = binary_array
-            else:
-                vertical_start = padding_top
-                horizontal_padding = (canvas_width - scaled_width) // 2
-                padded_array[vertical_start:vertical_start + target_height,
-                             horizontal_padding:horizontal_padding + scaled_width] = binary_array
-
-            xbm_data = []
-            for row in padded_array:
-                row_bytes = []
-                for byte_index in range(0, canvas_width, 8):
-                    byte = 0
-                    for bit_index in range(8):
-                        col = byte_index + bit_index
-                        if col < canvas_width and row[col]:
-                            byte |= (1 << (7 - bit_index))
-                    row_bytes.append(reverse_bits(byte))
-                xbm_data.append(row_bytes)
-
-            all_xbm_data[char] = xbm_data
-
-        except Exception as e:
-            print(f"Warning: Unable to process character '{char}'. Reason: {e}")
-
-    return all_xbm_data
-
-def write_xbm(all_xbm_data, output_file, canvas_width, canvas_height):
-    """
-    Writes XBM data to a file, including both normal and strikeout versions.
-    """
-    def add_strikeout(xbm_data, canvas_width, canvas_height):
-        """
-        Adds a strikeout with three lines across the middle of the character.
-        Centered relative to the grid for both configurations.
-        """
-        strikeout_data = []
-        grid_width = 17 if canvas_width == 32 and canvas_height == 64 else canvas_width
-        grid_height = 39 if canvas_width == 32 and canvas_height == 64 else canvas_height
-
-        middle_start = (grid_height // 2) - 1
-        middle_end = middle_start + 3  # Draw 3 rows
-
-        for i, row_bytes in enumerate(xbm_data):
-            if middle_start <= i < middle_end:
-                new_row = [0xFF] * len(row_bytes)
-            else:
-                new_row = row_bytes[:]
-            strikeout_data.append(new_row)
-
-        return strikeout_data
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("# XBM File\n\n")
-
-        normal_data = []
-        strikeout_data = []
-       
-
-        for char, xbm_data in all_xbm_data.items():
-            normal_data.append((char, xbm_data))
-            strikeout_data.append((char, add_strikeout(xbm_data, canvas_width, canvas_height)))
-
-        # Write normal characters
-        for char, xbm_data in normal_data:
-            f.write(f"/* Character: '{char}' */\n")
-            f.write(f"#define {char}_width {canvas_width}\n")
-            f.write(f"#define {char}_height {canvas_height}\n")
-            f.write(f"static char {char}_bits[] = {{\n")
-
-            for row_bytes in xbm_data:
-                f.write("  " + ", ".join(f"0x{byte:02X}" for byte in row_bytes) + ",\n")
-
-            f.write("};\n\n")
-
-        # Write strikeout characters
-        for char, strikeout in strikeout_data:
-            f.write(f"/* Strikeout Character: '{char}' */\n")
-            f.write(f"static char {char}_strikeout_bits[] = {{\n")
-
-            for row_bytes in strikeout:
-                f.write("  " + ", ".join(f"0x{byte:02X}" for byte in row_bytes) + ",\n")
-
-            f.write("};\n\n")
-
-    print(f"XBM file saved as {output_file}")
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 
 # def write_mif(all_xbm_data, output_file, canvas_width, canvas_height):
@@ -223,197 +91,6 @@ def write_xbm(all_xbm_data, output_file, canvas_width, canvas_height):
 
 #     print(f"MIF file saved as {output_file}")
 
-def write_mif(all_xbm_data, output_file, canvas_width, canvas_height, mif_output=None):
-    """
-    Writes MIF data to a file, including both normal and strikeout versions.
-    For 32x64, it splits the output into two separate 16x64 MIF files for Low and High.
-    Optionally stores all output lines into `mif_output` for further processing.
-    """
-    def add_strikeout(xbm_data, canvas_width, canvas_height, is_space=False):
-        if is_space:
-            return [[0x00 for _ in range(canvas_width // 8)] for _ in range(canvas_height)]
-
-        strikeout_data = []
-        middle_start = (canvas_height // 2) - 1
-        middle_end = middle_start + 3
-
-        for i, row_bytes in enumerate(xbm_data):
-            if middle_start <= i < middle_end:
-                new_row = [0xFF] * len(row_bytes)
-            else:
-                new_row = row_bytes[:]
-            strikeout_data.append(new_row)
-        return strikeout_data
-
-    def append_to_output(output_list, line):
-        """Helper to append a line to both file and the output array."""
-        output_list.append(line + "\n")
-
-    output_dir = os.path.dirname(output_file)
-
-    if mif_output is None:
-        mif_output = []
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        # Write MIF header
-        header = [
-            f"DEPTH = {8192 if canvas_width == 16 and canvas_height == 32 else 16384};",
-            f"WIDTH = {canvas_width};",
-            "ADDRESS_RADIX = HEX;",
-            "DATA_RADIX = HEX;",
-            "CONTENT BEGIN\n"
-        ]
-        for line in header:
-            f.write(line + "\n")
-            append_to_output(mif_output, line)
-
-        address = 0x0000
-        strikeout_start_address = 8192 if canvas_width == 16 and canvas_height == 32 else 16384 // 2
-
-        # Prepare data for normal and strikeout characters
-        normal_data = []
-        strikeout_data = []
-
-        for char, xbm_data in all_xbm_data.items():
-            is_space = (char == " ")
-            normal_data.append((char, xbm_data))
-            strikeout_data.append((char, add_strikeout(xbm_data, canvas_width, canvas_height, is_space)))
-
-        # Write normal characters
-        for char, xbm_data in normal_data:
-            f.write(f"-- Character: '{char}'\n")
-            append_to_output(mif_output, f"-- Character: '{char}'")
-            for row_bytes in xbm_data:
-                word = "".join(f"{byte:02X}" for byte in row_bytes)
-                line = f"{address:04X} : {word};"
-                f.write(line + "\n")
-                append_to_output(mif_output, line)
-                address += 1
-
-        # Write strikeout characters
-        address = strikeout_start_address
-        for char, xbm_data in strikeout_data:
-            f.write(f"-- Strikeout Character: '{char}'\n")
-            append_to_output(mif_output, f"-- Strikeout Character: '{char}'")
-            for row_bytes in xbm_data:
-                word = "".join(f"{byte:02X}" for byte in row_bytes)
-                line = f"{address:04X} : {word};"
-                f.write(line + "\n")
-                append_to_output(mif_output, line)
-                address += 1
-
-        f.write("END;\n")
-        append_to_output(mif_output, "END;")
-
-    print(f"MIF file saved as {output_file}")
-
-    if canvas_width == 32 and canvas_height == 64:
-        # Split into Low and High files with comments intact
-        low_output_file = os.path.join(output_dir, "FontRom16x64_Low.mif")
-        high_output_file = os.path.join(output_dir, "FontRom16x64_High.mif")
-
-        low_content = []
-        high_content = []
-
-        # Prepare Low and High content with comments
-        address = 0x0000
-        for char, xbm_data in normal_data:
-            low_content.append(f"-- Character: '{char}'")
-            high_content.append(f"-- Character: '{char}'")
-            for row_bytes in xbm_data:
-                word = "".join(f"{byte:02X}" for byte in row_bytes)
-                low_content.append(f"{address:04X} : {word[4:8]};")
-                high_content.append(f"{address:04X} : {word[0:4]};")
-                address += 1
-
-        # Write strikeout characters to split files
-        address = 0x2000
-        for char, xbm_data in strikeout_data:
-            low_content.append(f"-- Strikeout Character: '{char}'")
-            high_content.append(f"-- Strikeout Character: '{char}'")
-            for row_bytes in xbm_data:
-                word = "".join(f"{byte:02X}" for byte in row_bytes)
-                low_content.append(f"{address:04X} : {word[4:8]};")
-                high_content.append(f"{address:04X} : {word[0:4]};")
-                address += 1
-
-        # Finalize both Low and High content
-        low_content.append("END;")
-        high_content.append("END;")
-
-        # Write Low file
-        with open(low_output_file, "w", encoding="utf-8") as low_f:
-            low_f.write(f"DEPTH = 16384;\nWIDTH = 16;\nADDRESS_RADIX = HEX;\nDATA_RADIX = HEX;\nCONTENT BEGIN\n\n")
-            low_f.write("\n".join(low_content))
-        print(f"Low split MIF saved: {low_output_file}")
-
-        # Write High file
-        with open(high_output_file, "w", encoding="utf-8") as high_f:
-            high_f.write(f"DEPTH = 16384;\nWIDTH = 16;\nADDRESS_RADIX = HEX;\nDATA_RADIX = HEX;\nCONTENT BEGIN\n\n")
-            high_f.write("\n".join(high_content))
-        print(f"High split MIF saved: {high_output_file}")
-
-        # Optionally append content to mif_output for memory tracking
-        if mif_output is not None:
-            mif_output.extend([f"{line}" for line in low_content])
-            mif_output.extend([f"{line}" for line in high_content])
-
-
-def write_combined_binary(mif_output, output_file, target_size=81920):
-    """
-    Generates a combined binary file from MIF data stored in `mif_output`,
-    using only valid split MIF lines and excluding zeroed-out data.
-    """
-    try:
-        debug_file_path = output_file.replace(".bin", "_debug.txt")
-        total_bytes_written = 0
-
-        with open(output_file, "wb") as bin_file, open(debug_file_path, "w") as debug_file:
-            for line in mif_output:
-                line = line.strip()
-
-                # Process valid lines with 'address : data;' format
-                if ":" in line and line.endswith(";"):
-                    parts = line.split(":")
-                    address, data_part = parts[0].strip(), parts[1].split(";")[0].strip()
-
-                    # Ignore zero lines like "0000 : 00000000;"
-                    if data_part == "00000000":
-                        continue
-
-                    # Only accept data with correct format (high/low splits ignored)
-                    if len(data_part) == 4:  # Ensure we're only grabbing 16-bit data
-                        hex_bytes = bytes.fromhex(data_part)
-
-                        # Stop if we hit the target size
-                        if total_bytes_written + len(hex_bytes) > target_size:
-                            remaining_bytes = target_size - total_bytes_written
-                            bin_file.write(hex_bytes[:remaining_bytes])
-                            debug_file.write(f"{address} : {data_part} (truncated to {remaining_bytes} bytes)\n")
-                            total_bytes_written += remaining_bytes
-                            print(f"Stopped writing at {target_size} bytes.")
-                            break
-
-                        # Write valid hex data and log it
-                        bin_file.write(hex_bytes)
-                        debug_file.write(f"{address} : {data_part}\n")
-                        total_bytes_written += len(hex_bytes)
-
-            # Pad the file if necessary
-            if total_bytes_written < target_size:
-                padding = target_size - total_bytes_written
-                bin_file.write(b"\x00" * padding)
-                debug_file.write(f"Padding with {padding} zero bytes to meet {target_size} bytes.\n")
-                print(f"Padded with {padding} zero bytes to meet {target_size} bytes.")
-
-        print(f"Binary file saved: {output_file} ({total_bytes_written} bytes written).")
-        print(f"Debug log saved: {debug_file_path}")
-
-    except Exception as e:
-        print(f"Error writing binary file: {e}")
-
-
-
 
 # def main():
 #     ttf_path = r"c:\WINDOWS\Fonts\CAMBRIA.TTC"  # Path to font
@@ -462,174 +139,552 @@ def write_combined_binary(mif_output, output_file, target_size=81920):
 
 # GUI Functionality
 def browse_ttf_path(entry):
+    import tkinter as tk
+    from tkinter import filedialog
+
     path = filedialog.askopenfilename(filetypes=[("Font Files", "*.ttf;*.ttc")])
     if path:
         entry.delete(0, tk.END)
         entry.insert(0, path)
 
 def browse_output_dir(entry):
+    import tkinter as tk
+    from tkinter import filedialog
+
     path = filedialog.askdirectory()
     if path:
         entry.delete(0, tk.END)
         entry.insert(0, path)
 
-def generate_files():
-    try:
-        # Get inputs
-        ttf_path = ttf_entry.get()
-        output_dir = output_dir_entry.get()
-        
-        forced_height_32x64 = int(forced_height_32x64_entry.get())
-        max_width_32x64 = int(max_width_32x64_entry.get())
-        padding_top_32x64 = int(padding_top_32x64_entry.get())
-        padding_bottom_32x64 = int(padding_bottom_32x64_entry.get())
-
-        forced_height_16x32 = int(forced_height_16x32_entry.get())
-        max_width_16x32 = int(max_width_16x32_entry.get())
-        padding_top_16x32 = int(padding_top_16x32_entry.get())
-        padding_bottom_16x32 = int(padding_bottom_16x32_entry.get())
-
-        # Validate paths
-        if not os.path.exists(ttf_path):
-            messagebox.showerror("Error", "Invalid TTF font path.")
-            return
-        if not os.path.exists(output_dir):
-            messagebox.showerror("Error", "Invalid output directory path.")
-            return
+def check_paths(ttf_path, output_dir):
+    """Returns the error message for an invalid font path or output directory, or None."""
+    if not os.path.exists(ttf_path):
+        return "Invalid TTF font path."
+    if not os.path.exists(output_dir):
+        return "Invalid output directory path."
+    return None
 
-        # Character list
-        char_list = (
-            [chr(i) for i in range(0x20, 0x61)] +  
-            [
-                chr(0x7B), chr(0x7C), chr(0x7D), chr(0x7E), chr(0xB0), chr(0xB1),
-                chr(0x2026),chr(0x2190), chr(0x2191), chr(0x2192), chr(0x2193),
-                chr(0x21CC), chr(0x25BC), chr(0x2713), chr(0x20)
-            ]
-        )
-
-        # Create output directory if not exists
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Collect MIF output for binary generation
-        mif_output = []
-
-        # Generate 32x64 files
-        xbm_data_32x64 = generate_xbm_data(
-            ttf_path, char_list, forced_height_32x64, max_width_32x64, 
-            32, 64, padding_top=padding_top_32x64, padding_bottom=padding_bottom_32x64
-        )
-        write_xbm(xbm_data_32x64, os.path.join(output_dir, "FontRom64.xbm"), 32, 64)
-        write_mif(xbm_data_32x64, os.path.join(output_dir, "FontRom64.mif"), 32, 64, mif_output)
-
-        # Generate 16x32 files
-        xbm_data_16x32 = generate_xbm_data(
-            ttf_path, char_list, forced_height_16x32, max_width_16x32, 
-            16, 32, padding_top=padding_top_16x32, padding_bottom=padding_bottom_16x32
-        )
-        write_xbm(xbm_data_16x32, os.path.join(output_dir, "FontRom32.xbm"), 16, 32)
-        write_mif(xbm_data_16x32, os.path.join(output_dir, "FontRom32.mif"), 16, 32, mif_output)
-
-        #             # Debug: View the mif_output array
-        # print("First 20 lines of mif_output:")
-        # for i, line in enumerate(mif_output[:20]):
-        #     print(f"{i}: {line}")
-
-        # # Save the full array to a file for debugging
-        # debug_output_file = os.path.join(output_dir, "mif_output_debug.txt")
-        # with open(debug_output_file, "w") as debug_file:
-        #     for line in mif_output:
-        #         debug_file.write(line + "\n")
-        # print(f"Debug output saved to: {debug_output_file}")
-
-        # Generate combined binary file
-        output_binary_file = os.path.join(output_dir, "FontRomCombined.bin")
-        write_combined_binary(mif_output, output_binary_file, target_size=81920)
-
-    
 
+def build_files(ttf_path, output_dir,
+                forced_height_32x64, max_width_32x64, padding_top_32x64, padding_bottom_32x64,
+                forced_height_16x32, max_width_16x32, padding_top_16x32, padding_bottom_16x32,
+                incremental=False, threshold_value=128, compact_mif=False, dedup=None, packed=False,
+                fallback_fonts=(), raster_backend="resize"):
+    """
+    Builds both profiles, FontRomCombined.bin and the FontRomLookup code point table without any GUI
+    interaction; errors are raised.
+    With compact_mif the MIFs collapse runs of equal words into '[AAAA..BBBB] : VALUE;' records.
+    With dedup ("glyphs" or "rows") FontRomDedup.bin and its size report are written as well,
+    with packed FontRomPacked.bin (glyphs trimmed to their bounding box) and its report.
+    Characters the font does not have come from the first of fallback_fonts that does.
+    threshold_value "auto" thresholds each glyph at its own Otsu threshold (threshold_sweep).
+    raster_backend "direct" renders glyphs with FreeType at their target size instead of resizing.
+    Safe to run outside the Tk thread. Under an Instrumentation with a cancel_event it stops with
+    BuildCancelled at the next glyph, and every output file is either complete or left untouched.
+    """
+    from font_rom import generate_glyph_atlas, write_xbm, write_mif, write_combined_binary, write_dedup_binary, \
+        write_packed_binary, write_lookup_tables
+    from glyph_cache import GlyphCache
+    from incremental_build import build_font_rom
+    from font_profiles import DEFAULT_CHAR_LIST
+
+    # Character list
+    char_list = DEFAULT_CHAR_LIST
+
+    # Create output directory if not exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Thresholded glyphs are reused between runs while the font and render settings stay the same
+    glyph_cache = GlyphCache()
+
+    if incremental:
+        # Only glyphs whose inputs changed since the last build in output_dir are regenerated and patched
+        profiles = [
+            {"canvas_width": 32, "canvas_height": 64, "forced_height": forced_height_32x64,
+             "max_width": max_width_32x64, "padding_top": padding_top_32x64,
+             "padding_bottom": padding_bottom_32x64, "threshold_value": threshold_value,
+             "compact_mif": compact_mif},
+            {"canvas_width": 16, "canvas_height": 32, "forced_height": forced_height_16x32,
+             "max_width": max_width_16x32, "padding_top": padding_top_16x32,
+             "padding_bottom": padding_bottom_16x32, "threshold_value": threshold_value,
+             "compact_mif": compact_mif},
+        ]
+        build_font_rom(ttf_path, output_dir, profiles, char_list, target_size=81920,
+                       cache=glyph_cache, debug_log=True, dedup=dedup, packed=packed, fallback_fonts=fallback_fonts,
+                       raster_backend=raster_backend)
+        return
+
+    # Collect MIF output for binary generation
+    mif_output = []
+
+    # Generate 32x64 files
+    atlas_32x64 = generate_glyph_atlas(
+        ttf_path, char_list, forced_height_32x64, max_width_32x64, 
+        32, 64, threshold_value=threshold_value, padding_top=padding_top_32x64, padding_bottom=padding_bottom_32x64,
+        cache=glyph_cache, fallback_fonts=fallback_fonts, raster_backend=raster_backend
+    )
+    write_xbm(atlas_32x64, os.path.join(output_dir, "FontRom64.xbm"), 32, 64)
+    write_mif(atlas_32x64, os.path.join(output_dir, "FontRom64.mif"), 32, 64, mif_output, compact=compact_mif)
+
+    # Generate 16x32 files
+    atlas_16x32 = generate_glyph_atlas(
+        ttf_path, char_list, forced_height_16x32, max_width_16x32, 
+        16, 32, threshold_value=threshold_value, padding_top=padding_top_16x32, padding_bottom=padding_bottom_16x32,
+        cache=glyph_cache, fallback_fonts=fallback_fonts, raster_backend=raster_backend
+    )
+    write_xbm(atlas_16x32, os.path.join(output_dir, "FontRom32.xbm"), 16, 32)
+    write_mif(atlas_16x32, os.path.join(output_dir, "FontRom32.mif"), 16, 32, mif_output, compact=compact_mif)
+
+    # Generate combined binary file
+    output_binary_file = os.path.join(output_dir, "FontRomCombined.bin")
+    write_combined_binary(mif_output, output_binary_file, target_size=81920, debug_log=True)
+
+    # Code point -> glyph index table for the device (binary, C header and MIF)
+    write_lookup_tables([atlas_32x64, atlas_16x32], output_dir)
+
+    # Same planes with every distinct glyph stored once
+    if dedup:
+        write_dedup_binary([atlas_32x64, atlas_16x32], os.path.join(output_dir, "FontRomDedup.bin"),
+                           char_list, target_size=81920, dedup_rows=dedup == "rows")
+
+    # Glyphs trimmed to their bounding box, with a header per glyph
+    if packed:
+        write_packed_binary([atlas_32x64, atlas_16x32], os.path.join(output_dir, "FontRomPacked.bin"),
+                            target_size=81920)
+
+
+def generate_files(ttf_path, output_dir,
+                   forced_height_32x64, max_width_32x64, padding_top_32x64, padding_bottom_32x64,
+                   forced_height_16x32, max_width_16x32, padding_top_16x32, padding_bottom_16x32,
+                   incremental=False, threshold_value=128, compact_mif=False, dedup=None, packed=False,
+                   raster_backend="resize"):
+    """Runs build_files on the calling thread and reports the result in a message box."""
+    from tkinter import messagebox
+
+    error = check_paths(ttf_path, output_dir)
+    if error:
+        messagebox.showerror("Error", error)
+        return
+    try:
+        build_files(ttf_path, output_dir,
+                    forced_height_32x64, max_width_32x64, padding_top_32x64, padding_bottom_32x64,
+                    forced_height_16x32, max_width_16x32, padding_top_16x32, padding_bottom_16x32,
+                    incremental=incremental, threshold_value=threshold_value, compact_mif=compact_mif,
+                    dedup=dedup, packed=packed, raster_backend=raster_backend)
         messagebox.showinfo("Success", "Files and combined binary generated successfully!")
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
 
 
+# Status line text for the pipeline stages and progress counters reported by instrumentation
+STAGE_LABELS = {
+    "generate": "Rendering glyphs",
+    "render": "Rendering glyphs",
+    "write_xbm": "Writing XBM",
+    "write_mif": "Writing MIF",
+    "patch": "Patching files",
+    "write_combined_binary": "Writing combined binary",
+    "write_dedup_binary": "Writing deduplicated binary",
+    "write_packed_binary": "Writing packed binary",
+    "write_lookup_tables": "Writing lookup table",
+}
+
+POLL_INTERVAL_MS = 50
+
+# Deduplicated ROM choices of the GUI -> build_files dedup argument
+DEDUP_CHOICES = {"Off": None, "Glyphs": "glyphs", "Glyphs + rows": "rows"}
+
+# Preview pane: glyphs per row, zoom per profile (both give 64x128 cells), visible height, and the
+# quiet time after the last edit before the preview is re-rendered
+PREVIEW_COLUMNS = 6
+PREVIEW_ZOOM = {"32x64": 2, "16x32": 4}
+PREVIEW_GAP = 2
+PREVIEW_HEIGHT = 540
+PREVIEW_DEBOUNCE_MS = 150
+PREVIEW_POLL_MS = 15
+
+
 # GUI
-root = tk.Tk()
-root.title("Font to XBM/MIF Converter")
-
-# TTF Path
-ttf_label = tk.Label(root, text="TTF Font Path:")
-ttf_label.grid(row=0, column=0, padx=5, pady=5, sticky="e")
-ttf_entry = tk.Entry(root, width=50)
-ttf_entry.grid(row=0, column=1, padx=5, pady=5)
-ttf_browse = tk.Button(root, text="Browse", command=lambda: browse_ttf_path(ttf_entry))
-ttf_browse.grid(row=0, column=2, padx=5, pady=5)
-
-# Output Directory
-output_dir_label = tk.Label(root, text="Output Directory:")
-output_dir_label.grid(row=1, column=0, padx=5, pady=5, sticky="e")
-output_dir_entry = tk.Entry(root, width=50)
-output_dir_entry.grid(row=1, column=1, padx=5, pady=5)
-output_dir_browse = tk.Button(root, text="Browse", command=lambda: browse_output_dir(output_dir_entry))
-output_dir_browse.grid(row=1, column=2, padx=5, pady=5)
-
-# 32x64 Configuration
-config_32x64_label = tk.Label(root, text="32x64 Configuration:", font=("Arial", 12, "bold"))
-config_32x64_label.grid(row=2, column=0, columnspan=3, pady=(10, 5))
-
-forced_height_32x64_label = tk.Label(root, text="Forced Height:")
-forced_height_32x64_label.grid(row=3, column=0, padx=5, pady=5, sticky="e")
-forced_height_32x64_entry = tk.Entry(root)
-forced_height_32x64_entry.insert(0, "39")
-forced_height_32x64_entry.grid(row=3, column=1, padx=5, pady=5)
-
-max_width_32x64_label = tk.Label(root, text="Max Width:")
-max_width_32x64_label.grid(row=4, column=0, padx=5, pady=5, sticky="e")
-max_width_32x64_entry = tk.Entry(root)
-max_width_32x64_entry.insert(0, "17")
-max_width_32x64_entry.grid(row=4, column=1, padx=5, pady=5)
-
-padding_top_32x64_label = tk.Label(root, text="Padding Top:")
-padding_top_32x64_label.grid(row=5, column=0, padx=5, pady=5, sticky="e")
-padding_top_32x64_entry = tk.Entry(root)
-padding_top_32x64_entry.insert(0, "0")
-padding_top_32x64_entry.grid(row=5, column=1, padx=5, pady=5)
-
-padding_bottom_32x64_label = tk.Label(root, text="Padding Bottom:")
-padding_bottom_32x64_label.grid(row=6, column=0, padx=5, pady=5, sticky="e")
-padding_bottom_32x64_entry = tk.Entry(root)
-padding_bottom_32x64_entry.insert(0, "2")
-padding_bottom_32x64_entry.grid(row=6, column=1, padx=5, pady=5)
-
-# 16x32 Configuration
-config_16x32_label = tk.Label(root, text="16x32 Configuration:", font=("Arial", 12, "bold"))
-config_16x32_label.grid(row=7, column=0, columnspan=3, pady=(10, 5))
-
-forced_height_16x32_label = tk.Label(root, text="Forced Height:")
-forced_height_16x32_label.grid(row=8, column=0, padx=5, pady=5, sticky="e")
-forced_height_16x32_entry = tk.Entry(root)
-forced_height_16x32_entry.insert(0, "28")
-forced_height_16x32_entry.grid(row=8, column=1, padx=5, pady=5)
-
-max_width_16x32_label = tk.Label(root, text="Max Width:")
-max_width_16x32_label.grid(row=9, column=0, padx=5, pady=5, sticky="e")
-max_width_16x32_entry = tk.Entry(root)
-max_width_16x32_entry.insert(0, "13")
-max_width_16x32_entry.grid(row=9, column=1, padx=5, pady=5)
-
-padding_top_16x32_label = tk.Label(root, text="Padding Top:")
-padding_top_16x32_label.grid(row=10, column=0, padx=5, pady=5, sticky="e")
-padding_top_16x32_entry = tk.Entry(root)
-padding_top_16x32_entry.insert(0, "2")
-padding_top_16x32_entry.grid(row=10, column=1, padx=5, pady=5)
-
-padding_bottom_16x32_label = tk.Label(root, text="Padding Bottom:")
-padding_bottom_16x32_label.grid(row=11, column=0, padx=5, pady=5, sticky="e")
-padding_bottom_16x32_entry = tk.Entry(root)
-padding_bottom_16x32_entry.insert(0, "2")
-padding_bottom_16x32_entry.grid(row=11, column=1, padx=5, pady=5)
-
-# Generate Button
-generate_button = tk.Button(root, text="Generate Files", command=generate_files)
-generate_button.grid(row=12, column=0, columnspan=3, pady=10)
-
-root.mainloop()
+def main_gui():
+    import queue
+    import threading
+    import time
+    import tkinter as tk
+    from tkinter import messagebox, ttk
+
+    import instrumentation
+
+    root = tk.Tk()
+    root.title("Font to XBM/MIF Converter")
+
+    # TTF Path
+    ttf_label = tk.Label(root, text="TTF Font Path:")
+    ttf_label.grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    ttf_entry = tk.Entry(root, width=50)
+    ttf_entry.grid(row=0, column=1, padx=5, pady=5)
+    ttf_browse = tk.Button(root, text="Browse", command=lambda: browse_ttf_path(ttf_entry))
+    ttf_browse.grid(row=0, column=2, padx=5, pady=5)
+
+    # Output Directory
+    output_dir_label = tk.Label(root, text="Output Directory:")
+    output_dir_label.grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    output_dir_entry = tk.Entry(root, width=50)
+    output_dir_entry.grid(row=1, column=1, padx=5, pady=5)
+    output_dir_browse = tk.Button(root, text="Browse", command=lambda: browse_output_dir(output_dir_entry))
+    output_dir_browse.grid(row=1, column=2, padx=5, pady=5)
+
+    # 32x64 Configuration
+    config_32x64_label = tk.Label(root, text="32x64 Configuration:", font=("Arial", 12, "bold"))
+    config_32x64_label.grid(row=2, column=0, columnspan=3, pady=(10, 5))
+
+    forced_height_32x64_label = tk.Label(root, text="Forced Height:")
+    forced_height_32x64_label.grid(row=3, column=0, padx=5, pady=5, sticky="e")
+    forced_height_32x64_entry = tk.Entry(root)
+    forced_height_32x64_entry.insert(0, "39")
+    forced_height_32x64_entry.grid(row=3, column=1, padx=5, pady=5)
+
+    max_width_32x64_label = tk.Label(root, text="Max Width:")
+    max_width_32x64_label.grid(row=4, column=0, padx=5, pady=5, sticky="e")
+    max_width_32x64_entry = tk.Entry(root)
+    max_width_32x64_entry.insert(0, "17")
+    max_width_32x64_entry.grid(row=4, column=1, padx=5, pady=5)
+
+    padding_top_32x64_label = tk.Label(root, text="Padding Top:")
+    padding_top_32x64_label.grid(row=5, column=0, padx=5, pady=5, sticky="e")
+    padding_top_32x64_entry = tk.Entry(root)
+    padding_top_32x64_entry.insert(0, "0")
+    padding_top_32x64_entry.grid(row=5, column=1, padx=5, pady=5)
+
+    padding_bottom_32x64_label = tk.Label(root, text="Padding Bottom:")
+    padding_bottom_32x64_label.grid(row=6, column=0, padx=5, pady=5, sticky="e")
+    padding_bottom_32x64_entry = tk.Entry(root)
+    padding_bottom_32x64_entry.insert(0, "2")
+    padding_bottom_32x64_entry.grid(row=6, column=1, padx=5, pady=5)
+
+    # 16x32 Configuration
+    config_16x32_label = tk.Label(root, text="16x32 Configuration:", font=("Arial", 12, "bold"))
+    config_16x32_label.grid(row=7, column=0, columnspan=3, pady=(10, 5))
+
+    forced_height_16x32_label = tk.Label(root, text="Forced Height:")
+    forced_height_16x32_label.grid(row=8, column=0, padx=5, pady=5, sticky="e")
+    forced_height_16x32_entry = tk.Entry(root)
+    forced_height_16x32_entry.insert(0, "28")
+    forced_height_16x32_entry.grid(row=8, column=1, padx=5, pady=5)
+
+    max_width_16x32_label = tk.Label(root, text="Max Width:")
+    max_width_16x32_label.grid(row=9, column=0, padx=5, pady=5, sticky="e")
+    max_width_16x32_entry = tk.Entry(root)
+    max_width_16x32_entry.insert(0, "13")
+    max_width_16x32_entry.grid(row=9, column=1, padx=5, pady=5)
+
+    padding_top_16x32_label = tk.Label(root, text="Padding Top:")
+    padding_top_16x32_label.grid(row=10, column=0, padx=5, pady=5, sticky="e")
+    padding_top_16x32_entry = tk.Entry(root)
+    padding_top_16x32_entry.insert(0, "2")
+    padding_top_16x32_entry.grid(row=10, column=1, padx=5, pady=5)
+
+    padding_bottom_16x32_label = tk.Label(root, text="Padding Bottom:")
+    padding_bottom_16x32_label.grid(row=11, column=0, padx=5, pady=5, sticky="e")
+    padding_bottom_16x32_entry = tk.Entry(root)
+    padding_bottom_16x32_entry.insert(0, "2")
+    padding_bottom_16x32_entry.grid(row=11, column=1, padx=5, pady=5)
+
+    # Threshold (both profiles)
+    threshold_label = tk.Label(root, text="Threshold:")
+    threshold_label.grid(row=12, column=0, padx=5, pady=5, sticky="e")
+    threshold_scale = tk.Scale(root, from_=0, to=254, orient="horizontal", length=200)
+    threshold_scale.set(128)
+    threshold_scale.grid(row=12, column=1, padx=5, pady=5)
+    # Each glyph at its own Otsu threshold (threshold_value "auto"); the scale is ignored meanwhile
+    auto_threshold_var = tk.BooleanVar(value=False)
+    auto_threshold_check = tk.Checkbutton(root, text="Auto (Otsu per glyph)", variable=auto_threshold_var)
+    auto_threshold_check.grid(row=12, column=2, padx=5, pady=5, sticky="w")
+
+    # Incremental build / compact MIF, then the extra ROM layouts on a line of their own
+    options_frame = tk.Frame(root)
+    options_frame.grid(row=13, column=0, columnspan=3, pady=(10, 0))
+    build_options = tk.Frame(options_frame)
+    build_options.pack(side="top")
+    incremental_var = tk.BooleanVar(value=False)
+    incremental_check = tk.Checkbutton(build_options, text="Incremental build (reuse unchanged glyphs)",
+                                       variable=incremental_var)
+    incremental_check.pack(side="left", padx=5)
+    compact_mif_var = tk.BooleanVar(value=False)
+    compact_mif_check = tk.Checkbutton(build_options, text="Compact MIF (address ranges)", variable=compact_mif_var)
+    compact_mif_check.pack(side="left", padx=5)
+    direct_var = tk.BooleanVar(value=False)
+    direct_check = tk.Checkbutton(build_options, text="Direct rasterizer (FreeType mono)", variable=direct_var)
+    direct_check.pack(side="left", padx=5)
+
+    rom_options = tk.Frame(options_frame)
+    rom_options.pack(side="top")
+    dedup_label = tk.Label(rom_options, text="Dedup ROM:")
+    dedup_label.pack(side="left", padx=(5, 0))
+    dedup_var = tk.StringVar(value="Off")
+    dedup_menu = tk.OptionMenu(rom_options, dedup_var, *DEDUP_CHOICES)
+    dedup_menu.pack(side="left", padx=5)
+    packed_var = tk.BooleanVar(value=False)
+    packed_check = tk.Checkbutton(rom_options, text="Packed ROM (trimmed glyphs)", variable=packed_var)
+    packed_check.pack(side="left", padx=5)
+
+    # Generate / Cancel
+    button_frame = tk.Frame(root)
+    button_frame.grid(row=14, column=0, columnspan=3, pady=10)
+    generate_button = tk.Button(button_frame, text="Generate Files")
+    generate_button.pack(side="left", padx=5)
+    cancel_button = tk.Button(button_frame, text="Cancel", state="disabled")
+    cancel_button.pack(side="left", padx=5)
+
+    # Progress of the current stage
+    progress_bar = ttk.Progressbar(root, mode="determinate", length=400)
+    progress_bar.grid(row=15, column=0, columnspan=3, padx=5, pady=(0, 5))
+    status_var = tk.StringVar(value="Ready")
+    status_label = tk.Label(root, textvariable=status_var)
+    status_label.grid(row=16, column=0, columnspan=3, pady=(0, 10))
+
+    # The build runs on a worker thread; it only talks to the Tk thread through this queue
+    events = queue.Queue()
+    cancel_event = threading.Event()
+    state = {"worker": None, "closing": False}
+
+    def run_build(arguments, incremental, threshold_value, compact_mif, dedup, packed, raster_backend):
+        metrics = instrumentation.Instrumentation(callback=lambda event, data: events.put((event, data)),
+                                                  trace_spans=False, cancel_event=cancel_event)
+        try:
+            with instrumentation.collect(metrics):
+                build_files(*arguments, incremental=incremental, threshold_value=threshold_value,
+                            compact_mif=compact_mif, dedup=dedup, packed=packed, raster_backend=raster_backend)
+        except instrumentation.BuildCancelled:
+            events.put(("cancelled", {}))
+        except Exception as e:
+            events.put(("error", {"message": str(e)}))
+        else:
+            events.put(("done", {}))
+
+    def finish(event, data):
+        state["worker"] = None
+        generate_button.config(state="normal")
+        cancel_button.config(state="disabled")
+        if state["closing"]:
+            root.destroy()
+            return
+        if event == "done":
+            progress_bar["value"] = progress_bar["maximum"]
+            status_var.set("Done")
+            messagebox.showinfo("Success", "Files and combined binary generated successfully!")
+        elif event == "cancelled":
+            progress_bar["value"] = 0
+            status_var.set("Cancelled; files finished before the cancel were kept, none is half-written")
+        else:
+            status_var.set("Failed")
+            messagebox.showerror("Error", f"An error occurred: {data['message']}")
+
+    def poll():
+        try:
+            while True:
+                event, data = events.get_nowait()
+                if event in ("done", "cancelled", "error"):
+                    finish(event, data)
+                    return
+                label = STAGE_LABELS.get(data["stage"], data["stage"])
+                if event == "stage_start":
+                    progress_bar.config(maximum=1, value=0)
+                    status_var.set(f"{label}...")
+                elif event == "stage_end":
+                    progress_bar["value"] = progress_bar["maximum"]
+                elif event == "progress":
+                    progress_bar.config(maximum=max(data["total"], 1), value=data["done"])
+                    status_var.set(f"{label}: {data['done']}/{data['total']}")
+        except queue.Empty:
+            pass
+        root.after(POLL_INTERVAL_MS, poll)
+
+    def selected_backend():
+        return "direct" if direct_var.get() else "resize"
+
+    def selected_threshold():
+        return "auto" if auto_threshold_var.get() else threshold_scale.get()
+
+    def on_generate():
+        if state["worker"] is not None:
+            return
+        try:
+            settings = [int(entry.get()) for entry in (
+                forced_height_32x64_entry, max_width_32x64_entry, padding_top_32x64_entry, padding_bottom_32x64_entry,
+                forced_height_16x32_entry, max_width_16x32_entry, padding_top_16x32_entry, padding_bottom_16x32_entry,
+            )]
+        except ValueError as e:
+            messagebox.showerror("Error", f"An error occurred: {e}")
+            return
+        ttf_path, output_dir = ttf_entry.get(), output_dir_entry.get()
+        error = check_paths(ttf_path, output_dir)
+        if error:
+            messagebox.showerror("Error", error)
+            return
+
+        cancel_event.clear()
+        generate_button.config(state="disabled")
+        cancel_button.config(state="normal")
+        progress_bar.config(maximum=1, value=0)
+        status_var.set("Starting...")
+        state["worker"] = threading.Thread(target=run_build, args=([ttf_path, output_dir] + settings,
+                                                                   incremental_var.get(), selected_threshold(),
+                                                                   compact_mif_var.get(),
+                                                                   DEDUP_CHOICES[dedup_var.get()],
+                                                                   packed_var.get(), selected_backend()),
+                                           daemon=True)
+        state["worker"].start()
+        root.after(POLL_INTERVAL_MS, poll)
+
+    def on_cancel():
+        cancel_event.set()
+        cancel_button.config(state="disabled")
+        status_var.set("Cancelling...")
+
+    def on_close():
+        # Let a running build stop at its next glyph so no temporary files are left behind
+        if state["worker"] is None:
+            root.destroy()
+            return
+        state["closing"] = True
+        on_cancel()
+
+    generate_button.config(command=on_generate)
+    cancel_button.config(command=on_cancel)
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # Preview: only the glyphs scrolled into view are rendered, on a single background thread and
+    # PREVIEW_DEBOUNCE_MS after the last edit. glyph_preview keeps the grayscale renders, so a
+    # threshold or padding change never goes through FreeType again.
+    preview_frame = tk.Frame(root)
+    preview_frame.grid(row=0, column=3, rowspan=17, padx=(10, 5), pady=5, sticky="n")
+    preview_profile_var = tk.StringVar(value="32x64")
+    for i, name in enumerate(PREVIEW_ZOOM):
+        preview_radio = tk.Radiobutton(preview_frame, text=f"Preview {name}", variable=preview_profile_var,
+                                       value=name, command=lambda: schedule_preview(0))
+        preview_radio.grid(row=0, column=i, sticky="w")
+    cell_width, cell_height = 64 + PREVIEW_GAP, 128 + PREVIEW_GAP
+    preview_canvas = tk.Canvas(preview_frame, width=PREVIEW_COLUMNS * cell_width, height=PREVIEW_HEIGHT,
+                               background="white", highlightthickness=0, yscrollincrement=cell_height)
+    preview_canvas.grid(row=1, column=0, columnspan=2)
+    preview_scrollbar = tk.Scrollbar(preview_frame, orient="vertical")
+    preview_scrollbar.grid(row=1, column=2, sticky="ns")
+    preview_status_var = tk.StringVar(value="Choose a font to see the preview")
+    preview_status_label = tk.Label(preview_frame, textvariable=preview_status_var)
+    preview_status_label.grid(row=2, column=0, columnspan=3)
+
+    preview_settings = {
+        "32x64": (forced_height_32x64_entry, max_width_32x64_entry, padding_top_32x64_entry),
+        "16x32": (forced_height_16x32_entry, max_width_16x32_entry, padding_top_16x32_entry),
+    }
+    preview = {"renderer": None, "executor": None, "future": None, "generation": 0, "after": None, "photo": None}
+
+    def preview_chars():
+        from font_profiles import DEFAULT_CHAR_LIST
+
+        return list(dict.fromkeys(DEFAULT_CHAR_LIST))
+
+    def render_preview(generation, ttf_path, backend, canvas_size, settings, chars, first_row):
+        # Runs on the preview thread; skipped when a newer request came in while it was queued
+        if generation != preview["generation"]:
+            return None
+        from glyph_preview import GlyphPreview, preview_image
+
+        start = time.perf_counter()
+        renderer = preview["renderer"]
+        if renderer is None or renderer.ttf_path != ttf_path or renderer.backend != backend:
+            preview["renderer"] = GlyphPreview(ttf_path, backend=backend)
+        bitmaps, missing = preview["renderer"].render(chars, *canvas_size, *settings)
+        image = preview_image(bitmaps, PREVIEW_COLUMNS, PREVIEW_ZOOM[f"{canvas_size[0]}x{canvas_size[1]}"],
+                              PREVIEW_GAP, missing)
+        return generation, first_row, image, len(chars), len(missing), time.perf_counter() - start
+
+    def poll_preview():
+        future = preview["future"]
+        if not future.done():
+            root.after(PREVIEW_POLL_MS, poll_preview)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            preview_status_var.set(f"Preview unavailable: {e}")
+            return
+        if result is None or result[0] != preview["generation"]:
+            return
+        _, first_row, image, count, missing, seconds = result
+        preview["photo"] = tk.PhotoImage(data=image, format="PPM")
+        preview_canvas.delete("glyphs")
+        preview_canvas.create_image(0, first_row * cell_height, image=preview["photo"], anchor="nw", tags="glyphs")
+        preview_status_var.set(f"{count} glyphs rendered in {seconds * 1000:.0f} ms"
+                               + (f", {missing} missing or too large" if missing else ""))
+
+    def start_preview():
+        preview["after"] = None
+        ttf_path = ttf_entry.get()
+        if not os.path.isfile(ttf_path):
+            preview_status_var.set("Choose a font to see the preview")
+            return
+        name = preview_profile_var.get()
+        try:
+            forced_height, max_width, padding_top = [int(entry.get()) for entry in preview_settings[name]]
+        except ValueError:
+            preview_status_var.set("Preview paused: the settings must be whole numbers")
+            return
+        canvas_size = (32, 64) if name == "32x64" else (16, 32)
+
+        # Only the rows scrolled into view
+        chars = preview_chars()
+        total_rows = -(-len(chars) // PREVIEW_COLUMNS)
+        preview_canvas.config(scrollregion=(0, 0, PREVIEW_COLUMNS * cell_width, total_rows * cell_height))
+        top = preview_canvas.canvasy(0)
+        first_row = int(top // cell_height)
+        last_row = min(total_rows, int((top + preview_canvas.winfo_height()) // cell_height) + 1)
+        visible = chars[first_row * PREVIEW_COLUMNS:last_row * PREVIEW_COLUMNS]
+
+        if preview["executor"] is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            preview["executor"] = ThreadPoolExecutor(max_workers=1)
+        preview["generation"] += 1
+        polling = preview["future"] is not None and not preview["future"].done()
+        preview["future"] = preview["executor"].submit(
+            render_preview, preview["generation"], ttf_path, selected_backend(), canvas_size,
+            (forced_height, max_width, selected_threshold(), padding_top), visible, first_row)
+        if not polling:
+            root.after(PREVIEW_POLL_MS, poll_preview)
+
+    def schedule_preview(delay=PREVIEW_DEBOUNCE_MS):
+        if preview["after"] is not None:
+            root.after_cancel(preview["after"])
+        preview["after"] = root.after(delay, start_preview)
+
+    def on_preview_scroll(*args):
+        preview_canvas.yview(*args)
+        schedule_preview(0)
+
+    def on_preview_wheel(event):
+        preview_canvas.yview_scroll(-1 if event.delta > 0 or event.num == 4 else 1, "units")
+        schedule_preview(0)
+
+    preview_scrollbar.config(command=on_preview_scroll)
+    preview_canvas.config(yscrollcommand=preview_scrollbar.set)
+    for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+        preview_canvas.bind(sequence, on_preview_wheel)
+    preview_canvas.bind("<Configure>", lambda event: schedule_preview())
+    for entry in [ttf_entry] + [entry for entries in preview_settings.values() for entry in entries]:
+        entry.bind("<KeyRelease>", lambda event: schedule_preview())
+    threshold_scale.config(command=lambda value: schedule_preview())
+    direct_check.config(command=lambda: schedule_preview(0))
+
+    def on_auto_threshold():
+        threshold_scale.config(state="disabled" if auto_threshold_var.get() else "normal")
+        schedule_preview(0)
+
+    auto_threshold_check.config(command=on_auto_threshold)
+    ttf_browse.config(command=lambda: (browse_ttf_path(ttf_entry), schedule_preview(0)))
+
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main_gui()